@@ -0,0 +1,326 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from scripts.benchmarks.streams import (DEFAULT_MIX, KINDS, generate_stream, parse_mix, parse_size,
+                                        stream_name)
+
+# Benchmark the CESR parser and formatters on synthetic streams and keep the
+# numbers, so a parser change can be compared against the previous run:
+# python -m scripts.benchmarks run --size 1MB --size 100MB --kind JSON --kind CBOR -o before.json
+# python -m scripts.benchmarks run --size 1MB --size 100MB --kind JSON --kind CBOR -o after.json
+# python -m scripts.benchmarks compare before.json after.json
+#
+# python -m scripts.benchmarks generate synthetic.cesr --size 2GB --signatures 3 --receipts 5
+
+
+# --- Constants ---
+DEFAULT_SIZES = ("1MB", "16MB")
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), "cesr-benchmarks") # Generated streams are kept for reuse
+LATENCY_PERCENTILES = (50, 90, 99, 99.9)
+
+
+# --- Benchmarks ---
+# Each takes the stream path and a `tick` callback to call once per event (for
+# per-event latency), and returns the number of events processed, or None if
+# it cannot count them as it goes; they are then counted after timing.
+
+def _bench_parse(path: str, tick: Callable) -> int:
+    """ Framing and attachment decoding only (`iter_cesr_events`, bodies left undecoded). """
+    from scripts.format_cesr import iter_cesr_events
+    count = 0
+    with open(path, "rb") as f:
+        for _ in iter_cesr_events(f):
+            count += 1
+            tick()
+    return count
+
+
+def _bench_decode(path: str, tick: Callable) -> int:
+    """ `iter_cesr_events` plus deserializing every body. """
+    from scripts.format_cesr import iter_cesr_events
+    count = 0
+    with open(path, "rb") as f:
+        for event in iter_cesr_events(f):
+            event.body
+            count += 1
+            tick()
+    return count
+
+
+def _bench_format_text(path: str, tick: Callable) -> int:
+    """ The human readable formatter (`iter_format_event` per event) written to /dev/null. """
+    from scripts.format_cesr import iter_cesr_events, iter_format_event
+    count = 0
+    with open(path, "rb") as f, open(os.devnull, "w", encoding="utf-8") as out:
+        for event in iter_cesr_events(f):
+            for part in iter_format_event(event):
+                out.write(part)
+                out.write("\n")
+            count += 1
+            tick()
+    return count
+
+
+def _bench_format_ndjson(path: str, tick: Callable) -> int:
+    """ NDJSON records with bodies (`ndjson_line` per event) written to /dev/null. """
+    from scripts.format_cesr import iter_cesr_events, ndjson_line
+    count = 0
+    with open(path, "rb") as f, open(os.devnull, "w", encoding="utf-8") as out:
+        for event in iter_cesr_events(f):
+            out.write(ndjson_line(event))
+            out.write("\n")
+            count += 1
+            tick()
+    return count
+
+
+def _bench_format_parallel(path: str, tick: Callable) -> Optional[int]:
+    """ `format_cesr_parallel` on every core; no per-event latency, RSS excludes the workers. """
+    from scripts.format_cesr import format_cesr_parallel
+    with open(os.devnull, "w", encoding="utf-8") as out:
+        format_cesr_parallel(path, out)
+    return None
+
+
+def _count_events(path: str) -> int:
+    from scripts.format_cesr import iter_cesr_events
+    with open(path, "rb") as f:
+        return sum(1 for _ in iter_cesr_events(f))
+
+
+def _bench_verify(path: str, tick: Callable) -> int:
+    """ `verify_cesr` on every core (synthetic signatures fail, which costs the same as passing). """
+    from scripts.cesr_verify import verify_cesr
+    return verify_cesr(path)["events"]
+
+
+BENCHMARKS: Dict[str, Callable] = {
+    "parse": _bench_parse,
+    "decode": _bench_decode,
+    "format_text": _bench_format_text,
+    "format_ndjson": _bench_format_ndjson,
+    "format_parallel": _bench_format_parallel,
+    "verify": _bench_verify,
+}
+
+
+# --- Measurement ---
+
+def _percentile(sorted_values: array, percentile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    position = min(len(sorted_values) - 1, round(percentile / 100 * (len(sorted_values) - 1)))
+    return sorted_values[position]
+
+
+def _measure(name: str, path: str) -> dict:
+    """ Runs one benchmark in this process and reports its time, throughput, peak RSS and latencies. """
+    latencies = array("q")
+    last = time.perf_counter_ns()
+
+    def tick():
+        nonlocal last
+        now = time.perf_counter_ns()
+        latencies.append(now - last)
+        last = now
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    last = time.perf_counter_ns()
+    events = BENCHMARKS[name](path, tick)
+    seconds = time.perf_counter() - started
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # KiB on Linux, bytes on macOS
+    if events is None: # Untimed, and after the RSS reading
+        events = _count_events(path)
+    if sys.platform == "darwin":
+        peak_rss, rss_before = peak_rss // 1024, rss_before // 1024
+
+    size = os.path.getsize(path)
+    result = {
+        "benchmark": name,
+        "events": events,
+        "bytes": size,
+        "seconds": seconds,
+        "mb_per_second": size / 2 ** 20 / seconds if seconds else 0.0,
+        "events_per_second": events / seconds if seconds else 0.0,
+        "peak_rss_mb": peak_rss / 1024,
+        "rss_growth_mb": (peak_rss - rss_before) / 1024,
+    }
+    if latencies:
+        latencies = array("q", sorted(latencies))
+        result["latency_us"] = {f"p{percentile:g}": _percentile(latencies, percentile) / 1000
+                                for percentile in LATENCY_PERCENTILES}
+        result["latency_us"]["max"] = latencies[-1] / 1000
+    return result
+
+
+def run_benchmark(name: str, path: str) -> dict:
+    """
+    Runs one benchmark in a fresh child process, so its peak RSS is its own
+    and not the high-water mark of an earlier benchmark.
+    """
+    # Executor workers (unlike multiprocessing.Pool ones) may start pools of their own
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(_measure, name, path).result()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes: List[int], kinds: List[str] = ("JSON",), benchmarks: Optional[List[str]] = None,
+                   mix: Optional[Dict[str, int]] = None, signatures: int = 1, receipts: int = 0,
+                   repeat: int = 1, workdir: str = DEFAULT_WORKDIR, seed: int = 0) -> dict:
+    """
+    Generates (or reuses) a synthetic stream per size and kind and runs each
+    benchmark on it.
+
+    Args:
+        sizes: Stream sizes in bytes.
+        kinds: Body serializations to generate streams in.
+        benchmarks: Names from `BENCHMARKS` (default all).
+        mix, signatures, receipts, seed: Stream parameters, see `StreamGenerator`.
+        repeat: Runs per benchmark; the fastest is kept.
+        workdir: Directory for the generated streams, reused by later runs.
+
+    Returns:
+        A results dict with the environment under 'meta', the streams under
+        'streams' and one entry per (benchmark, stream) under 'results'.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    import keri
+    report = {
+        "meta": {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "keri": getattr(keri, "__version__", None),
+            "commit": _git_commit(),
+            "repeat": repeat,
+        },
+        "streams": [],
+        "results": [],
+    }
+    for kind in kinds:
+        for size in sizes:
+            path = os.path.join(workdir, stream_name(size, mix, signatures, receipts, kind, seed))
+            if os.path.exists(path):
+                stream = {"path": path, "bytes": os.path.getsize(path), "kind": kind, "mix": mix or DEFAULT_MIX,
+                          "signatures": signatures, "receipts": receipts, "seed": seed}
+            else:
+                print(f"Generating {path}...", file=sys.stderr)
+                stream = generate_stream(path + ".tmp", size, mix, signatures, receipts, kind, seed)
+                os.replace(path + ".tmp", path)
+                stream["path"] = path
+            report["streams"].append(stream)
+
+            for name in benchmarks or BENCHMARKS:
+                runs = [run_benchmark(name, path) for _ in range(repeat)]
+                result = dict(min(runs, key=lambda run: run["seconds"]), stream=os.path.basename(path), kind=kind)
+                report["results"].append(result)
+                print(f"{name:>16} {os.path.basename(path)}: {result['mb_per_second']:8.2f} MB/s "
+                      f"{result['events_per_second']:10.0f} events/s  peak RSS {result['peak_rss_mb']:.0f} MB",
+                      file=sys.stderr)
+    return report
+
+
+def compare_results(before: dict, after: dict) -> List[dict]:
+    """
+    Pairs the results of two runs by (benchmark, stream) and reports the change
+    in throughput and peak RSS of each pair present in both.
+    """
+    previous = {(result["benchmark"], result["stream"]): result for result in before["results"]}
+    changes = []
+    for result in after["results"]:
+        old = previous.get((result["benchmark"], result["stream"]))
+        if old is None:
+            continue
+        changes.append({
+            "benchmark": result["benchmark"],
+            "stream": result["stream"],
+            "mb_per_second": (old["mb_per_second"], result["mb_per_second"]),
+            "throughput_change": result["mb_per_second"] / old["mb_per_second"] - 1 if old["mb_per_second"] else None,
+            "peak_rss_mb": (old["peak_rss_mb"], result["peak_rss_mb"]),
+        })
+    return changes
+
+
+# --- CLI ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the CESR stream tooling on synthetic streams.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def stream_options(subparser):
+        subparser.add_argument("--mix", type=parse_mix, help="Event weights, e.g. icp=1,rot=1,ixn=8,rct=4,rpy=1,acdc=1.")
+        subparser.add_argument("--signatures", type=int, default=1, help="Controller signatures per key event.")
+        subparser.add_argument("--receipts", type=int, default=0,
+                               help="Witness signatures per key event and receipt couples per rct.")
+        subparser.add_argument("--seed", type=int, default=0, help="Random seed.")
+
+    generate_parser = subparsers.add_parser("generate", help="Write a synthetic CESR stream.")
+    generate_parser.add_argument("output", help="File to write.")
+    generate_parser.add_argument("--size", type=parse_size, default=parse_size("16MB"), help="e.g. 1MB, 2GB.")
+    generate_parser.add_argument("--kind", choices=KINDS, default="JSON", help="Body serialization.")
+    stream_options(generate_parser)
+
+    run_parser = subparsers.add_parser("run", help="Run benchmarks and write the results as JSON.")
+    run_parser.add_argument("--size", type=parse_size, action="append", help="Stream size (repeatable).")
+    run_parser.add_argument("--kind", choices=KINDS, action="append", help="Body serialization (repeatable).")
+    run_parser.add_argument("--bench", choices=list(BENCHMARKS), action="append", help="Benchmark (repeatable).")
+    run_parser.add_argument("--repeat", type=int, default=1, help="Runs per benchmark, fastest kept.")
+    run_parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="Where generated streams are kept.")
+    run_parser.add_argument("-o", "--output", help="Results file (default: stdout).")
+    stream_options(run_parser)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two results files.")
+    compare_parser.add_argument("before", help="Results of the baseline run.")
+    compare_parser.add_argument("after", help="Results of the new run.")
+
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        stream = generate_stream(args.output, args.size, args.mix, args.signatures, args.receipts, args.kind,
+                                 args.seed)
+        print(f"Wrote {stream['events']} events ({stream['bytes']} bytes) to {args.output}")
+        return 0
+
+    if args.command == "compare":
+        with open(args.before, "r", encoding="utf-8") as f:
+            before = json.load(f)
+        with open(args.after, "r", encoding="utf-8") as f:
+            after = json.load(f)
+        for change in compare_results(before, after):
+            old, new = change["mb_per_second"]
+            delta = change["throughput_change"]
+            print(f"{change['benchmark']:>16} {change['stream']}: {old:8.2f} -> {new:8.2f} MB/s "
+                  f"({'n/a' if delta is None else f'{delta:+.1%}'}), peak RSS "
+                  f"{change['peak_rss_mb'][0]:.0f} -> {change['peak_rss_mb'][1]:.0f} MB")
+        return 0
+
+    report = run_benchmarks(args.size or [parse_size(size) for size in DEFAULT_SIZES], args.kind or ["JSON"],
+                            args.bench, args.mix, args.signatures, args.receipts, args.repeat, args.workdir,
+                            args.seed)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"Wrote results to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    return 0
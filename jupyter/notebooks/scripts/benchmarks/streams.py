@@ -0,0 +1,215 @@
+import hashlib
+import json
+import random
+from typing import Dict, Optional
+
+from keri.core.coring import Matter, MtrDex
+
+try:
+    from keri.core.indexing import IdrDex, Indexer
+except ImportError: # keri < 1.2 keeps Indexer in coring
+    from keri.core.coring import IdrDex, Indexer
+
+# Synthetic KERI/ACDC streams for benchmarking the CESR tooling. Events are
+# structurally valid CESR (correct version string sizes, count codes and
+# primitive sizes) but digests and signatures are random, so they parse and
+# format like real dumps without the cost of real signing.
+#
+# from scripts.benchmarks.streams import generate_stream, parse_size
+# generate_stream("synthetic.cesr", parse_size("100MB"), mix={"ixn": 8, "rot": 1, "rct": 4}, signatures=3)
+
+
+# --- Constants ---
+KINDS = ("JSON", "CBOR", "MGPK")
+DEFAULT_MIX = {"icp": 1, "rot": 1, "ixn": 6, "rct": 4, "rpy": 1, "acdc": 1}
+SIZE_UNITS = {"B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+B64_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+AID_POOL_SIZE = 64 # Distinct controllers the events are spread across
+PRIMITIVE_POOL_SIZE = 256 # Pre-generated digests/keys/signatures drawn from per event
+
+
+def parse_size(text: str) -> int:
+    """ Parses a size such as '512KB', '100MB' or '2GB' (binary units) into bytes. """
+    text = text.strip().upper()
+    for unit in sorted(SIZE_UNITS, key=len, reverse=True):
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * SIZE_UNITS[unit])
+    return int(text)
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    """ Parses an event mix such as 'icp=1,rot=1,ixn=8,rct=4' into weights. """
+    mix = {}
+    for part in text.split(","):
+        ilk, _, weight = part.partition("=")
+        mix[ilk.strip()] = int(weight or 1)
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        raise ValueError(f"Unknown event types {', '.join(sorted(unknown))}, expected {', '.join(DEFAULT_MIX)}")
+    return mix
+
+
+def _counter(code: str, count: int) -> str:
+    """ qb64 of a two character count code with a two character count. """
+    return code + B64_CHARS[count // 64] + B64_CHARS[count % 64]
+
+
+class _Primitives:
+    """ Pools of random qb64 primitives so generating an event costs no crypto. """
+
+    def __init__(self, rnd: random.Random, max_index: int):
+        def matter(code, size):
+            return [Matter(raw=rnd.randbytes(size), code=code).qb64 for _ in range(PRIMITIVE_POOL_SIZE)]
+
+        self.digests = matter(MtrDex.Blake3_256, 32)
+        self.keys = matter(MtrDex.Ed25519, 32)
+        self.witnesses = matter(MtrDex.Ed25519N, 32)
+        self.signatures = matter(MtrDex.Ed25519_Sig, 64)
+        self.indexed = [[Indexer(raw=rnd.randbytes(64), code=IdrDex.Ed25519_Sig, index=index).qb64
+                         for _ in range(16)] for index in range(max(max_index, 1))]
+        self.aids = [Matter(raw=rnd.randbytes(32), code=MtrDex.Blake3_256).qb64 for _ in range(AID_POOL_SIZE)]
+
+
+class StreamGenerator:
+    """
+    Produces synthetic CESR events one at a time.
+
+    Args:
+        mix: Relative weight of each event type (see `DEFAULT_MIX`).
+        signatures: Controller signatures attached to each key event.
+        receipts: Witness signatures attached to each key event and receipt
+                  couples attached to each 'rct' message.
+        kind: Body serialization, one of `KINDS`.
+        seed: Random seed; the same arguments always give the same stream.
+    """
+
+    def __init__(self, mix: Optional[Dict[str, int]] = None, signatures: int = 1, receipts: int = 0,
+                 kind: str = "JSON", seed: int = 0):
+        if not 0 <= signatures < 64 or not 0 <= receipts < 64:
+            raise ValueError("signatures and receipts must be between 0 and 63 (small index signature codes)")
+        if kind not in KINDS:
+            raise ValueError(f"Unsupported serialization kind {kind}, expected one of {', '.join(KINDS)}")
+        self.mix = mix or DEFAULT_MIX
+        self.signatures = signatures
+        self.receipts = receipts
+        self.kind = kind
+        self.rnd = random.Random(seed)
+        self.pool = _Primitives(self.rnd, max(signatures, receipts))
+        self.sns = {}
+        self._ilks = list(self.mix)
+        self._weights = [self.mix[ilk] for ilk in self._ilks]
+
+    def _serialize(self, body: dict, proto: str = "KERI") -> bytes:
+        """ Serializes a body with a version string that declares its exact size. """
+        body["v"] = f"{proto}10{self.kind}000000_"
+        raw = self._dumps(body)
+        body["v"] = f"{proto}10{self.kind}{len(raw):06x}_"
+        return self._dumps(body)
+
+    def _dumps(self, body: dict) -> bytes:
+        if self.kind == "JSON":
+            return json.dumps(body, separators=(",", ":")).encode("utf-8")
+        if self.kind == "CBOR":
+            import cbor2
+            return cbor2.dumps(body)
+        import msgpack
+        return msgpack.packb(body)
+
+    def _pick(self, values: list) -> str:
+        return values[self.rnd.randrange(len(values))]
+
+    def _indexed_signatures(self, code: str, count: int) -> str:
+        return _counter(code, count) + "".join(self._pick(self.pool.indexed[index]) for index in range(count))
+
+    def _key_event(self, ilk: str) -> dict:
+        pool = self.pool
+        prefix = self._pick(pool.aids)
+        sn = self.sns.get(prefix, -1) + 1 if ilk != "icp" else 0
+        self.sns[prefix] = sn
+        body = {"v": "", "t": ilk, "d": self._pick(pool.digests), "i": prefix, "s": f"{sn:x}"}
+        if ilk == "ixn":
+            body.update(p=self._pick(pool.digests), a=[{"i": self._pick(pool.aids), "s": "0",
+                                                        "d": self._pick(pool.digests)}])
+            return body
+        if ilk == "rot":
+            body["p"] = self._pick(pool.digests)
+        keys = max(self.signatures, 1)
+        body.update(kt=str(keys), k=[self._pick(pool.keys) for _ in range(keys)],
+                    nt=str(keys), n=[self._pick(pool.digests) for _ in range(keys)],
+                    bt=str(self.receipts), b=[self._pick(pool.witnesses) for _ in range(self.receipts)],
+                    c=[], a=[])
+        if ilk == "rot":
+            body["br"], body["ba"] = body.pop("b"), []
+        return body
+
+    def event(self) -> bytes:
+        """ The next event: serialized body followed by its attachments. """
+        ilk = self.rnd.choices(self._ilks, self._weights)[0]
+        pool = self.pool
+        attachments = ""
+        if ilk in ("icp", "rot", "ixn"):
+            raw = self._serialize(self._key_event(ilk))
+            if self.signatures:
+                attachments += self._indexed_signatures("-A", self.signatures)
+            if self.receipts:
+                attachments += self._indexed_signatures("-B", self.receipts)
+        elif ilk == "rct":
+            prefix = self._pick(pool.aids)
+            raw = self._serialize({"v": "", "t": "rct", "d": self._pick(pool.digests), "i": prefix,
+                                   "s": f"{self.sns.get(prefix, 0):x}"})
+            couples = max(self.receipts, 1)
+            attachments = _counter("-C", couples) + "".join(self._pick(pool.witnesses) + self._pick(pool.signatures)
+                                                           for _ in range(couples))
+        elif ilk == "rpy":
+            raw = self._serialize({"v": "", "t": "rpy", "d": self._pick(pool.digests),
+                                   "dt": "2024-01-01T00:00:00.000000+00:00", "r": "/end/role/add",
+                                   "a": {"cid": self._pick(pool.aids), "role": "witness",
+                                         "eid": self._pick(pool.witnesses)}})
+            if self.signatures:
+                attachments = self._indexed_signatures("-A", self.signatures)
+        else: # acdc
+            raw = self._serialize({"v": "", "d": self._pick(pool.digests), "i": self._pick(pool.aids),
+                                   "ri": self._pick(pool.digests), "s": self._pick(pool.digests),
+                                   "a": {"d": self._pick(pool.digests), "i": self._pick(pool.aids),
+                                         "dt": "2024-01-01T00:00:00.000000+00:00",
+                                         "LEI": "5493001KJTIIGC8Y1R17"}}, proto="ACDC")
+        return raw + attachments.encode("ascii")
+
+
+def generate_stream(path: str, size: int, mix: Optional[Dict[str, int]] = None, signatures: int = 1,
+                    receipts: int = 0, kind: str = "JSON", seed: int = 0) -> dict:
+    """
+    Writes a synthetic CESR stream of at least `size` bytes.
+
+    Args:
+        path: File to write.
+        size: Target size in bytes; the stream ends after the event that reaches it.
+        mix, signatures, receipts, kind, seed: See `StreamGenerator`.
+
+    Returns:
+        A description of the stream: path, bytes, events and the generation parameters.
+    """
+    generator = StreamGenerator(mix, signatures, receipts, kind, seed)
+    written = events = 0
+    with open(path, "wb", buffering=1024 * 1024) as f:
+        while written < size:
+            data = generator.event()
+            f.write(data)
+            written += len(data)
+            events += 1
+    return {"path": path, "bytes": written, "events": events, "kind": kind, "mix": generator.mix,
+            "signatures": signatures, "receipts": receipts, "seed": seed}
+
+
+def stream_name(size: int, mix: Optional[Dict[str, int]] = None, signatures: int = 1, receipts: int = 0,
+                kind: str = "JSON", seed: int = 0) -> str:
+    """ A file name identifying a generated stream by its parameters, so runs can reuse it. """
+    params = json.dumps([mix or DEFAULT_MIX, seed], sort_keys=True).encode("utf-8")
+    for unit in ("GB", "MB", "KB"):
+        if size >= SIZE_UNITS[unit] and size % SIZE_UNITS[unit] == 0:
+            label = f"{size // SIZE_UNITS[unit]}{unit}"
+            break
+    else:
+        label = f"{size}B"
+    digest = hashlib.blake2b(params, digest_size=4).hexdigest()
+    return f"synthetic-{label}-{kind.lower()}-s{signatures}-r{receipts}-{digest}.cesr"
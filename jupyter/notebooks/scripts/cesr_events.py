@@ -0,0 +1,268 @@
+import argparse
+import json
+import mmap
+import os
+import sys
+from array import array
+from collections import Counter
+from typing import Dict, Iterator, List, Optional
+
+from scripts.format_cesr import CesrEvent, CesrParseError, decode_body, iter_cesr_events
+
+# Aggregate statistics over a large dump without holding every event as a dict:
+# python -m scripts.cesr_events witness-kel.cesr --top 10
+#
+# from scripts.cesr_events import load_event_table
+# with load_event_table("witness-kel.cesr") as table:
+#     print(table.events_per_aid().most_common(5))
+#     print(table.rotation_frequency(), table.receipt_counts())
+#     print(table[0].body)
+
+
+# --- Constants ---
+NO_SN = -1 # Stored in the sn column for messages without a (parseable) sequence number
+ROTATION_ILKS = ("rot", "drt")
+RECEIPT_CODES = ("-B", "-C", "-D", "-F") # Witness signatures and receipt couples/groups
+KINDS = ("JSON", "CBOR", "MGPK")
+
+
+def _count_receipts(groups: List[dict]) -> int:
+    """ Number of receipts (witness signatures, receipt couples and groups) in decoded attachments. """
+    count = 0
+    for group in groups:
+        if "groups" in group:
+            count += _count_receipts(group["groups"])
+        elif group["code"] in RECEIPT_CODES:
+            count += len(group.get("items", []))
+    return count
+
+
+class EventRecord:
+    """
+    One row of an `EventTable`. The body is not decoded until `body` is read,
+    and `body_view` is a zero-copy memoryview into the dump.
+    """
+    __slots__ = ("index", "start", "body_end", "end", "prefix", "sn", "ilk", "kind", "receipts", "_buffer")
+
+    def __init__(self, index, start, body_end, end, prefix, sn, ilk, kind, receipts, buffer):
+        self.index = index
+        self.start = start
+        self.body_end = body_end
+        self.end = end
+        self.prefix = prefix
+        self.sn = sn
+        self.ilk = ilk
+        self.kind = kind
+        self.receipts = receipts
+        self._buffer = buffer
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start
+
+    @property
+    def body_view(self) -> memoryview:
+        return memoryview(self._buffer)[self.start:self.body_end]
+
+    @property
+    def body(self):
+        return decode_body(bytes(self.body_view), self.kind)
+
+    def __repr__(self):
+        return (f"EventRecord(index={self.index}, ilk={self.ilk!r}, prefix={self.prefix!r}, sn={self.sn}, "
+                f"start={self.start}, size={self.size}, receipts={self.receipts})")
+
+
+class EventTable:
+    """
+    Columnar, compact store of the events of a CESR dump for analytics.
+
+    Each event costs a fixed ~32 bytes across typed `array` columns (offsets,
+    sizes, sn, receipt count) plus interned prefix and ilk ids, instead of a
+    decoded dict per event. Bodies stay in the dump buffer (normally a memory
+    map) and are only sliced or decoded on demand through `EventRecord`.
+    """
+
+    def __init__(self, buffer=b""):
+        self.buffer = buffer
+        self.starts = array("Q")
+        self.body_sizes = array("I")
+        self.sizes = array("I")
+        self.sns = array("q")
+        self.prefix_ids = array("I")
+        self.ilk_ids = array("B")
+        self.kind_ids = array("B")
+        self.receipts = array("H")
+        self.prefixes: List[Optional[str]] = [None] # id 0 is "no prefix"
+        self.ilks: List[Optional[str]] = [None]
+        self._prefix_ids: Dict[str, int] = {}
+        self._ilk_ids: Dict[str, int] = {}
+
+    def close(self):
+        """ Closes the underlying memory map. Records and body views must be released first. """
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, i: int) -> EventRecord:
+        if i < 0:
+            i += len(self)
+        start = self.starts[i]
+        sn = self.sns[i]
+        return EventRecord(i + 1, start, start + self.body_sizes[i], start + self.sizes[i],
+                           self.prefixes[self.prefix_ids[i]], None if sn == NO_SN else sn,
+                           self.ilks[self.ilk_ids[i]], KINDS[self.kind_ids[i]], self.receipts[i], self.buffer)
+
+    def __iter__(self) -> Iterator[EventRecord]:
+        for i in range(len(self)):
+            yield self[i]
+
+    # --- Loading ---
+
+    def _intern(self, value: Optional[str], values: List[Optional[str]], ids: Dict[str, int]) -> int:
+        if value is None:
+            return 0
+        value_id = ids.get(value)
+        if value_id is None:
+            value_id = ids[value] = len(values)
+            values.append(value)
+        return value_id
+
+    def append(self, event: CesrEvent):
+        """ Adds a parsed event; its decoded body is only used to read 'i', 's' and 't' and is then dropped. """
+        prefix, sn, ilk = None, NO_SN, None
+        try:
+            body = decode_body(event.raw, event.kind)
+        except Exception as e:
+            print(f"Warning: Failed to decode body of event {event.index} at position {event.start}: {e}",
+                  file=sys.stderr)
+            body = None
+        if isinstance(body, dict):
+            prefix, ilk = body.get("i"), body.get("t")
+            try:
+                sn = int(body["s"], 16)
+            except (KeyError, TypeError, ValueError):
+                pass
+            if not 0 <= sn < 2 ** 63:
+                sn = NO_SN
+        if len(self.ilks) > 0xFF and ilk not in self._ilk_ids:
+            ilk = None # Not a KERI/ACDC message type; keeps the ilk column to one byte
+        self.starts.append(event.start)
+        self.body_sizes.append(event.body_end - event.start)
+        self.sizes.append(event.size)
+        self.sns.append(sn)
+        self.prefix_ids.append(self._intern(prefix, self.prefixes, self._prefix_ids))
+        self.ilk_ids.append(self._intern(ilk, self.ilks, self._ilk_ids))
+        self.kind_ids.append(KINDS.index(event.kind))
+        self.receipts.append(min(_count_receipts(event.attachment_groups), 0xFFFF))
+
+    # --- Queries ---
+
+    def records(self, prefix: Optional[str] = None, ilk: Optional[str] = None) -> Iterator[EventRecord]:
+        """ Yields the events of an AID and/or of a type, in stream order. """
+        prefix_id = self._prefix_ids.get(prefix) if prefix is not None else None
+        ilk_id = self._ilk_ids.get(ilk) if ilk is not None else None
+        if (prefix is not None and prefix_id is None) or (ilk is not None and ilk_id is None):
+            return
+        for i in range(len(self)):
+            if (prefix_id is None or self.prefix_ids[i] == prefix_id) and (ilk_id is None or self.ilk_ids[i] == ilk_id):
+                yield self[i]
+
+    def ilk_counts(self) -> Counter:
+        """ Number of messages of each type. """
+        return Counter({self.ilks[ilk_id]: n for ilk_id, n in Counter(self.ilk_ids).items()})
+
+    def events_per_aid(self) -> Counter:
+        """ Number of messages per AID prefix ('i' field). """
+        counts = Counter(self.prefix_ids)
+        counts.pop(0, None)
+        return Counter({self.prefixes[prefix_id]: n for prefix_id, n in counts.items()})
+
+    def rotation_frequency(self) -> Counter:
+        """ Number of rotations (rot and drt) per AID prefix. """
+        rotation_ids = {self._ilk_ids[ilk] for ilk in ROTATION_ILKS if ilk in self._ilk_ids}
+        counts = Counter(prefix_id for prefix_id, ilk_id in zip(self.prefix_ids, self.ilk_ids)
+                         if ilk_id in rotation_ids)
+        return Counter({self.prefixes[prefix_id]: n for prefix_id, n in counts.items()})
+
+    def receipt_counts(self) -> Counter:
+        """
+        Receipts per AID prefix: witness signatures and receipt couples attached
+        to its events plus those carried by 'rct' messages about it.
+        """
+        counts = Counter()
+        for prefix_id, receipts in zip(self.prefix_ids, self.receipts):
+            if receipts and prefix_id:
+                counts[prefix_id] += receipts
+        return Counter({self.prefixes[prefix_id]: n for prefix_id, n in counts.items()})
+
+    def summary(self, top: int = 10) -> dict:
+        """ Totals plus the `top` AIDs by events, rotations and receipts. """
+        return {
+            "events": len(self),
+            "bytes": sum(self.sizes),
+            "aids": len(self.prefixes) - 1,
+            "types": dict(self.ilk_counts().most_common()),
+            "events_per_aid": dict(self.events_per_aid().most_common(top)),
+            "rotations_per_aid": dict(self.rotation_frequency().most_common(top)),
+            "receipts_per_aid": dict(self.receipt_counts().most_common(top)),
+        }
+
+
+def load_event_table(dump_path: str) -> EventTable:
+    """
+    Scans a CESR dump into an `EventTable` backed by a read-only memory map of
+    the file. A truncated or corrupt tail stops the scan with a warning.
+
+    Args:
+        dump_path: Path to the CESR dump file.
+
+    Returns:
+        The table; close it (or use it as a context manager) to release the map.
+    """
+    with open(dump_path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(dump_path) else b""
+    table = EventTable(buffer)
+    try:
+        for event in iter_cesr_events(buffer):
+            table.append(event)
+    except CesrParseError as e:
+        print(f"Warning: Stopped loading {dump_path} at position {e.offset}: {e}", file=sys.stderr)
+    return table
+
+
+# --- CLI ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize the events of a CESR dump per type and AID.")
+    parser.add_argument("dump", help="Path to the CESR dump file.")
+    parser.add_argument("--top", type=int, default=10, help="AIDs listed per statistic.")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+    args = parser.parse_args(argv)
+
+    with load_event_table(args.dump) as table:
+        summary = table.summary(top=args.top)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return 0
+
+    print(f"{summary['events']} events ({summary['bytes']} bytes) from {summary['aids']} AIDs in {args.dump}")
+    print("Types: " + ", ".join(f"{ilk}={n}" for ilk, n in summary["types"].items()))
+    for title, key in (("Events", "events_per_aid"), ("Rotations", "rotations_per_aid"),
+                       ("Receipts", "receipts_per_aid")):
+        print(f"\n{title} per AID:")
+        for prefix, n in summary[key].items():
+            print(f"  {n:>10}  {prefix}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+import argparse
+import mmap
+import os
+import sqlite3
+import sys
+from collections import namedtuple
+from typing import Iterator, List, Optional
+
+from scripts.files import file_digest
+from scripts.format_cesr import CesrEvent, CesrParseError, iter_cesr_events, iter_format_event
+
+# Build once, then look events up without reparsing the dump:
+# python -m scripts.cesr_index build witness-kel.cesr
+# python -m scripts.cesr_index show witness-kel.cesr --aid EJcceEYdyHdynNaztmRgWkOZ86MIgFqj8gr9ML878o3x --sn 4123
+#
+# from scripts.cesr_index import CesrIndex
+# with CesrIndex("witness-kel.cesr") as index:
+#     for event in index.events(said="EG5T2SWm7XpBXTQZBj5w_16TVKhv_S-a_Pr1HXECCOQl"):
+#         print(event.body)
+
+
+# --- Constants ---
+INDEX_SUFFIX = ".idx" # Sidecar index is written next to the dump as <dump>.idx
+INSERT_BATCH_SIZE = 10_000 # Rows written per executemany call while scanning
+HEAD_DIGEST_SIZE = 4096 # Bytes of the dump hashed to detect it was replaced rather than appended to
+
+IndexEntry = namedtuple("IndexEntry", "index start end prefix sn said ilk")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+CREATE TABLE IF NOT EXISTS prefixes (id INTEGER PRIMARY KEY, prefix TEXT UNIQUE NOT NULL);
+CREATE TABLE IF NOT EXISTS events (
+    idx INTEGER PRIMARY KEY,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    prefix_id INTEGER,
+    sn INTEGER,
+    said TEXT,
+    ilk TEXT
+);
+CREATE INDEX IF NOT EXISTS events_prefix_sn ON events (prefix_id, sn);
+CREATE INDEX IF NOT EXISTS events_said ON events (said);
+CREATE INDEX IF NOT EXISTS events_ilk ON events (ilk);
+"""
+
+
+# --- Helpers ---
+
+def head_digest(dump_path: str, size: int = HEAD_DIGEST_SIZE) -> str:
+    """ Digest of the first `size` bytes of the dump, to tell it apart from a replaced dump. """
+    return file_digest(dump_path, size)
+
+
+def _connect(index_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(index_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _get_meta(conn: sqlite3.Connection, key: str, default=None):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return default if row is None else row[0]
+
+
+def _set_meta(conn: sqlite3.Connection, **values):
+    conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", values.items())
+
+
+def _event_keys(event: CesrEvent):
+    """ Extracts (prefix, sn, said, ilk) from a body; fields a message type lacks are None. """
+    try:
+        body = event.body
+    except CesrParseError as e: # Still indexed by offset so it can be inspected later
+        print(f"Warning: {e}")
+        return None, None, None, None
+    if not isinstance(body, dict):
+        return None, None, None, None
+    sn = body.get("s")
+    try:
+        sn = int(sn, 16) if isinstance(sn, str) else None
+    except ValueError:
+        sn = None
+    return body.get("i"), sn, body.get("d"), body.get("t")
+
+
+# --- Index Building ---
+
+def build_cesr_index(dump_path: str, index_path: Optional[str] = None, rebuild: bool = False) -> str:
+    """
+    Scans a CESR dump once and writes a sidecar index mapping (prefix, sn),
+    event SAID and event type to the byte offsets of each event.
+
+    When the dump has only grown since the last build (same leading bytes,
+    larger size), scanning resumes where the previous build stopped, so
+    indexing an appended-to export only costs the new tail. A truncated event
+    at the end of the dump (still being written) is left for the next build.
+
+    Args:
+        dump_path: Path to the CESR dump file.
+        index_path: Where to write the index; defaults to `<dump_path>.idx`.
+        rebuild: Discard any existing index and scan from the start.
+
+    Returns:
+        The path of the index file.
+    """
+    index_path = index_path or dump_path + INDEX_SUFFIX
+    if rebuild and os.path.exists(index_path):
+        os.remove(index_path)
+
+    dump_stat = os.stat(dump_path)
+    dump_size = dump_stat.st_size
+    conn = _connect(index_path)
+    try:
+        scanned_end = _get_meta(conn, "scanned_end", 0)
+        count = _get_meta(conn, "count", 0)
+        indexed_size = _get_meta(conn, "size", 0)
+        stored_digest = _get_meta(conn, "head_digest")
+        if dump_size < indexed_size or (stored_digest is not None and
+                                        stored_digest != head_digest(dump_path, min(HEAD_DIGEST_SIZE, indexed_size))):
+            print(f"Dump {dump_path} changed since it was indexed. Rebuilding {index_path}.")
+            conn.executescript("DELETE FROM events; DELETE FROM prefixes; DELETE FROM meta;")
+            scanned_end, count = 0, 0
+
+        prefix_ids = dict(conn.execute("SELECT prefix, id FROM prefixes"))
+        rows = []
+
+        def flush():
+            conn.executemany("INSERT INTO events (idx, start, end, prefix_id, sn, said, ilk) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            rows.clear()
+
+        with open(dump_path, "rb") as f:
+            f.seek(scanned_end)
+            try:
+                for event in iter_cesr_events(f, offset=scanned_end, start_index=count + 1):
+                    prefix, sn, said, ilk = _event_keys(event)
+                    prefix_id = None
+                    if prefix is not None:
+                        prefix_id = prefix_ids.get(prefix)
+                        if prefix_id is None:
+                            prefix_id = conn.execute("INSERT INTO prefixes (prefix) VALUES (?)", (prefix,)).lastrowid
+                            prefix_ids[prefix] = prefix_id
+                    rows.append((event.index, event.start, event.end, prefix_id, sn, said, ilk))
+                    scanned_end, count = event.end, event.index
+                    if len(rows) >= INSERT_BATCH_SIZE:
+                        flush()
+            except CesrParseError as e:
+                print(f"Warning: Stopped indexing {dump_path} at position {e.offset}: {e}")
+        flush()
+        _set_meta(conn, scanned_end=scanned_end, count=count, size=dump_size, mtime_ns=dump_stat.st_mtime_ns,
+                  head_digest=head_digest(dump_path, min(HEAD_DIGEST_SIZE, dump_size)))
+        conn.commit()
+    finally:
+        conn.close()
+
+    print(f"Indexed {count} events of {dump_path} into {index_path}")
+    return index_path
+
+
+def index_is_current(dump_path: str, index_path: Optional[str] = None) -> bool:
+    """
+    True if the sidecar index exists and covers the dump as it is now: same
+    size and modification time, and the same digest of its first bytes (a
+    dump replaced by one of the same size keeps neither).
+    """
+    index_path = index_path or dump_path + INDEX_SUFFIX
+    if not os.path.exists(index_path):
+        return False
+    dump_stat = os.stat(dump_path)
+    conn = sqlite3.connect(index_path)
+    try:
+        size = _get_meta(conn, "size")
+        if size != dump_stat.st_size or _get_meta(conn, "mtime_ns") != dump_stat.st_mtime_ns:
+            return False
+        return _get_meta(conn, "head_digest") == head_digest(dump_path, min(HEAD_DIGEST_SIZE, size))
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        conn.close()
+
+
+# --- Random Access ---
+
+class CesrIndex:
+    """
+    Random access to the events of a CESR dump through its sidecar index.
+
+    Lookups run against the index and events are read straight out of a
+    memory map of the dump, so only the requested events are ever parsed.
+    """
+
+    def __init__(self, dump_path: str, index_path: Optional[str] = None):
+        self.dump_path = dump_path
+        self.index_path = index_path or dump_path + INDEX_SUFFIX
+        if not os.path.exists(self.index_path):
+            build_cesr_index(dump_path, self.index_path)
+        if not index_is_current(dump_path, self.index_path):
+            print(f"Warning: {self.index_path} is stale, run build_cesr_index to include new events.")
+        self._conn = sqlite3.connect(self.index_path)
+        self._file = open(dump_path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(dump_path) else b""
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return _get_meta(self._conn, "count", 0)
+
+    def find(self, prefix: Optional[str] = None, sn: Optional[int] = None, said: Optional[str] = None,
+             ilk: Optional[str] = None, limit: Optional[int] = None) -> List[IndexEntry]:
+        """
+        Looks up index entries matching all of the given criteria, in stream order.
+        See `iter_entries` for the arguments.
+        """
+        return list(self.iter_entries(prefix=prefix, sn=sn, said=said, ilk=ilk, limit=limit))
+
+    def iter_entries(self, prefix: Optional[str] = None, sn: Optional[int] = None, said: Optional[str] = None,
+                     ilk: Optional[str] = None, limit: Optional[int] = None) -> Iterator[IndexEntry]:
+        """
+        Yields index entries matching all of the given criteria, in stream
+        order, without materializing the result set.
+
+        Args:
+            prefix: AID prefix of the event ('i' field).
+            sn: Sequence number of the event.
+            said: SAID of the event ('d' field).
+            ilk: Event type ('t' field), e.g. 'rot'.
+            limit: Maximum number of entries to return.
+        """
+        clauses, params = [], []
+        for column, value in (("p.prefix", prefix), ("e.sn", sn), ("e.said", said), ("e.ilk", ilk)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        query = ("SELECT e.idx, e.start, e.end, p.prefix, e.sn, e.said, e.ilk "
+                 "FROM events e LEFT JOIN prefixes p ON p.id = e.prefix_id")
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY e.idx"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        for row in self._conn.execute(query, params):
+            yield IndexEntry(*row)
+
+    def event(self, entry: IndexEntry) -> CesrEvent:
+        """ Parses the single event an index entry points at, straight from the memory map. """
+        return next(iter_cesr_events(self._mm[entry.start:entry.end], offset=entry.start, start_index=entry.index))
+
+    def events(self, **criteria) -> Iterator[CesrEvent]:
+        """ Yields the events matching `find(**criteria)`. """
+        for entry in self.find(**criteria):
+            yield self.event(entry)
+
+
+# --- CLI ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query a sidecar offset index for CESR dump files.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Scan a dump and write (or extend) its index.")
+    build_parser.add_argument("dump", help="Path to the CESR dump file.")
+    build_parser.add_argument("--index", help="Index path (default: <dump>.idx).")
+    build_parser.add_argument("--rebuild", action="store_true", help="Discard the existing index first.")
+
+    show_parser = subparsers.add_parser("show", help="Print the events matching the given criteria.")
+    show_parser.add_argument("dump", help="Path to the CESR dump file.")
+    show_parser.add_argument("--index", help="Index path (default: <dump>.idx).")
+    show_parser.add_argument("--aid", help="AID prefix of the events.")
+    show_parser.add_argument("--sn", type=lambda value: int(value, 0), help="Sequence number (decimal or 0x hex).")
+    show_parser.add_argument("--said", help="SAID of the event.")
+    show_parser.add_argument("--type", dest="ilk", help="Event type, e.g. icp, rot, ixn, rpy.")
+    show_parser.add_argument("--limit", type=int, help="Maximum number of events to print.")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        build_cesr_index(args.dump, args.index, rebuild=args.rebuild)
+        return 0
+
+    with CesrIndex(args.dump, args.index) as index:
+        entries = index.find(prefix=args.aid, sn=args.sn, said=args.said, ilk=args.ilk, limit=args.limit)
+        if not entries:
+            print("No matching events.", file=sys.stderr)
+            return 1
+        for entry in entries:
+            print(f"Offset {entry.start}-{entry.end}:")
+            print("\n".join(iter_format_event(index.event(entry))))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+from typing import Dict, Optional
+
+from scripts.cesr_index import HEAD_DIGEST_SIZE, head_digest
+from scripts.files import output_mode
+from scripts.format_cesr import CesrEvent, CesrParseError, iter_cesr_events
+
+# Current key state of every AID in a dump, resuming from the last checkpoint:
+# python -m scripts.cesr_keystate witness-kel.cesr --aid EJcceEYdyHdynNaztmRgWkOZ86MIgFqj8gr9ML878o3x
+#
+# from scripts.cesr_keystate import reduce_key_states
+# states = reduce_key_states("witness-kel.cesr")
+# print(states["EJcceEYdyHdynNaztmRgWkOZ86MIgFqj8gr9ML878o3x"]["keys"])
+
+
+# --- Constants ---
+CHECKPOINT_SUFFIX = ".keystate.json" # Checkpoint is written next to the dump as <dump>.keystate.json
+DEFAULT_CHECKPOINT_EVERY = 100_000 # Events between checkpoints during a long reduction
+KEL_ILKS = ("icp", "dip", "rot", "drt", "ixn")
+INCEPTION_ILKS = ("icp", "dip")
+ROTATION_ILKS = ("rot", "drt")
+
+
+class KeyStateReducer:
+    """
+    Folds key events into the current key state of each AID without
+    validating them (use a Kevery or scripts.cesr_verify for that).
+
+    The state of an AID is a dict with its last 'sn' and event 'said'/'ilk',
+    current signing 'keys' and 'signing_threshold', 'next_digests' and
+    'next_threshold', 'witnesses' and 'witness_threshold', 'delegator' and the
+    'last_establishment' {sn, said}. A rotation at an sn already taken by an
+    interaction event after the last establishment event is a recovery: it
+    replaces that event and the ones after it, and is counted in
+    `recoveries`. Other events that do not extend a KEL (repeats, or events
+    after a gap) are counted in `duplicates`/`gaps` and skipped.
+    """
+
+    def __init__(self, states: Optional[Dict[str, dict]] = None):
+        self.states: Dict[str, dict] = states if states is not None else {}
+        self.events = 0
+        self.duplicates = 0
+        self.gaps = 0
+        self.recoveries = 0
+
+    def apply(self, body: dict) -> bool:
+        """ Applies one message body. Returns True if it changed a key state. """
+        ilk = body.get("t")
+        if ilk not in KEL_ILKS:
+            return False
+        try:
+            prefix, sn = body["i"], int(body["s"], 16)
+        except (KeyError, TypeError, ValueError):
+            self.gaps += 1
+            return False
+        self.events += 1
+        state = self.states.get(prefix)
+
+        if ilk in INCEPTION_ILKS:
+            if state is not None:
+                self.duplicates += 1
+                return False
+            state = self.states[prefix] = {
+                "witnesses": list(body.get("b", [])),
+                "delegator": body.get("di"),
+                "config": list(body.get("c", [])),
+            }
+        elif state is None or sn > state["sn"] + 1:
+            self.gaps += 1
+            return False
+        elif sn <= state["sn"]:
+            if ilk not in ROTATION_ILKS or sn <= state["last_establishment"]["sn"]:
+                self.duplicates += 1
+                return False
+            self.recoveries += 1
+
+        if ilk in INCEPTION_ILKS or ilk in ROTATION_ILKS:
+            if ilk in ROTATION_ILKS:
+                removed = set(body.get("br", []))
+                state["witnesses"] = [wit for wit in state["witnesses"] if wit not in removed] + list(body.get("ba", []))
+            state.update(keys=list(body.get("k", [])),
+                         signing_threshold=body.get("kt"),
+                         next_digests=list(body.get("n", [])),
+                         next_threshold=body.get("nt"),
+                         witness_threshold=body.get("bt"),
+                         last_establishment={"sn": sn, "said": body.get("d")})
+        state.update(sn=sn, said=body.get("d"), ilk=ilk)
+        return True
+
+    def apply_event(self, event: CesrEvent) -> bool:
+        """ Applies a parsed CESR event, skipping bodies that fail to decode. """
+        try:
+            body = event.body
+        except CesrParseError as e:
+            print(f"Warning: {e}", file=sys.stderr)
+            return False
+        return isinstance(body, dict) and self.apply(body)
+
+
+# --- Checkpoints ---
+
+def load_checkpoint(checkpoint_path: str) -> Optional[dict]:
+    """ Reads a checkpoint, or returns None if there is none or it is unreadable. """
+    try:
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"Warning: Ignoring unreadable checkpoint {checkpoint_path}: {e}", file=sys.stderr)
+        return None
+
+
+def save_checkpoint(checkpoint_path: str, checkpoint: dict):
+    """ Writes a checkpoint atomically so an interrupted save never leaves a torn file. """
+    directory = os.path.dirname(os.path.abspath(checkpoint_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".keystate-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, separators=(",", ":"))
+        os.chmod(temp_path, output_mode(checkpoint_path))
+        os.replace(temp_path, checkpoint_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+# --- Reduction ---
+
+def reduce_key_states(dump_path: str, checkpoint_path: Optional[str] = None,
+                      checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY, resume: bool = True) -> Dict[str, dict]:
+    """
+    Computes the current key state of every AID in a CESR dump.
+
+    Progress is checkpointed every `checkpoint_every` events and at the end.
+    When the dump has only been appended to since the last checkpoint (same
+    leading bytes, no shorter), reduction resumes from the checkpoint and
+    only the new tail is read.
+
+    Args:
+        dump_path: Path to the CESR dump file.
+        checkpoint_path: Where to keep the checkpoint; defaults to `<dump_path>.keystate.json`.
+        checkpoint_every: Events between intermediate checkpoints.
+        resume: Set False to ignore an existing checkpoint and start over.
+
+    Returns:
+        Key state per AID prefix (see `KeyStateReducer`).
+    """
+    checkpoint_path = checkpoint_path or dump_path + CHECKPOINT_SUFFIX
+    dump_size = os.path.getsize(dump_path)
+    checkpoint = load_checkpoint(checkpoint_path) if resume else None
+    if checkpoint is not None:
+        head_size = min(HEAD_DIGEST_SIZE, checkpoint["size"])
+        if dump_size < checkpoint["offset"] or checkpoint["head_digest"] != head_digest(dump_path, head_size):
+            print(f"Dump {dump_path} changed since the last checkpoint. Reducing from the start.", file=sys.stderr)
+            checkpoint = None
+
+    offset = checkpoint["offset"] if checkpoint else 0
+    count = checkpoint["count"] if checkpoint else 0
+    reducer = KeyStateReducer(checkpoint["states"] if checkpoint else None)
+
+    def checkpoint_now():
+        save_checkpoint(checkpoint_path, {
+            "offset": offset,
+            "count": count,
+            "size": dump_size,
+            "head_digest": head_digest(dump_path, min(HEAD_DIGEST_SIZE, dump_size)),
+            "states": reducer.states,
+        })
+
+    with open(dump_path, "rb") as f:
+        f.seek(offset)
+        try:
+            for event in iter_cesr_events(f, offset=offset, start_index=count + 1):
+                reducer.apply_event(event)
+                offset, count = event.end, event.index
+                if count % checkpoint_every == 0:
+                    checkpoint_now()
+        except CesrParseError as e: # Typically an event still being appended; picked up next time
+            print(f"Warning: Stopped reducing {dump_path} at position {e.offset}: {e}", file=sys.stderr)
+    checkpoint_now()
+
+    if reducer.duplicates or reducer.gaps:
+        print(f"Skipped {reducer.duplicates} repeated and {reducer.gaps} out of order key events.", file=sys.stderr)
+    if reducer.recoveries:
+        print(f"Applied {reducer.recoveries} recovery rotations superseding interaction events.", file=sys.stderr)
+    return reducer.states
+
+
+# --- CLI ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the current key state of every AID in a CESR dump.")
+    parser.add_argument("dump", help="Path to the CESR dump file.")
+    parser.add_argument("--checkpoint", help="Checkpoint path (default: <dump>.keystate.json).")
+    parser.add_argument("--every", type=int, default=DEFAULT_CHECKPOINT_EVERY, help="Events between checkpoints.")
+    parser.add_argument("--restart", action="store_true", help="Ignore the existing checkpoint.")
+    parser.add_argument("--aid", help="Only print the key state of this AID.")
+    args = parser.parse_args(argv)
+
+    states = reduce_key_states(args.dump, args.checkpoint, checkpoint_every=args.every, resume=not args.restart)
+    if args.aid:
+        if args.aid not in states:
+            print(f"No key events for {args.aid} in {args.dump}", file=sys.stderr)
+            return 1
+        states = {args.aid: states[args.aid]}
+    print(json.dumps(states, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
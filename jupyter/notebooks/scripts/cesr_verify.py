@@ -0,0 +1,306 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from scripts.format_cesr import CesrEvent, CesrParseError, iter_cesr_events
+
+# Audit every signature and receipt in an exported KEL:
+# python -m scripts.cesr_verify witness-kel.cesr --jobs 0
+#
+# from scripts.cesr_verify import verify_cesr
+# report = verify_cesr("witness-kel.cesr")
+# print(report["signatures_per_second"], report["failures"])
+
+
+# --- Constants ---
+DEFAULT_BATCH_SIZE = 512 # Signatures handed to a worker per task
+RECEIPTED_CACHE_SIZE = 100_000 # Recent event bodies kept so later 'rct' messages can be checked against them
+ESTABLISHMENT_ILKS = ("icp", "dip", "rot", "drt")
+PATH_SIG_CODES = ("-J", "-K") # SAD path signatures sign part of a body and are not checked here
+
+
+# --- Key State ---
+
+class _KeyStates:
+    """
+    Signing keys and witnesses established so far in the stream, per AID.
+    Keys are also remembered per establishment event so transferable receipts
+    and signature groups can name the (sn, digest) they were made with.
+    """
+
+    def __init__(self):
+        self.current: Dict[str, dict] = {}
+        self.established: Dict[Tuple[str, int], dict] = {}
+
+    def apply(self, body: dict, sn: int):
+        if body.get("t") not in ESTABLISHMENT_ILKS:
+            return
+        prefix = body["i"]
+        witnesses = list(body.get("b", []))
+        if body["t"] in ("rot", "drt"):
+            previous = self.current.get(prefix, {}).get("witnesses", [])
+            removed = set(body.get("br", []))
+            witnesses = [wit for wit in previous if wit not in removed] + list(body.get("ba", []))
+        state = {"keys": list(body.get("k", [])), "witnesses": witnesses, "said": body.get("d")}
+        self.current[prefix] = state
+        self.established[(prefix, sn)] = state
+
+
+# --- Signature Collection ---
+
+def _leaf_groups(groups: List[dict]) -> Iterator[dict]:
+    """ Flattens quadlet wrapper groups such as -V into the groups they contain. """
+    for group in groups:
+        if "groups" in group:
+            yield from _leaf_groups(group["groups"])
+        else:
+            yield group
+
+
+def _collect_checks(event: CesrEvent, body: dict, states: _KeyStates) -> Tuple[List[tuple], List[dict]]:
+    """
+    Pairs every signature attached to an event with the key it must verify against.
+
+    Returns:
+        (checks, unverifiable). Each check is (label, signer, index, key qb64,
+        signature qb64, indexed). Signatures whose key is not known from the
+        stream are returned as unverifiable problem records.
+    """
+    checks, unverifiable = [], []
+    prefix = body.get("i")
+    state = states.current.get(prefix)
+
+    def missing(label, signer, reason, index=None):
+        unverifiable.append({"label": label, "signer": signer, "index": index, "reason": reason})
+
+    for group in _leaf_groups(event.attachment_groups):
+        code = group["code"]
+        if code in PATH_SIG_CODES:
+            continue
+        for item in group.get("items", []):
+            if code == "-A":
+                keys = state["keys"] if state else None
+                if keys is None:
+                    missing("controller", prefix, "no key state for AID in stream", item["index"])
+                elif item["index"] >= len(keys):
+                    missing("controller", prefix, f"signature index {item['index']} out of range", item["index"])
+                else:
+                    checks.append(("controller", prefix, item["index"], keys[item["index"]], item["signature"], True))
+            elif code == "-B":
+                witnesses = state["witnesses"] if state else []
+                if item["index"] >= len(witnesses):
+                    missing("witness", prefix, f"no witness at index {item['index']}", item["index"])
+                else:
+                    # Witness identifiers are non-transferable, so the prefix is the public key
+                    witness = witnesses[item["index"]]
+                    checks.append(("witness", witness, item["index"], witness, item["signature"], True))
+            elif code == "-C":
+                checks.append(("receipt", item["prefix"], None, item["prefix"], item["signature"], False))
+            elif code in ("-D", "-F"):
+                signer_state = states.established.get((item["prefix"], item["sn"]))
+                if code == "-D":
+                    signatures = [item]
+                else:
+                    signatures = item["signatures"]["items"]
+                for signature in signatures:
+                    if signer_state is None:
+                        missing("endorser", item["prefix"], f"no establishment event sn={item['sn']} in stream",
+                                signature["index"])
+                    elif signer_state["said"] != item["digest"]:
+                        missing("endorser", item["prefix"], "establishment event digest does not match",
+                                signature["index"])
+                    elif signature["index"] >= len(signer_state["keys"]):
+                        missing("endorser", item["prefix"], f"signature index {signature['index']} out of range",
+                                signature["index"])
+                    else:
+                        checks.append(("endorser", item["prefix"], signature["index"],
+                                       signer_state["keys"][signature["index"]], signature["signature"], True))
+            elif code == "-H":
+                signer_state = states.current.get(item["prefix"])
+                for signature in item["signatures"]["items"]:
+                    if signer_state is None or signature["index"] >= len(signer_state["keys"]):
+                        missing("endorser", item["prefix"], "no key state for signer in stream", signature["index"])
+                    else:
+                        checks.append(("endorser", item["prefix"], signature["index"],
+                                       signer_state["keys"][signature["index"]], signature["signature"], True))
+    return checks, unverifiable
+
+
+# --- Verification Workers ---
+
+_verfers = {} # Per worker process cache of Verfer instances by key
+
+
+def _verify_batch(batch: List[Tuple[dict, bytes, List[tuple]]]) -> Tuple[int, List[dict]]:
+    """
+    Worker task: verifies the signatures of a batch of events.
+
+    Args:
+        batch: (event info, signed bytes, checks) per event.
+
+    Returns:
+        (number of signatures checked, failure records).
+    """
+    from keri.core.coring import Matter, Verfer
+    try:
+        from keri.core.indexing import Indexer
+    except ImportError: # keri < 1.2 keeps Indexer in coring
+        from keri.core.coring import Indexer
+
+    checked, failures = 0, []
+    for info, ser, checks in batch:
+        for label, signer, index, key, signature, indexed in checks:
+            checked += 1
+            try:
+                verfer = _verfers.get(key)
+                if verfer is None:
+                    verfer = _verfers[key] = Verfer(qb64=key)
+                raw = Indexer(qb64=signature).raw if indexed else Matter(qb64=signature).raw
+                valid = verfer.verify(raw, ser)
+                reason = None if valid else "signature does not verify"
+            except Exception as e:
+                valid, reason = False, f"could not verify: {e}"
+            if not valid:
+                failures.append(dict(info, label=label, signer=signer, index=index, reason=reason))
+    return checked, failures
+
+
+def _iter_batches(path: str, batch_size: int, report: dict) -> Iterator[list]:
+    """
+    Walks the stream once, tracking key state and pairing signatures with keys,
+    and yields batches of about `batch_size` signatures for the workers.
+    """
+    states = _KeyStates()
+    receipted = OrderedDict() # said -> raw body of recent events, for 'rct' messages
+    batch, batch_signatures = [], 0
+
+    with open(path, "rb") as f:
+        try:
+            for event in iter_cesr_events(f):
+                report["events"] += 1
+                info = {"event": event.index, "start": event.start}
+                try:
+                    body = event.body
+                except CesrParseError as e:
+                    report["unverifiable"].append(dict(info, reason=str(e)))
+                    continue
+                if not isinstance(body, dict):
+                    continue
+                try:
+                    sn = int(body["s"], 16) if isinstance(body.get("s"), str) else None
+                except ValueError:
+                    sn = None
+                info.update(prefix=body.get("i"), sn=sn, said=body.get("d"), ilk=body.get("t"))
+
+                # Establishment events are signed with their own keys, so apply them first
+                states.apply(body, sn)
+
+                ser = event.raw
+                if body.get("t") == "rct": # Receipts sign the receipted event, not the receipt message
+                    ser = receipted.get(body.get("d"))
+                    if ser is None:
+                        report["unverifiable"].append(dict(info, reason="receipted event not found in stream"))
+                        continue
+                elif body.get("d"):
+                    receipted[body["d"]] = event.raw
+                    if len(receipted) > RECEIPTED_CACHE_SIZE:
+                        receipted.popitem(last=False)
+
+                checks, unverifiable = _collect_checks(event, body, states)
+                report["unverifiable"].extend(dict(info, **problem) for problem in unverifiable)
+                if checks:
+                    batch.append((info, ser, checks))
+                    batch_signatures += len(checks)
+                if batch_signatures >= batch_size:
+                    yield batch
+                    batch, batch_signatures = [], 0
+        except CesrParseError as e:
+            report["unverifiable"].append({"event": None, "start": e.offset, "reason": str(e)})
+    if batch:
+        yield batch
+
+
+# --- Verification ---
+
+def verify_cesr(path: str, workers: Optional[int] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """
+    Verifies every controller signature, witness signature and receipt in a
+    CESR file against the keys established earlier in the same stream.
+
+    The stream is parsed once in this process while batches of signatures are
+    verified concurrently in a worker pool (at most two batches per worker in
+    flight, so memory stays bounded).
+
+    Args:
+        path: Path to the CESR file.
+        workers: Number of worker processes (defaults to one per CPU).
+        batch_size: Signatures per worker task.
+
+    Returns:
+        A report dict with counts of events and signatures, the failures and
+        unverifiable signatures (each with event number, offset, prefix, sn,
+        said, type, signer and reason), elapsed seconds and signatures per second.
+    """
+    workers = workers or os.cpu_count() or 1
+    report = {"path": path, "events": 0, "signatures": 0, "failures": [], "unverifiable": []}
+    started = time.perf_counter()
+    pending = deque()
+
+    def collect():
+        checked, failures = pending.popleft().result()
+        report["signatures"] += checked
+        report["failures"].extend(failures)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for batch in _iter_batches(path, batch_size, report):
+            pending.append(executor.submit(_verify_batch, batch))
+            if len(pending) >= workers * 2:
+                collect()
+        while pending:
+            collect()
+
+    report["failures"].sort(key=lambda failure: failure["event"])
+    report["seconds"] = time.perf_counter() - started
+    report["signatures_per_second"] = report["signatures"] / report["seconds"] if report["seconds"] else 0.0
+    return report
+
+
+def print_report(report: dict):
+    """ Prints a verification report as a short summary followed by each problem. """
+    print(f"Verified {report['signatures']} signatures in {report['events']} events of {report['path']} "
+          f"in {report['seconds']:.2f}s ({report['signatures_per_second']:.0f} signatures/sec)")
+    if not report["failures"] and not report["unverifiable"]:
+        print("✅ All signatures verified.")
+    for failure in report["failures"]:
+        print(f"❌ Event {failure['event']} ({failure.get('ilk')} {failure.get('prefix')} sn={failure.get('sn')} "
+              f"at {failure['start']}): {failure['label']} {failure['signer']}[{failure['index']}] {failure['reason']}")
+    for problem in report["unverifiable"]:
+        print(f"⚠️ Event {problem['event']} at {problem['start']}: {problem.get('label', 'event')} "
+              f"{problem.get('signer', '')} {problem['reason']}")
+
+
+# --- CLI ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify the signatures and receipts in a CESR stream.")
+    parser.add_argument("input", help="CESR file to verify.")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="Worker processes, 0 for one per CPU (default).")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Signatures per worker task.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args(argv)
+
+    report = verify_cesr(args.input, workers=args.jobs or None, batch_size=args.batch_size)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 1 if report["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import hashlib
+import os
+import stat
+from typing import Optional
+
+# File helpers shared by the scripts that write sidecar files and compare file
+# contents (saidify, cesr_index, cesr_keystate, keystore_snapshot). Importing
+# this module does not import keri.
+
+
+# --- Constants ---
+DIGEST_SIZE = 16 # Bytes of blake2b digest used to tell file contents apart
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(filepath: str, size: Optional[int] = None, digest_size: int = DIGEST_SIZE) -> str:
+    """
+    Hex blake2b digest of a file's content, read in chunks.
+
+    Args:
+        filepath: File to digest.
+        size: Digest only the first `size` bytes (the whole file if None).
+        digest_size: Bytes of digest.
+
+    Returns:
+        The hex digest.
+    """
+    digest = hashlib.blake2b(digest_size=digest_size)
+    remaining = size
+    with open(filepath, "rb") as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(READ_CHUNK_SIZE if remaining is None else min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def output_mode(filepath: str) -> int:
+    """
+    Permission bits for a file written under a temporary name: those of the
+    file it replaces, or what `open(filepath, 'w')` would give a new file.
+    """
+    try:
+        return stat.S_IMODE(os.stat(filepath).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
@@ -1,112 +1,900 @@
+import argparse
+import base64
 import json
+import mmap
+import os
+import re
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Iterator, List, Optional, TextIO, Tuple
+
+from keri.core.coring import Matter
+
+try:
+    from keri.core.indexing import Indexer
+except ImportError: # keri < 1.2 keeps Indexer in coring
+    from keri.core.coring import Indexer
 
 # from scripts.format_cesr import format_cesr
 # cesr = exec("curl -s http://witness-demo:5642/oobi/EJcceEYdyHdynNaztmRgWkOZ86MIgFqj8gr9ML878o3x/witness")
 # print(format_cesr(cesr))
+#
+# Large KEL/OOBI dumps (text or qb2 binary, JSON/CBOR/MGPK bodies) can be walked
+# one event at a time without loading them:
+# from scripts.format_cesr import iter_cesr_events
+# with open("witness-kel.cesr", "rb") as f:
+#     for event in iter_cesr_events(f):
+#         print(event.start, event.body["t"], event.body["s"])
+#
+# Or formatted on every core from the command line:
+# python -m scripts.format_cesr witness-kel.cesr --jobs 0 -o witness-kel.txt
+# python -m scripts.format_cesr witness-kel.cesr --verify
+#
+# Or as machine readable records for log analytics (one JSON object per event,
+# or JSON column batches):
+# python -m scripts.format_cesr witness-kel.cesr --format ndjson --jobs 0 -o witness-kel.ndjson
+# python -m scripts.format_cesr witness-kel.cesr --format columnar --no-body
+
+
+# --- Constants ---
+DEFAULT_CHUNK_SIZE = 64 * 1024 # Bytes pulled from a file or chunk iterator per read
+DEFAULT_PARALLEL_CHUNK_SIZE = 8 * 1024 * 1024 # Bytes of whole events handed to each worker task
+VERSION_STRING_SIZE = 17 # e.g. KERI10JSON00012b_
+MAX_VERSION_OFFSET = 12 # The version string must start within this many bytes of the body start
+SEPARATOR = "-" * 60
+OUTPUT_FORMATS = ("text", "ndjson", "columnar")
+DEFAULT_COLUMN_BATCH_SIZE = 10_000 # Events per column batch in the columnar output
+RECORD_COLUMNS = ("index", "offset", "size", "body_size", "kind", "ilk", "prefix", "sn", "said", "attachments")
+TXT = "txt" # Attachments in the qb64 text domain
+BNY = "bny" # Attachments in the qb2 binary domain
+
+# Version string of a KERI/ACDC v1 message body, e.g. KERI10JSON00012b_ (size is hex bytes)
+VERSION_RE = re.compile(rb'(?P<proto>[A-Z]{4})(?P<major>[0-9a-f])(?P<minor>[0-9a-f])'
+                        rb'(?P<kind>[A-Z]{4})(?P<size>[0-9a-f]{6})_')
+WHITESPACE = b" \t\r\n"
+
+# Cold start tritets: the top three bits of the first byte tell what comes next
+COLD_COUNT_CODE = 0o1 # Base64 count code ('-')
+COLD_COUNT_CODE_BINARY = 0o7 # qb2 count code
+COLD_MESSAGE = (0o4, 0o5, 0o6) # MGPK fixmap, CBOR map, MGPK map16/32 (JSON must start with '{')
+COLD_DOMAINS = {COLD_COUNT_CODE: TXT, COLD_COUNT_CODE_BINARY: BNY}
+
+B64_INDEX = {char: i for i, char in
+             enumerate("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_")}
+DATETIME_B64_TRANSLATION = str.maketrans("cdp", ":.+") # Dater qb64 to ISO-8601
+
+# CESR v1 attachment count codes: code -> (name, layout of each counted item).
+# Items are made of "matter" and "indexed" (signature) primitives or a nested
+# "group". Quadlet groups count 4 char quadlets of nested groups instead of items.
+QUADLET_LAYOUT = "quadlets"
+GENUS_LAYOUT = "genus"
+CTR_PATHED_MATERIAL = "-L"
+CTR_SAD_PATH_SIG_GROUP = "-K"
+COUNTER_CODES = {
+    "-A": ("ControllerIdxSigs", (("signature", "indexed"),)),
+    "-B": ("WitnessIdxSigs", (("signature", "indexed"),)),
+    "-C": ("NonTransReceiptCouples", (("prefix", "matter"), ("signature", "matter"))),
+    "-D": ("TransReceiptQuadruples", (("prefix", "matter"), ("sn", "matter"), ("digest", "matter"),
+                                      ("signature", "indexed"))),
+    "-E": ("FirstSeenReplayCouples", (("fn", "matter"), ("datetime", "matter"))),
+    "-F": ("TransIdxSigGroups", (("prefix", "matter"), ("sn", "matter"), ("digest", "matter"),
+                                 ("signatures", "group"))),
+    "-G": ("SealSourceCouples", (("sn", "matter"), ("digest", "matter"))),
+    "-H": ("TransLastIdxSigGroups", (("prefix", "matter"), ("signatures", "group"))),
+    "-I": ("SealSourceTriples", (("prefix", "matter"), ("sn", "matter"), ("digest", "matter"))),
+    "-J": ("SadPathSig", (("path", "matter"), ("signatures", "group"))),
+    "-K": ("SadPathSigGroup", (("signatures", "group"),)),
+    "-L": ("PathedMaterialQuadlets", QUADLET_LAYOUT),
+    "-V": ("AttachedMaterialQuadlets", QUADLET_LAYOUT),
+    "-0V": ("BigAttachedMaterialQuadlets", QUADLET_LAYOUT),
+    "--AAA": ("KERIProtocolStack", GENUS_LAYOUT),
+    "-_AAA": ("KERIACDCGenusVersion", GENUS_LAYOUT),
+}
+
+
+class CesrParseError(ValueError):
+    """
+    Raised when a CESR stream cannot be framed into events.
+
+    Attributes:
+        offset (int): Absolute byte offset in the stream where the problem starts.
+        snippet (bytes): The buffered data at that offset, for display.
+    """
+
+    def __init__(self, message: str, offset: int, snippet: bytes = b""):
+        super().__init__(message)
+        self.offset = offset
+        self.snippet = snippet
+
+
+class CesrOrphanedDataError(CesrParseError):
+    """ Raised when the data at an event boundary is not the start of a message body. """
+
+
+def decode_body(raw: bytes, kind: str) -> Any:
+    """
+    Deserializes a message body according to the serialization kind of its
+    version string. CBOR and MGPK decoders are imported on first use.
+    """
+    if kind == "JSON":
+        return json.loads(raw)
+    if kind == "CBOR":
+        import cbor2
+        return cbor2.loads(raw)
+    if kind == "MGPK":
+        import msgpack
+        return msgpack.unpackb(raw)
+    raise ValueError(f"Unsupported serialization kind {kind}")
+
 
-def format_cesr(stream_data: str) -> str:
-    formatted_parts = []
-    current_pos = 0
-    stream_len = len(stream_data)
-    event_counter = 1
-    decoder = json.JSONDecoder()
-
-    while current_pos < stream_len:
-        # Find the start of the JSON object
-        # It should be the first non-whitespace char if current_pos is at a message boundary
-        temp_pos = current_pos
-        while temp_pos < stream_len and stream_data[temp_pos].isspace():
-            temp_pos += 1
-        
-        if temp_pos == stream_len: # Only whitespace left
-            break
-
-        if stream_data[temp_pos] != '{':
-            # Unexpected non-JSON data at the beginning of a supposed message part
-            if temp_pos < stream_len:
-                formatted_parts.append(f"--- End of Stream ---")
-                formatted_parts.append(f"Orphaned or unexpected non-JSON data:")
-                formatted_parts.append(stream_data[temp_pos:])
-            break
-        
-        current_pos = temp_pos
-
-        # Decode the JSON object
+def _jsonable(value: Any) -> Any:
+    """
+    A decoded CBOR or MGPK body made JSON serializable: byte strings become
+    unpadded base64url text (in values and keys alike) and other non-string
+    keys become their JSON text. Anything else json cannot encode is left to
+    the caller's `default`.
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.urlsafe_b64encode(bytes(value)).rstrip(b"=").decode("ascii")
+    if isinstance(value, dict):
+        return {key if isinstance(key, str) else _json_key(key): _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    return value
+
+
+def _json_key(key: Any) -> str:
+    key = _jsonable(key)
+    return key if isinstance(key, str) else json.dumps(key, default=repr)
+
+
+def _body_json(event: "CesrEvent", indent: Optional[int] = None) -> str:
+    """ JSON text of a decoded event body of any kind. Raises CesrParseError if it does not decode. """
+    return json.dumps(_jsonable(event.body), indent=indent, ensure_ascii=False, default=repr)
+
+
+@dataclass
+class CesrEvent:
+    """
+    One message framed out of a CESR stream.
+
+    Attributes:
+        index: 1-based position of the event in the stream.
+        start: Absolute byte offset of the message body.
+        body_end: Absolute byte offset just past the body (start of the attachments).
+        end: Absolute byte offset just past the attachments.
+        version: The version string of the body, e.g. 'KERI10JSON00012b_'.
+        raw: The serialized body bytes exactly as they appear in the stream.
+        attachments: The raw attachment bytes that follow the body (qb64 text
+                     or qb2 binary).
+        attachment_groups: The decoded count code groups of the attachments, each
+                           a dict with 'code', 'name', 'count', 'start', 'end'
+                           and its 'items' (signatures, receipts, seals...) or
+                           nested 'groups'.
+    """
+    index: int
+    start: int
+    body_end: int
+    end: int
+    version: str
+    raw: bytes
+    attachments: bytes
+    attachment_groups: List[dict] = field(default_factory=list)
+
+    @property
+    def size(self) -> int:
+        """ Total bytes of body plus attachments. """
+        return self.end - self.start
+
+    @property
+    def kind(self) -> str:
+        """ Serialization kind of the body: 'JSON', 'CBOR' or 'MGPK'. """
+        return self.version[6:10]
+
+    @cached_property
+    def body(self) -> Any:
+        """
+        The decoded message body, deserialized on first access only.
+
+        Raises:
+            CesrParseError: If the body does not deserialize as its declared kind.
+        """
         try:
-            json_obj, json_end_idx_in_slice = decoder.raw_decode(stream_data[current_pos:])
-            abs_json_end_idx = current_pos + json_end_idx_in_slice
-        except json.JSONDecodeError as e:
-            formatted_parts.append(f"--- Error ---")
-            formatted_parts.append(f"Failed to decode JSON object starting at position {current_pos}: {e}")
-            formatted_parts.append("Problematic data snippet:")
-            formatted_parts.append(stream_data[current_pos : current_pos + 200])
-            break 
+            return decode_body(self.raw, self.kind)
+        except Exception as e:
+            raise CesrParseError(f"Failed to decode {self.kind} body of event {self.index} "
+                                 f"starting at position {self.start}: {e}", self.start, self.raw[:200]) from e
+
+
+# --- Stream Buffering ---
+
+class _StreamBuffer:
+    """
+    Sliding window over a CESR source addressed with absolute stream offsets.
+
+    bytes, bytearray and mmap sources are used in place (str is encoded and a
+    memoryview copied once). File objects and chunk iterators are read
+    on demand, and consumed data is dropped from the front of the window, so the
+    window only ever holds the event currently being framed plus one chunk.
+    """
+
+    def __init__(self, source, chunk_size: int = DEFAULT_CHUNK_SIZE, offset: int = 0):
+        self.base = offset # Absolute offset of data[0]
+        self.consumed = offset # Absolute offset up to which data may be discarded
+        if isinstance(source, str):
+            source = source.encode("utf-8")
+        if isinstance(source, (bytes, bytearray, mmap.mmap)):
+            self.data = source # Sliced lazily; a memory map is never read into memory as a whole
+            self._chunks = None
+        elif isinstance(source, memoryview):
+            self.data = bytes(source) # No find(); copied once
+            self._chunks = None
+        else:
+            self.data = bytearray()
+            if hasattr(source, "read"):
+                self._chunks = iter(lambda: source.read(chunk_size), source.read(0))
+            else:
+                self._chunks = iter(source)
+
+    @property
+    def end(self) -> int:
+        """ Absolute offset just past the buffered data. """
+        return self.base + len(self.data)
+
+    def fill(self) -> bool:
+        """ Reads one more chunk into the window. Returns False at end of stream. """
+        if self._chunks is None:
+            return False
+        for chunk in self._chunks:
+            if not chunk:
+                continue
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            drop = self.consumed - self.base
+            if drop and drop * 2 >= len(self.data):
+                # Compact only when at least half the window is dead so each byte moves O(1) times
+                del self.data[:drop]
+                self.base = self.consumed
+            self.data.extend(chunk)
+            return True
+        self._chunks = None
+        return False
+
+    def ensure(self, upto: int) -> bool:
+        """ Reads until data up to absolute offset `upto` is buffered. """
+        while self.end < upto:
+            if not self.fill():
+                return False
+        return True
+
+    def byte(self, pos: int) -> Optional[int]:
+        """ Returns the byte at absolute offset `pos`, reading more if needed, or None at end of stream. """
+        if not self.ensure(pos + 1):
+            return None
+        return self.data[pos - self.base]
+
+    def slice(self, start: int, end: int) -> bytes:
+        return bytes(self.data[start - self.base:end - self.base])
+
+    def find(self, sub: bytes, start: int) -> int:
+        """ Finds `sub` in the buffered data at or after absolute `start`. Returns an absolute offset or -1. """
+        found = self.data.find(sub, start - self.base)
+        return -1 if found == -1 else self.base + found
+
+    def search(self, pattern: re.Pattern, start: int, end: int):
+        return pattern.search(self.data, start - self.base, end - self.base)
+
+    def release(self, upto: int):
+        """ Marks everything before absolute offset `upto` as no longer needed. """
+        self.consumed = upto
+
+
+# --- Event Framing ---
+
+def _skip_whitespace(buffer: _StreamBuffer, pos: int) -> Optional[int]:
+    """ Returns the offset of the next non-whitespace byte, or None at end of stream. """
+    while True:
+        value = buffer.byte(pos)
+        if value is None:
+            return None
+        if value not in WHITESPACE:
+            return pos
+        pos += 1
+
+
+# --- Attachment Decoding ---
+
+def _b64_to_int(text: str) -> int:
+    """ Converts Base64 URL-safe digits (e.g. a count code's soft part) to an int. """
+    value = 0
+    for char in text:
+        value = (value << 6) | B64_INDEX[char]
+    return value
+
+
+def _qb64_to_raw(qb64: str, code_size: int) -> bytes:
+    """ Strips the derivation code from a qb64 primitive and returns its raw bytes. """
+    pad = code_size % 4
+    return base64.urlsafe_b64decode("A" * pad + qb64[code_size:])[pad:]
+
+
+def _domain_size(chars: int, domain: str) -> int:
+    """ Bytes occupied by `chars` qb64 characters (a multiple of 4) in the given domain. """
+    return chars if domain == TXT else chars * 3 // 4
+
+
+def _read_text(buffer: _StreamBuffer, pos: int, chars: int, domain: str = TXT) -> str:
+    """
+    Reads `chars` qb64 characters at `pos`. In the binary domain only the
+    bytes covering those characters are converted, so code lookups on qb2
+    data never expand more than a few bytes.
+    """
+    size = chars if domain == TXT else -(-chars // 4) * 3
+    if not buffer.ensure(pos + size):
+        raise CesrParseError(f"Truncated attachment at position {pos}: need {size} bytes",
+                             pos, buffer.slice(pos, pos + 200))
+    data = buffer.slice(pos, pos + size)
+    if domain == TXT:
+        return data.decode("ascii")
+    return base64.urlsafe_b64encode(data)[:chars].decode("ascii")
+
+
+def _read_primitive(buffer: _StreamBuffer, pos: int, indexed: bool = False,
+                    domain: str = TXT) -> Tuple[str, int, Any]:
+    """
+    Reads one qb64/qb2 primitive using the KERI code tables to size it exactly.
+
+    Returns:
+        (qb64, end position, sizage) of the primitive.
+    """
+    klas = Indexer if indexed else Matter
+    first = _read_text(buffer, pos, 1, domain)
+    hard_size = klas.Hards.get(first)
+    code = _read_text(buffer, pos, hard_size, domain) if hard_size else None
+    sizage = klas.Sizes.get(code) if code else None
+    if sizage is None:
+        raise CesrParseError(f"Unknown {klas.__name__} code at position {pos}", pos, buffer.slice(pos, pos + 200))
+    full_size = sizage.fs
+    if full_size is None: # Variable sized material, the soft part counts quadlets
+        code_size = sizage.hs + sizage.ss
+        full_size = code_size + _b64_to_int(_read_text(buffer, pos, code_size, domain)[sizage.hs:]) * 4
+    return _read_text(buffer, pos, full_size, domain), pos + _domain_size(full_size, domain), sizage
+
+
+def _primitive_value(label: str, qb64: str, sizage) -> Any:
+    """ Renders sequence numbers as ints and datetimes as ISO-8601, everything else stays qb64. """
+    if label in ("sn", "fn"):
+        return int.from_bytes(_qb64_to_raw(qb64, sizage.hs + sizage.ss), "big")
+    if label == "datetime":
+        return qb64[sizage.hs + sizage.ss:].translate(DATETIME_B64_TRANSLATION)
+    return qb64
+
+
+def _counter_sizes(head: str) -> Tuple[int, int]:
+    """ Hard and soft sizes of a count code from its first two characters. """
+    if head[1] in "-_":
+        return 5, 3 # Protocol genus/version codes, e.g. --AAA
+    if head[1] == "0":
+        return 3, 5 # Big count codes, e.g. -0V
+    return 2, 2
+
+
+def _parse_group(buffer: _StreamBuffer, pos: int, domain: str = TXT) -> Tuple[dict, int]:
+    """
+    Decodes one counted attachment group, including any nested groups.
+
+    Args:
+        buffer: The stream window.
+        pos: Absolute offset of the group's count code.
+        domain: TXT for qb64 attachments, BNY for qb2 attachments.
+
+    Returns:
+        (group, end position). The group is a dict with the count code, its
+        name, the count and either decoded items, nested groups or raw material.
+        Primitives are reported as qb64 in both domains.
+    """
+    start = pos
+    hard_size, soft_size = _counter_sizes(_read_text(buffer, pos, 2, domain))
+    header = _read_text(buffer, pos, hard_size + soft_size, domain)
+    code, soft = header[:hard_size], header[hard_size:]
+    if code not in COUNTER_CODES:
+        raise CesrParseError(f"Unsupported count code {code} at position {pos}", pos, buffer.slice(pos, pos + 200))
+    name, layout = COUNTER_CODES[code]
+    pos += _domain_size(hard_size + soft_size, domain)
+
+    if layout == GENUS_LAYOUT:
+        return {"code": code, "name": name, "version": soft, "start": start, "end": pos}, pos
 
+    count = _b64_to_int(soft)
+    group = {"code": code, "name": name, "count": count, "start": start}
+    if layout == QUADLET_LAYOUT:
+        end = pos + _domain_size(count * 4, domain)
+        if code == CTR_PATHED_MATERIAL:
+            group["material"] = _read_text(buffer, pos, count * 4, domain)
+        else:
+            nested = []
+            while pos < end:
+                child, pos = _parse_group(buffer, pos, domain)
+                nested.append(child)
+            if pos != end:
+                raise CesrParseError(f"Attachment group {code} at position {start} declares {count} quadlets "
+                                     f"but its contents end at {pos}", start, buffer.slice(start, start + 200))
+            group["groups"] = nested
+        pos = end
+    else:
+        if code == CTR_SAD_PATH_SIG_GROUP: # The root path is shared by all the counted groups
+            qb64, pos, sizage = _read_primitive(buffer, pos, domain=domain)
+            group["path"] = qb64
+        items = []
+        for _ in range(count):
+            item = {}
+            for label, kind in layout:
+                if kind == "group":
+                    item[label], pos = _parse_group(buffer, pos, domain)
+                    continue
+                qb64, pos, sizage = _read_primitive(buffer, pos, indexed=(kind == "indexed"), domain=domain)
+                item[label] = _primitive_value(label, qb64, sizage)
+                if kind == "indexed":
+                    index_size = sizage.ss - sizage.os
+                    item["index"] = _b64_to_int(qb64[sizage.hs:sizage.hs + index_size])
+                    if sizage.os:
+                        item["ondex"] = _b64_to_int(qb64[sizage.hs + index_size:sizage.hs + sizage.ss])
+            items.append(item)
+        group["items"] = items
+    group["end"] = pos
+    return group, pos
+
+
+def _parse_attachments(buffer: _StreamBuffer, pos: int) -> Tuple[List[dict], int]:
+    """
+    Decodes the count code groups that follow a message body in a single pass.
+    Attachments end where the next byte is not a count code (the next message,
+    or the end of the stream), so no searching for the next body is needed.
+    Each group may be in the text or binary domain, told apart by its first byte.
+
+    Returns:
+        (groups, end position of the last group).
+    """
+    groups = []
+    while True:
+        next_pos = _skip_whitespace(buffer, pos)
+        domain = None if next_pos is None else COLD_DOMAINS.get(buffer.byte(next_pos) >> 5)
+        if domain is None:
+            return groups, pos
+        group, pos = _parse_group(buffer, next_pos, domain)
+        groups.append(group)
+
+
+def iter_cesr_events(source, chunk_size: int = DEFAULT_CHUNK_SIZE, offset: int = 0,
+                     start_index: int = 1) -> Iterator[CesrEvent]:
+    """
+    Parses a CESR stream into events lazily, one message at a time.
+
+    Each body is framed exactly by the size in its version string and its
+    attachments by their count codes, so data is scanned once and memory stays
+    bounded by the largest single event rather than the whole stream. Bodies
+    may be JSON, CBOR or MGPK and attachments qb64 or qb2; bodies are kept as
+    raw bytes and only deserialized when `CesrEvent.body` is read.
+
+    Args:
+        source: The stream as a str, bytes, a binary or text file object, or an
+                iterator of str/bytes chunks (e.g. an HTTP response body).
+        chunk_size: Bytes to read at a time from file objects.
+        offset: Absolute stream offset of the first byte of `source`, when it is
+                a slice of a larger stream (e.g. a file opened and seeked).
+        start_index: Event number given to the first event of `source`.
+
+    Yields:
+        CesrEvent: Each event with its raw body, attachments and offsets.
+
+    Raises:
+        CesrOrphanedDataError: If data at an event boundary is not a message body.
+        CesrParseError: If a body is truncated or lacks a version string, or an
+                        attachment group is malformed.
+    """
+    buffer = _StreamBuffer(source, chunk_size, offset)
+    pos = offset
+    index = start_index
+
+    while True:
+        start = _skip_whitespace(buffer, pos)
+        if start is None:
+            return # Only whitespace left
+
+        cold = buffer.byte(start) >> 5
+        domain = COLD_DOMAINS.get(cold)
+        if domain and _read_text(buffer, start, 2, domain) in ("--", "-_"):
+            _, pos = _parse_group(buffer, start, domain) # Skip a protocol genus/version code between messages
+            continue
+
+        if cold not in COLD_MESSAGE and buffer.byte(start) != ord('{'):
+            raise CesrOrphanedDataError(f"Orphaned or unexpected non-message data at position {start}",
+                                        start, buffer.slice(start, buffer.end))
+
+        buffer.ensure(start + MAX_VERSION_OFFSET + VERSION_STRING_SIZE)
+        match = buffer.search(VERSION_RE, start, start + MAX_VERSION_OFFSET + VERSION_STRING_SIZE)
+        if not match:
+            raise CesrParseError(f"Missing or invalid version string in message starting at position {start}",
+                                 start, buffer.slice(start, start + 200))
+
+        version = match.group(0).decode("ascii") # Copy out now: reading more data may move the window
+        body_end = start + int(match.group("size"), 16)
+        if not buffer.ensure(body_end):
+            raise CesrParseError(f"Truncated message starting at position {start}: version string declares "
+                                 f"{body_end - start} bytes but the stream ends at {buffer.end}",
+                                 start, buffer.slice(start, start + 200))
+
+        attachment_groups, end = _parse_attachments(buffer, body_end)
+        yield CesrEvent(index=index,
+                        start=start,
+                        body_end=body_end,
+                        end=end,
+                        version=version,
+                        raw=buffer.slice(start, body_end),
+                        attachments=buffer.slice(body_end, end),
+                        attachment_groups=attachment_groups)
+        buffer.release(end)
+        pos = end
+        index += 1
+
+
+# --- Formatting ---
+
+def _attachment_text(event: CesrEvent) -> str:
+    """ The attachments as qb64 text; qb2 groups are shown as their text domain equivalent. """
+    parts = []
+    for group in event.attachment_groups:
+        data = event.attachments[group["start"] - event.body_end:group["end"] - event.body_end]
+        if data[0] >> 5 == COLD_COUNT_CODE_BINARY:
+            parts.append(base64.urlsafe_b64encode(data).decode("ascii"))
+        else:
+            parts.append(data.decode("ascii"))
+    return "".join(parts)
+
+
+def _format_groups(groups: List[dict], depth: int = 1) -> Iterator[str]:
+    """ Yields one indented line per attachment group and per decoded item. """
+    indent = "  " * depth
+    for group in groups:
+        if "version" in group:
+            yield f"{indent}{group['code']} {group['name']} version={group['version']}"
+            continue
+        unit = " quadlets" if "groups" in group or "material" in group else ""
+        yield f"{indent}{group['code']} {group['name']} ({group['count']}{unit})"
+        if "path" in group:
+            yield f"{indent}  path: {group['path']}"
+        if "material" in group:
+            yield f"{indent}  {group['material']}"
+        yield from _format_groups(group.get("groups", []), depth + 1)
+        for item in group.get("items", []):
+            nested = [value for value in item.values() if isinstance(value, dict)]
+            fields = ", ".join(f"{key}: {value}" for key, value in item.items() if not isinstance(value, dict))
+            yield f"{indent}  {fields}"
+            yield from _format_groups(nested, depth + 2)
+
+
+def iter_format_event(event: CesrEvent) -> Iterator[str]:
+    """ Yields the human readable blocks of a single event, ending with the separator. """
+    yield f"Event {event.index}:"
+    yield f"{event.kind}:"
+    try:
+        yield _body_json(event, indent=2)
+    except CesrParseError as e: # The event is still framed, so report it and keep going
+        yield "--- Error ---"
+        yield str(e)
+        yield "Problematic data snippet:"
+        yield e.snippet.decode("utf-8", errors="replace")
+    if event.attachment_groups:
+        yield "Attachment:"
+        yield _attachment_text(event)
+        yield "Attachment Groups:"
+        yield from _format_groups(event.attachment_groups)
+    yield SEPARATOR
+
+
+def iter_format_cesr(source, chunk_size: int = DEFAULT_CHUNK_SIZE, offset: int = 0,
+                     start_index: int = 1) -> Iterator[str]:
+    """
+    Yields the human readable blocks of `format_cesr` one at a time, so large
+    streams can be written out as they are parsed. `offset` and `start_index`
+    are passed to `iter_cesr_events` for sources that are slices of a stream.
+    """
+    try:
+        for event in iter_cesr_events(source, chunk_size=chunk_size, offset=offset, start_index=start_index):
+            yield from iter_format_event(event)
+    except CesrOrphanedDataError as e:
+        yield "--- End of Stream ---"
+        yield "Orphaned or unexpected non-message data:"
+        yield e.snippet.decode("utf-8", errors="replace")
+    except CesrParseError as e:
+        yield "--- Error ---"
+        yield str(e)
+        yield "Problematic data snippet:"
+        yield e.snippet.decode("utf-8", errors="replace")
+
+
+def format_cesr(stream_data) -> str:
+    """
+    Formats a CESR stream as readable text: each event's body pretty-printed
+    followed by its attachments.
+
+    Args:
+        stream_data: The stream as a str or bytes (anything `iter_cesr_events` accepts).
+
+    Returns:
+        The formatted text.
+    """
+    return "\n".join(iter_format_cesr(stream_data))
+
+
+# --- Structured Output ---
+
+def event_record(event: CesrEvent) -> dict:
+    """
+    Machine readable summary of an event: its position ('index', 'offset',
+    'size', 'body_size'), serialization 'kind', the 'ilk', 'prefix', 'sn' and
+    'said' of the body (None where the message has no such field or does not
+    decode) and the 'attachments' as qb64 text.
+    """
+    record = dict.fromkeys(RECORD_COLUMNS)
+    record.update(index=event.index, offset=event.start, size=event.size, body_size=event.body_end - event.start,
+                  kind=event.kind, attachments=_attachment_text(event) if event.attachment_groups else "")
+    try:
+        body = event.body
+    except CesrParseError as e:
+        record["error"] = str(e)
+        return record
+    if isinstance(body, dict):
         try:
-            formatted_json = json.dumps(json_obj, indent=2, ensure_ascii=False)
-        except TypeError as e:
-            formatted_parts.append(f"--- Error ---")
-            formatted_parts.append(f"Failed to serialize JSON object to string: {e}")
-            formatted_parts.append(f"Original Object: {json_obj}")
-            abs_json_end_idx = current_pos + len(stream_data[current_pos:abs_json_end_idx]) # Fallback if raw_decode was tricky
-
-        if "formatted_json" in locals() and formatted_json:
-            formatted_parts.append(f"Event {event_counter}:")
-            formatted_parts.append("JSON:")
-            formatted_parts.append(formatted_json)
-            del formatted_json # clean up for next iteration
-
-
-        attachment_start_pos = abs_json_end_idx
-        
-        next_json_obj_start_pos = -1
-        if attachment_start_pos < stream_len:
-            # Find the start of the next JSON object ('{') to determine the end of the current attachment
-            # This assumes attachments do not contain '{' that could be misinterpreted as start of new JSON.
-            # KERI attachments are usually Base64URL so this is generally safe.
-            
-            # Scan for the next '{' that is likely part of a new KERI event "v" field
-            # A simple find might be too naive if attachments could contain '{'.
-            # For CESR, events are concatenated. Attachments follow their event.
-            # So, anything after the current JSON up to the *next* valid JSON start is an attachment.
-            
-            # Let's search for '{"v":"KERI10JSON' or '{"v":"ACDC10JSON'
-            # to be more specific than just '{'.
-            # The provided rpy also uses KERI10JSON.
-            
-            search_offset = attachment_start_pos
-            # Try to find '{"v":', as it's a common pattern for KERI message starts
-            potential_next_json_start = stream_data.find('{"v":', search_offset)
-
-            if potential_next_json_start != -1:
-                 # Check if it's one of the known KERI message types to be more certain
-                if stream_data[potential_next_json_start:].startswith('{"v":"KERI10JSON') or \
-                   stream_data[potential_next_json_start:].startswith('{"v":"ACDC10JSON'):
-                    next_json_obj_start_pos = potential_next_json_start
-                else: # Found '{"v":' but not a full KERI/ACDC prefix, might be in an attachment. Search further.
-                    safer_next_json_start = stream_data.find('{"v":"KERI10JSON', search_offset)
-                    if safer_next_json_start != -1:
-                        next_json_obj_start_pos = safer_next_json_start
-                    # else, no other KERI10JSON found.
-                    # ACDC check can be added if necessary but not in this sample stream as events.
-            # else, no '{"v":' found, so this is the last message.
-
-
-        attachment_string = ""
-        if next_json_obj_start_pos != -1 and next_json_obj_start_pos >= attachment_start_pos :
-            attachment_string = stream_data[attachment_start_pos:next_json_obj_start_pos]
-            current_pos = next_json_obj_start_pos 
+            sn = int(body["s"], 16) if isinstance(body.get("s"), str) else None
+        except ValueError:
+            sn = None
+        record.update(ilk=_jsonable(body.get("t")), prefix=_jsonable(body.get("i")), sn=sn,
+                      said=_jsonable(body.get("d")))
+    return record
+
+
+def _error_record(e: CesrParseError) -> dict:
+    return {"error": str(e), "offset": e.offset, "orphaned": isinstance(e, CesrOrphanedDataError),
+            "snippet": e.snippet.decode("utf-8", errors="replace")}
+
+
+def ndjson_line(event: CesrEvent, include_body: bool = True) -> str:
+    """
+    One NDJSON line for an event. JSON bodies are already compact serialized
+    JSON, so their raw bytes are spliced into the line as the 'body' value
+    instead of being decoded and dumped again.
+    """
+    record = event_record(event)
+    line = json.dumps(record, ensure_ascii=False)
+    if not include_body:
+        return line
+    if "error" in record:
+        body = "null"
+    elif event.kind == "JSON":
+        body = event.raw.decode("utf-8")
+    else:
+        body = _body_json(event)
+    return f'{line[:-1]}, "body": {body}}}'
+
+
+def iter_ndjson_cesr(source, chunk_size: int = DEFAULT_CHUNK_SIZE, offset: int = 0, start_index: int = 1,
+                     include_body: bool = True) -> Iterator[str]:
+    """
+    Yields one JSON line per event (see `event_record`, plus the 'body' unless
+    `include_body` is False). A stream that cannot be framed further ends with
+    an {'error', 'offset', 'orphaned', 'snippet'} line.
+    """
+    try:
+        for event in iter_cesr_events(source, chunk_size=chunk_size, offset=offset, start_index=start_index):
+            yield ndjson_line(event, include_body)
+    except CesrParseError as e:
+        yield json.dumps(_error_record(e), ensure_ascii=False)
+
+
+def iter_columnar_cesr(source, chunk_size: int = DEFAULT_CHUNK_SIZE, offset: int = 0, start_index: int = 1,
+                       include_body: bool = True, batch_size: int = DEFAULT_COLUMN_BATCH_SIZE) -> Iterator[str]:
+    """
+    Yields the events as column batches, one JSON line per `batch_size` events,
+    each mapping a column name (`RECORD_COLUMNS`, plus 'error' and 'body') to
+    its list of values, in the spirit of Parquet row groups. Bodies are spliced
+    in as with `iter_ndjson_cesr`. A stream that cannot be framed further ends
+    with an error line after the last batch.
+    """
+    columns = {name: [] for name in RECORD_COLUMNS + ("error",)}
+    bodies = []
+
+    def batch() -> str:
+        line = json.dumps(columns, ensure_ascii=False)
+        if include_body:
+            line = f'{line[:-1]}, "body": [{", ".join(bodies)}]}}'
+        for values in columns.values():
+            values.clear()
+        bodies.clear()
+        return line
+
+    try:
+        for event in iter_cesr_events(source, chunk_size=chunk_size, offset=offset, start_index=start_index):
+            record = event_record(event)
+            for name, values in columns.items():
+                values.append(record.get(name))
+            if include_body:
+                if "error" in record:
+                    bodies.append("null")
+                elif event.kind == "JSON":
+                    bodies.append(event.raw.decode("utf-8"))
+                else:
+                    bodies.append(_body_json(event))
+            if len(columns["index"]) >= batch_size:
+                yield batch()
+    except CesrParseError as e:
+        if columns["index"]:
+            yield batch()
+        yield json.dumps(_error_record(e), ensure_ascii=False)
+        return
+    if columns["index"]:
+        yield batch()
+
+
+def iter_output(source, output_format: str = "text", include_body: bool = True, **kwargs) -> Iterator[str]:
+    """ Yields the lines of `source` in one of `OUTPUT_FORMATS`; `kwargs` go to `iter_cesr_events`. """
+    if output_format == "text":
+        return iter_format_cesr(source, **kwargs)
+    if output_format == "ndjson":
+        return iter_ndjson_cesr(source, include_body=include_body, **kwargs)
+    if output_format == "columnar":
+        return iter_columnar_cesr(source, include_body=include_body, **kwargs)
+    raise ValueError(f"Unknown output format {output_format}, expected one of {', '.join(OUTPUT_FORMATS)}")
+
+
+# --- Parallel Formatting ---
+
+def _iter_event_ranges(path: str, chunk_bytes: int) -> Iterator[Tuple[int, int, int]]:
+    """
+    Splits a CESR file at event boundaries into (start, end, first event index)
+    ranges of roughly `chunk_bytes`. Boundaries come from the sidecar index when
+    a current one exists, otherwise from a framing pass that leaves bodies
+    undecoded. Anything after the last framed event becomes a final range so
+    the worker reports it exactly as `format_cesr` would.
+    """
+    from scripts.cesr_index import CesrIndex, index_is_current # cesr_index builds on this module
+
+    def boundaries():
+        if index_is_current(path):
+            with CesrIndex(path) as index:
+                for entry in index.iter_entries():
+                    yield entry.start, entry.end, entry.index
+            return
+        with open(path, "rb") as f:
+            try:
+                for event in iter_cesr_events(f):
+                    yield event.start, event.end, event.index
+            except CesrParseError:
+                return
+
+    start = 0
+    first_index = 1
+    last_end = 0
+    last_index = 0
+    for event_start, event_end, index in boundaries():
+        last_end, last_index = event_end, index
+        if event_end - start >= chunk_bytes:
+            yield start, event_end, first_index
+            start, first_index = event_end, index + 1
+    if start < last_end:
+        yield start, last_end, first_index
+    file_size = os.path.getsize(path)
+    if last_end < file_size:
+        yield last_end, file_size, last_index + 1
+
+
+def _format_range(path: str, start: int, end: int, start_index: int, output_format: str = "text",
+                  include_body: bool = True) -> str:
+    """ Worker task: formats the events in [start, end) of the file. """
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return "\n".join(iter_output(data, output_format, include_body, offset=start, start_index=start_index))
+
+
+def format_cesr_parallel(path: str, output: Optional[TextIO] = None, workers: Optional[int] = None,
+                         chunk_bytes: int = DEFAULT_PARALLEL_CHUNK_SIZE, output_format: str = "text",
+                         include_body: bool = True) -> int:
+    """
+    Formats a CESR file across a pool of worker processes.
+
+    The file is split at event boundaries into chunks that are formatted
+    concurrently. Results are written in stream order as soon as each is
+    ready, with at most two chunks per worker in flight, so output streams
+    and memory stays bounded whatever the file size. The text is identical
+    to `format_cesr` (and NDJSON to `iter_ndjson_cesr`; columnar batches are
+    cut at chunk boundaries as well as every `DEFAULT_COLUMN_BATCH_SIZE` events).
+
+    Args:
+        path: Path to the CESR file.
+        output: Text stream to write to (defaults to stdout).
+        workers: Number of worker processes (defaults to one per CPU).
+        chunk_bytes: Approximate size of each worker task.
+        output_format: One of `OUTPUT_FORMATS`.
+        include_body: Include message bodies in the ndjson and columnar formats.
+
+    Returns:
+        The number of chunks formatted.
+    """
+    output = output or sys.stdout
+    workers = workers or os.cpu_count() or 1
+    pending = deque()
+    chunks = 0
+
+    def write_next():
+        nonlocal chunks
+        text = pending.popleft().result()
+        if chunks:
+            output.write("\n")
+        output.write(text)
+        chunks += 1
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for start, end, start_index in _iter_event_ranges(path, chunk_bytes):
+            pending.append(executor.submit(_format_range, path, start, end, start_index, output_format,
+                                           include_body))
+            if len(pending) >= workers * 2:
+                write_next()
+        while pending:
+            write_next()
+    if chunks:
+        output.write("\n")
+    return chunks
+
+
+# --- CLI ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Format a CESR stream (KEL, OOBI response, dump) as readable text "
+                                                 "or machine readable records.")
+    parser.add_argument("input", nargs="?", default="-", help="CESR file to format, or - for stdin (default).")
+    parser.add_argument("-o", "--output", help="Write to this file instead of stdout.")
+    parser.add_argument("-f", "--format", dest="output_format", choices=OUTPUT_FORMATS, default="text",
+                        help="text (default), ndjson (one JSON record per event) or columnar (JSON column batches).")
+    parser.add_argument("--no-body", dest="include_body", action="store_false",
+                        help="Leave message bodies out of ndjson/columnar records.")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Format in this many worker processes, 0 for one per CPU (needs a file input).")
+    parser.add_argument("--chunk-bytes", type=int, default=DEFAULT_PARALLEL_CHUNK_SIZE,
+                        help="Approximate bytes of events per worker task with --jobs.")
+    parser.add_argument("--verify", action="store_true",
+                        help="Verify signatures and receipts instead of formatting (see scripts.cesr_verify).")
+    args = parser.parse_args(argv)
+
+    if (args.jobs != 1 or args.verify) and args.input == "-":
+        parser.error("--jobs and --verify need a file input, not stdin")
+
+    if args.verify:
+        from scripts.cesr_verify import main as verify_main
+        return verify_main([args.input, "--jobs", str(args.jobs)])
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if args.jobs != 1:
+            format_cesr_parallel(args.input, output, workers=args.jobs or None, chunk_bytes=args.chunk_bytes,
+                                 output_format=args.output_format, include_body=args.include_body)
         else:
-            attachment_string = stream_data[attachment_start_pos:]
-            current_pos = stream_len 
-
-        stripped_attachment = attachment_string.strip()
-        if stripped_attachment:
-            formatted_parts.append("Attachment:")
-            formatted_parts.append(stripped_attachment)
-        
-        formatted_parts.append("-" * 60) # Increased separator width
-        event_counter += 1
-        
-    return "\n".join(formatted_parts)
+            source = open(args.input, "rb") if args.input != "-" else sys.stdin.buffer
+            try:
+                for part in iter_output(source, args.output_format, args.include_body):
+                    output.write(part)
+                    output.write("\n")
+            finally:
+                if source is not sys.stdin.buffer:
+                    source.close()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
 
+if __name__ == "__main__":
+    sys.exit(main())
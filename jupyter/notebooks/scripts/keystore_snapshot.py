@@ -0,0 +1,353 @@
+import argparse
+import errno
+import hashlib
+import json
+import os
+import platform
+import shutil
+import stat
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+from scripts.files import file_digest
+
+# Save an initialized keystore once and reset to it instead of clearing and
+# re-incepting:
+# python -m scripts.keystore_snapshot save issuer-ready
+# python -m scripts.keystore_snapshot restore issuer-ready
+#
+# from scripts.keystore_snapshot import save_snapshot, restore_snapshot
+# save_snapshot("issuer-ready")
+# restore_snapshot("issuer-ready")
+
+
+# --- Constants ---
+SNAPSHOT_DIR_ENV = "KERI_SNAPSHOT_DIR" # Overrides where snapshots are stored
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "vlei-trainings", "keystore-snapshots")
+MANIFEST_VERSION = 1
+SKIPPED_FILES = {"lock.mdb"} # LMDB reader lock tables; LMDB recreates them
+FICLONE = 0x40049409 # ioctl that makes a copy-on-write clone of a file (btrfs, XFS, ...)
+OBJECT_DIGEST_SIZE = 20 # Bytes of blake2b digest naming stored objects and snapshot ids
+
+
+def keystore_path() -> Optional[str]:
+    """ The kli keystore directory on this OS, or None if the OS is unsupported. """
+    match platform.system():
+        case "Linux":
+            return "/usr/local/var/keri/"
+        case "Darwin":
+            return os.path.join(os.path.expanduser("~"), ".keri")
+        case "Windows":
+            return os.path.join(os.path.expanduser("~"), "keri")
+        case _:
+            return None
+
+
+def snapshot_dir() -> str:
+    return os.environ.get(SNAPSHOT_DIR_ENV) or DEFAULT_SNAPSHOT_DIR
+
+
+# --- Copying ---
+
+def _reflink(src: str, dst: str) -> bool:
+    """ Clones src to dst sharing its blocks copy-on-write. False if the file system cannot. """
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return True
+        except OSError as e:
+            if e.errno in (errno.EOPNOTSUPP, errno.EXDEV, errno.EINVAL, errno.ENOTTY, errno.EBADF, errno.EPERM):
+                return False
+            raise
+
+
+def _copy(src: str, dst: str, reflink: bool) -> str:
+    """ Copies one file, by reflink where possible. Returns "reflink" or "copy". """
+    if reflink and _reflink(src, dst):
+        return "reflink"
+    shutil.copyfile(src, dst) # copy_file_range/sendfile, in the kernel
+    return "copy"
+
+
+# --- Snapshot Store ---
+
+class SnapshotStore:
+    """
+    Named keystore snapshots, stored by content.
+
+    Every file of a snapshot is kept once under `objects/<digest>`, so
+    snapshots that share files (the config, an unchanged keystore database)
+    share storage, and saving an unchanged keystore again writes nothing but
+    its manifest. A snapshot's id is the digest of its manifest.
+
+    Restoring builds the keystore next to the live one and swaps it in with
+    a rename. A keystore directory that cannot be renamed, such as a mount
+    point (a bind-mounted volume), is restored in place instead: the
+    snapshot is built inside it and its entries are swapped one by one, so
+    readers may briefly see a mix of old and new files. Files are reflinked (copy-on-write clones, instant and taking no
+    space until written) where the file system supports it, and copied by the
+    kernel otherwise. They are never hard linked: LMDB updates its files in
+    place, which would change the stored snapshot too.
+
+    Args:
+        root: Store directory; defaults to $KERI_SNAPSHOT_DIR or ~/.cache/vlei-trainings/keystore-snapshots.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or snapshot_dir()
+        self.objects = os.path.join(self.root, "objects")
+        self.manifests = os.path.join(self.root, "snapshots")
+
+    def _manifest_path(self, name: str) -> str:
+        if not name or os.sep in name or name.startswith("."):
+            raise ValueError(f"Invalid snapshot name: {name!r}")
+        return os.path.join(self.manifests, name + ".json")
+
+    def _store_object(self, src: str, digest: str, reflink: bool) -> bool:
+        """ Adds a file to the object store unless it is there already. Returns True if it was added. """
+        target = os.path.join(self.objects, digest)
+        if os.path.exists(target):
+            return False
+        fd, tmp = tempfile.mkstemp(dir=self.objects, prefix=".tmp-")
+        os.close(fd)
+        try:
+            _copy(src, tmp, reflink)
+            os.chmod(tmp, 0o444) # Stored objects are never modified
+            os.replace(tmp, target)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return True
+
+    def save(self, name: str, source: Optional[str] = None, reflink: bool = True) -> dict:
+        """
+        Captures the keystore as the snapshot `name`, replacing an existing
+        snapshot of that name. Save while no kli command or agent has the
+        keystore open, so its databases are consistent.
+
+        Returns:
+            The manifest: 'name', 'id', 'source', 'created', 'mode', 'dirs',
+            'files' (path, digest, size, mode) and 'added' (objects newly stored).
+        """
+        source = source or keystore_path()
+        if source is None or not os.path.isdir(source):
+            raise FileNotFoundError(f"No keystore at {source}")
+        os.makedirs(self.objects, exist_ok=True)
+        os.makedirs(self.manifests, exist_ok=True)
+        dirs, files, added = [], [], 0
+        for root, subdirs, names in os.walk(source):
+            subdirs.sort()
+            relative_root = os.path.relpath(root, source)
+            if relative_root != ".":
+                dirs.append({"path": relative_root, "mode": stat.S_IMODE(os.stat(root).st_mode)})
+            for filename in sorted(names):
+                if filename in SKIPPED_FILES:
+                    continue
+                filepath = os.path.join(root, filename)
+                if not os.path.isfile(filepath) or os.path.islink(filepath):
+                    continue
+                digest = file_digest(filepath, digest_size=OBJECT_DIGEST_SIZE)
+                added += self._store_object(filepath, digest, reflink)
+                st = os.stat(filepath)
+                files.append({"path": os.path.relpath(filepath, source), "digest": digest, "size": st.st_size,
+                              "mode": stat.S_IMODE(st.st_mode)})
+        contents = json.dumps({"dirs": dirs, "files": files}, sort_keys=True).encode("utf-8")
+        snapshot_id = hashlib.blake2b(contents, digest_size=OBJECT_DIGEST_SIZE).hexdigest()
+        manifest = {"version": MANIFEST_VERSION, "name": name, "id": snapshot_id,
+                    "source": os.path.abspath(source), "created": time.time(),
+                    "mode": stat.S_IMODE(os.stat(source).st_mode), "dirs": dirs, "files": files}
+        fd, tmp = tempfile.mkstemp(dir=self.manifests, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, self._manifest_path(name))
+        return dict(manifest, added=added)
+
+    def load(self, name: str) -> dict:
+        """ The manifest of a snapshot. Raises KeyError for an unknown name. """
+        try:
+            with open(self._manifest_path(name), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(name) from None
+
+    def _build(self, manifest: dict, staging: str, reflink: bool) -> dict:
+        """ Recreates the snapshot's directories and files under `staging`. Returns counts by copy method. """
+        counts = {"reflink": 0, "copy": 0}
+        for entry in manifest["dirs"]:
+            os.makedirs(os.path.join(staging, entry["path"]), exist_ok=True)
+        for entry in manifest["files"]:
+            dst = os.path.join(staging, entry["path"])
+            src = os.path.join(self.objects, entry["digest"])
+            if not os.path.exists(src):
+                raise FileNotFoundError(f"Snapshot {manifest['name']} is missing object {entry['digest']} "
+                                        f"({entry['path']})")
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            counts[_copy(src, dst, reflink)] += 1
+            os.chmod(dst, entry["mode"])
+        for entry in manifest["dirs"]:
+            os.chmod(os.path.join(staging, entry["path"]), entry["mode"])
+        return counts
+
+    def _swap_directory(self, manifest: dict, target: str, reflink: bool) -> dict:
+        """ Builds the snapshot next to `target` and renames it into place. """
+        parent = os.path.dirname(target)
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=parent, prefix=f".{os.path.basename(target)}-restore-")
+        try:
+            counts = self._build(manifest, staging, reflink)
+            old = None
+            if os.path.exists(target):
+                old = tempfile.mkdtemp(dir=parent, prefix=f".{os.path.basename(target)}-old-")
+                try:
+                    os.rename(target, os.path.join(old, "keystore"))
+                except BaseException:
+                    os.rmdir(old)
+                    raise
+            os.rename(staging, target)
+            os.chmod(target, manifest["mode"])
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+        return counts
+
+    def _swap_contents(self, manifest: dict, target: str, reflink: bool) -> dict:
+        """ Builds the snapshot inside `target` and swaps its entries in one by one. """
+        os.makedirs(target, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=target, prefix=".restore-")
+        old = tempfile.mkdtemp(dir=target, prefix=".old-")
+        moved_out, moved_in = [], []
+        try:
+            counts = self._build(manifest, staging, reflink)
+            for entry in os.listdir(target):
+                if entry not in (os.path.basename(staging), os.path.basename(old)):
+                    os.rename(os.path.join(target, entry), os.path.join(old, entry))
+                    moved_out.append(entry)
+            for entry in os.listdir(staging):
+                os.rename(os.path.join(staging, entry), os.path.join(target, entry))
+                moved_in.append(entry)
+            os.chmod(target, manifest["mode"])
+        except BaseException:
+            for entry in moved_in: # Put the old keystore back
+                shutil.rmtree(os.path.join(target, entry), ignore_errors=True)
+            for entry in moved_out:
+                os.rename(os.path.join(old, entry), os.path.join(target, entry))
+            raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+            shutil.rmtree(old, ignore_errors=True)
+        return counts
+
+    def restore(self, name: str, target: Optional[str] = None, reflink: bool = True) -> dict:
+        """
+        Replaces the keystore with the snapshot `name`.
+
+        Returns:
+            {'name', 'id', 'files', 'bytes', 'reflinked', 'copied', 'seconds',
+            'in_place'}; 'in_place' is True when the keystore directory could
+            not be renamed (a mount point) and its entries were swapped one by
+            one instead of all at once.
+        """
+        started = time.perf_counter()
+        manifest = self.load(name)
+        target = os.path.normpath(target or keystore_path())
+        in_place = os.path.ismount(target)
+        if not in_place:
+            try:
+                counts = self._swap_directory(manifest, target, reflink)
+            except OSError as e:
+                if e.errno not in (errno.EBUSY, errno.EXDEV): # A bind mount is busy even when ismount misses it
+                    raise
+                in_place = True
+        if in_place:
+            counts = self._swap_contents(manifest, target, reflink)
+        return {"name": name, "id": manifest["id"], "files": len(manifest["files"]),
+                "bytes": sum(entry["size"] for entry in manifest["files"]), "reflinked": counts["reflink"],
+                "copied": counts["copy"], "seconds": time.perf_counter() - started, "in_place": in_place}
+
+    def list(self) -> List[dict]:
+        """ Name, id, creation time, file count and size of every snapshot. """
+        if not os.path.isdir(self.manifests):
+            return []
+        snapshots = []
+        for filename in sorted(os.listdir(self.manifests)):
+            if filename.endswith(".json") and not filename.startswith("."):
+                manifest = self.load(filename[:-len(".json")])
+                snapshots.append({"name": manifest["name"], "id": manifest["id"], "created": manifest["created"],
+                                  "files": len(manifest["files"]),
+                                  "bytes": sum(entry["size"] for entry in manifest["files"])})
+        return snapshots
+
+    def delete(self, name: str) -> int:
+        """ Deletes a snapshot and the objects no other snapshot uses. Returns the number of objects removed. """
+        os.unlink(self._manifest_path(name))
+        used = {entry["digest"] for snapshot in self.list() for entry in self.load(snapshot["name"])["files"]}
+        removed = 0
+        for digest in os.listdir(self.objects):
+            if digest not in used:
+                os.unlink(os.path.join(self.objects, digest))
+                removed += 1
+        return removed
+
+
+def save_snapshot(name: str, source: Optional[str] = None, root: Optional[str] = None) -> dict:
+    """ Captures the keystore as snapshot `name` in the default (or given) store. """
+    return SnapshotStore(root).save(name, source)
+
+
+def restore_snapshot(name: str, target: Optional[str] = None, root: Optional[str] = None) -> dict:
+    """ Replaces the keystore with snapshot `name` from the default (or given) store. """
+    return SnapshotStore(root).restore(name, target)
+
+
+# --- CLI ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Save and restore named keystore snapshots.")
+    parser.add_argument("--store", help=f"Snapshot store (default: ${SNAPSHOT_DIR_ENV} or {DEFAULT_SNAPSHOT_DIR}).")
+    parser.add_argument("--keystore", help="Keystore directory (default: the kli keystore of this OS).")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("save", help="Capture the keystore.").add_argument("name")
+    commands.add_parser("restore", help="Replace the keystore with a snapshot.").add_argument("name")
+    commands.add_parser("delete", help="Delete a snapshot.").add_argument("name")
+    commands.add_parser("list", help="List snapshots.")
+    args = parser.parse_args(argv)
+
+    store = SnapshotStore(args.store)
+    try:
+        if args.command == "save":
+            manifest = store.save(args.name, args.keystore)
+            print(f"Saved {args.name} ({manifest['id'][:12]}): {len(manifest['files'])} files, "
+                  f"{manifest['added']} new objects")
+        elif args.command == "restore":
+            result = store.restore(args.name, args.keystore)
+            print(f"Restored {args.name} ({result['id'][:12]}): {result['files']} files, {result['bytes']} bytes "
+                  f"in {result['seconds'] * 1000:.1f} ms ({result['reflinked']} reflinked, {result['copied']} copied)")
+            if result["in_place"]:
+                print(f"Note: {args.keystore or keystore_path()} is a mount point, so its entries were swapped one "
+                      f"by one rather than in a single rename.")
+        elif args.command == "delete":
+            print(f"Deleted {args.name}, {store.delete(args.name)} unused objects removed")
+        else:
+            for snapshot in store.list():
+                created = time.strftime("%Y-%m-%d %H:%M", time.localtime(snapshot["created"]))
+                print(f"{snapshot['name']:<24} {snapshot['id'][:12]}  {created}  "
+                      f"{snapshot['files']:>4} files {snapshot['bytes']:>12} bytes")
+    except KeyError as e:
+        print(f"Error: No snapshot named {e.args[0]} in {store.root}", file=sys.stderr)
+        return 1
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
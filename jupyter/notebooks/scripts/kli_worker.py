@@ -0,0 +1,350 @@
+import atexit
+import cProfile
+import io
+import json
+import logging
+import os
+import queue
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Union
+
+# Run kli commands in one long-lived Python process instead of a new shell and
+# interpreter (and a fresh `import keri`) per command:
+#
+# from scripts.kli_worker import run_kli
+# result = run_kli("kli salt")
+# print(result.stdout, result.code)
+#
+# scripts.utils.exec uses the worker for plain `kli ...` commands. Set
+# KLI_WORKER=0 to run every command through the shell again.
+
+
+# --- Constants ---
+WORKER_ENV = "KLI_WORKER" # Set to 0 to disable the worker in scripts.utils.exec
+SHELL_CHARACTERS = set("|&;<>()$`\\*?~!{}[]\n#") # Anything the shell would interpret; such commands go to a shell
+KLI_ERROR_CODE = 255 # kli exits with -1 on errors
+
+
+@dataclass
+class KliResult:
+    """ Outcome of one command: exit code, captured output and wall time in seconds. """
+    code: int
+    stdout: str
+    stderr: str
+    output: str # stdout and stderr interleaved, as a shell would show them
+    seconds: float
+    cpu_seconds: float = 0.0 # CPU used by the worker for the command
+
+    def lines(self) -> List[str]:
+        """ Stripped output lines, as `exec` returns them. """
+        return [line.strip() for line in self.output.splitlines()]
+
+
+def kli_argv(command: Union[str, Sequence[str]]) -> Optional[List[str]]:
+    """
+    The kli arguments of a plain `kli ...` command, or None if the command
+    needs a shell (pipes, redirects, variables, globs) or is not kli.
+    """
+    if isinstance(command, str):
+        if SHELL_CHARACTERS & set(command):
+            return None
+        try:
+            command = shlex.split(command)
+        except ValueError:
+            return None
+    command = list(command)
+    if not command or os.path.basename(command[0]) != "kli":
+        return None
+    return command[1:]
+
+
+# --- Worker Process ---
+
+class _Tee(io.TextIOBase):
+    """ Collects one stream while also appending to the shared interleaved output. """
+
+    def __init__(self, combined: list):
+        self.parts = []
+        self.combined = combined
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self.parts.append(text)
+        self.combined.append(text)
+        return len(text)
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
+
+
+@contextmanager
+def _capture_logging(stream):
+    """
+    Points every logging handler that writes to the real stderr (keri's
+    loggers get one each from hio's Ogler and do not propagate) at `stream`
+    while the block runs, so log records land in the command's output.
+    """
+    loggers = [logging.getLogger()] + [logger for logger in logging.root.manager.loggerDict.values()
+                                       if isinstance(logger, logging.Logger)]
+    handlers = {handler for logger in loggers for handler in logger.handlers
+                if type(handler) is logging.StreamHandler and handler.stream in (sys.__stderr__, sys.stderr)}
+    previous = {handler: handler.setStream(stream) for handler in handlers}
+    try:
+        yield
+    finally:
+        for handler, original in previous.items():
+            handler.setStream(original)
+
+
+def _apply_env(base: Dict[str, str], changes: Optional[dict]):
+    """ Resets os.environ to `base` with the client's {"set": {...}, "unset": [...]} changes applied. """
+    changes = changes or {}
+    os.environ.clear()
+    os.environ.update(base)
+    os.environ.update(changes.get("set", {}))
+    for name in changes.get("unset", []):
+        os.environ.pop(name, None)
+
+
+def _run_in_process(parser, argv: List[str]) -> tuple:
+    """ Runs one kli command the way `kli` itself does. Returns (code, stdout, stderr, output). """
+    from keri.app import directing
+
+    combined = []
+    out, err = _Tee(combined), _Tee(combined)
+    code = 0
+    with redirect_stdout(out), redirect_stderr(err), _capture_logging(err):
+        try:
+            args = parser.parse_args(argv)
+            if not hasattr(args, "handler"):
+                parser.print_help()
+            else:
+                try:
+                    doers = args.handler(args)
+                    directing.runController(doers=doers, expire=0.0)
+                except Exception as ex:
+                    if os.getenv("DEBUG_KLI"):
+                        import traceback
+                        traceback.print_exc()
+                    else:
+                        print(f"ERR: {ex}")
+                    code = KLI_ERROR_CODE
+        except SystemExit as ex: # argparse errors and commands that exit
+            code = ex.code % 256 if isinstance(ex.code, int) else (0 if ex.code is None else 1) # As a shell sees it
+            if not isinstance(ex.code, (int, type(None))):
+                print(ex.code, file=sys.stderr)
+    return code, out.getvalue(), err.getvalue(), "".join(combined)
+
+
+def serve():
+    """
+    Worker main loop: reads one JSON request per line, {"argv": [...],
+    "cwd": ..., "env": ..., "profile": ...}, and answers each with one JSON line
+    {"code", "stdout", "stderr", "output", "seconds", "cpu_seconds"}. With
+    "profile" set to a path, the command runs under cProfile and its
+    stats are written there. "env" holds the client's environment changes
+    since the worker started ({"set": {...}, "unset": [...]}), applied to
+    the worker's starting environment for that command.
+
+    The request channel is moved off file descriptors 0 and 1 first, so a
+    command that prompts or writes below Python's sys.stdout cannot read or
+    corrupt it: stdin becomes /dev/null and stray output goes to stderr.
+    """
+    channel_in = os.fdopen(os.dup(0), "rb")
+    channel_out = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(2, 1)
+    sys.stdin = open(os.devnull, "r")
+
+    import multicommand
+    from keri.app.cli import commands
+    parser = multicommand.create_parser(commands)
+    parser.prog = "kli"
+    base_env = dict(os.environ)
+
+    for line in channel_in:
+        request = json.loads(line)
+        started, cpu_started = time.perf_counter(), time.process_time()
+        profiler = cProfile.Profile() if request.get("profile") else None
+        try:
+            os.chdir(request.get("cwd") or os.getcwd())
+            _apply_env(base_env, request.get("env"))
+            if profiler is not None:
+                profiler.enable()
+            try:
+                code, stdout, stderr, output = _run_in_process(parser, request["argv"])
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                    profiler.dump_stats(request["profile"])
+        except Exception as ex: # Never let one request take the worker down
+            code, stdout, stderr, output = KLI_ERROR_CODE, "", f"ERR: {ex}\n", f"ERR: {ex}\n"
+        response = {"code": code, "stdout": stdout, "stderr": stderr, "output": output,
+                    "seconds": time.perf_counter() - started, "cpu_seconds": time.process_time() - cpu_started}
+        channel_out.write(json.dumps(response).encode("utf-8") + b"\n")
+        channel_out.flush()
+
+
+# --- Client ---
+
+class KliWorker:
+    """
+    A long-lived subprocess that has imported keri once and runs kli commands
+    in-process, one at a time, over a JSON lines request/response channel on
+    its stdin/stdout. Commands behave as with `kli` (same arguments, output
+    and keystore files) without starting a shell and an interpreter each time.
+
+    The worker is started on first use and restarted if it exits. Calls are
+    serialized, so one worker can be shared between threads.
+    """
+
+    def __init__(self, python: str = sys.executable):
+        self.python = python
+        self.process: Optional[subprocess.Popen] = None
+        self._env: Dict[str, str] = {} # The client environment the worker was started with
+        self._lock = threading.Lock()
+
+    def _start(self):
+        scripts_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self._env = dict(os.environ)
+        env = dict(self._env)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [scripts_root, env.get("PYTHONPATH")]))
+        self.process = subprocess.Popen([self.python, "-m", "scripts.kli_worker"], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, env=env, cwd=scripts_root)
+
+    def _env_changes(self) -> dict:
+        """ How os.environ differs from the environment the worker was started with. """
+        current = dict(os.environ)
+        return {"set": {name: value for name, value in current.items() if self._env.get(name) != value},
+                "unset": [name for name in self._env if name not in current]}
+
+    def run(self, command: Union[str, Sequence[str]], profile: Optional[str] = None) -> KliResult:
+        """
+        Runs a kli command, given as a `kli ...` string or argument list.
+        Raises ValueError for commands that need a shell.
+
+        With `profile`, a path, the command is profiled with cProfile in the
+        worker and the stats are written to that file.
+        """
+        argv = kli_argv(command)
+        if argv is None:
+            raise ValueError(f"Not a plain kli command: {command}")
+        started = time.perf_counter()
+        with self._lock:
+            if self.process is None or self.process.poll() is not None:
+                self._start()
+            request = json.dumps({"argv": argv, "cwd": os.getcwd(), "env": self._env_changes(),
+                                  "profile": profile}).encode("utf-8") + b"\n"
+            try:
+                self.process.stdin.write(request)
+                self.process.stdin.flush()
+                line = self.process.stdout.readline()
+            except (BrokenPipeError, OSError):
+                line = b""
+            if not line: # The worker died mid command; the next call starts a new one
+                self.close()
+                message = "ERR: kli worker exited while running the command\n"
+                return KliResult(KLI_ERROR_CODE, "", message, message, time.perf_counter() - started)
+        response = json.loads(line)
+        return KliResult(response["code"], response["stdout"], response["stderr"], response["output"],
+                         response["seconds"], response.get("cpu_seconds", 0.0))
+
+    def close(self):
+        """ Stops the worker process. """
+        process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+
+_worker: Optional[KliWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_worker() -> KliWorker:
+    """ The shared worker of this process, stopped at interpreter exit. """
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = KliWorker()
+            atexit.register(_worker.close)
+        return _worker
+
+
+def run_kli(command: Union[str, Sequence[str]], profile: Optional[str] = None) -> KliResult:
+    """ Runs a plain kli command on the shared worker. """
+    return get_worker().run(command, profile)
+
+
+class KliWorkerPool:
+    """
+    Up to `size` KliWorkers for running independent kli commands concurrently.
+    Workers are started as concurrent demand requires and reused afterwards.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.workers: List[KliWorker] = []
+        self._idle: "queue.LifoQueue[KliWorker]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> KliWorker:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self.workers) < self.size:
+                worker = KliWorker()
+                self.workers.append(worker)
+                return worker
+        return self._idle.get()
+
+    def run(self, command: Union[str, Sequence[str]], profile: Optional[str] = None) -> KliResult:
+        """ Runs a plain kli command on an idle worker, waiting for one if all are busy. """
+        worker = self._acquire()
+        try:
+            return worker.run(command, profile)
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+
+
+_pool: Optional[KliWorkerPool] = None
+
+
+def get_pool(size: int) -> KliWorkerPool:
+    """ The shared worker pool of this process, grown to at least `size` workers. """
+    global _pool
+    with _worker_lock:
+        if _pool is None:
+            _pool = KliWorkerPool(size)
+            atexit.register(_pool.close)
+        _pool.size = max(_pool.size, size)
+        return _pool
+
+
+def worker_enabled() -> bool:
+    return os.getenv(WORKER_ENV, "1") != "0"
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,460 @@
+import argparse
+import asyncio
+import queue
+import ssl
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from scripts.format_cesr import CesrEvent, CesrParseError, iter_cesr_events, iter_format_event, ndjson_line
+
+# Resolve many OOBIs concurrently over pooled keep-alive connections instead of
+# one curl process each. In a notebook (which already runs an event loop):
+# from scripts.oobi_fetch import fetch_oobis_async
+# results = await fetch_oobis_async([f"http://witness-demo:5642/oobi/{aid}/witness" for aid in aids])
+# for result in results:
+#     print(result.url, result.error or len(result.events))
+#
+# Or stream the events of one OOBI as they arrive:
+# from scripts.oobi_fetch import ConnectionPool, iter_oobi_events
+# async with ConnectionPool() as pool:
+#     async for event in iter_oobi_events("http://witness-demo:5642/oobi/BBilc4-L3tFUnfM_wJr4S4OJanAv_VmF_dJNN6vkf2Ha", pool):
+#         print(event.body["t"], event.body["s"])
+#
+# python -m scripts.oobi_fetch http://witness-demo:5642/oobi/BBilc4-L3tFUnfM_wJr4S4OJanAv_VmF_dJNN6vkf2Ha
+
+
+# --- Constants ---
+DEFAULT_CONCURRENCY = 32 # OOBIs fetched at the same time
+DEFAULT_CONNECTIONS_PER_HOST = 8 # Keep-alive connections opened to any one witness/agent
+DEFAULT_TIMEOUT = 30.0 # Seconds to wait for a connection or the next piece of a response
+READ_SIZE = 64 * 1024 # Bytes read from a connection at a time
+MAX_REDIRECTS = 5
+USER_AGENT = "vlei-trainings-oobi-fetch"
+ACCEPT = "application/cesr+json, application/json, */*"
+
+
+class OobiFetchError(IOError):
+    """ Raised when an OOBI endpoint cannot be reached or does not answer 200 OK. """
+
+    def __init__(self, url: str, message: str, status: Optional[int] = None):
+        super().__init__(f"{url}: {message}")
+        self.url = url
+        self.status = status
+
+
+# --- Connection Pool ---
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.requests = 0
+
+    def close(self):
+        self.writer.close()
+
+
+class ConnectionPool:
+    """
+    HTTP/1.1 keep-alive connections shared by concurrent requests, at most
+    `per_host` open to each (scheme, host, port). A finished response returns
+    its connection to the pool so the next request to that host skips the
+    TCP (and TLS) handshake.
+    """
+
+    def __init__(self, per_host: int = DEFAULT_CONNECTIONS_PER_HOST, timeout: float = DEFAULT_TIMEOUT,
+                 ssl_context: Optional[ssl.SSLContext] = None):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self.connections_opened = 0
+        self._idle: Dict[Tuple[str, str, int], List[_Connection]] = {}
+        self._slots: Dict[Tuple[str, str, int], asyncio.Semaphore] = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        """ Closes every idle connection. """
+        for connections in self._idle.values():
+            for connection in connections:
+                connection.close()
+        self._idle.clear()
+
+    async def _acquire(self, key: Tuple[str, str, int]) -> Tuple[_Connection, bool]:
+        """ Returns (connection, reused) for a host; the caller must hold its slot. """
+        idle = self._idle.get(key)
+        while idle:
+            connection = idle.pop()
+            if not connection.reader.at_eof():
+                return connection, True
+            connection.close()
+        scheme, host, port = key
+        context = (self.ssl_context or ssl.create_default_context()) if scheme == "https" else None
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port, ssl=context,
+                                                                        limit=READ_SIZE * 4), self.timeout)
+        self.connections_opened += 1
+        return _Connection(reader, writer), False
+
+    def _release(self, key: Tuple[str, str, int], connection: _Connection, reusable: bool):
+        if reusable:
+            self._idle.setdefault(key, []).append(connection)
+        else:
+            connection.close()
+
+    async def stream(self, url: str, max_redirects: int = MAX_REDIRECTS) -> AsyncIterator[bytes]:
+        """
+        GETs `url` and yields the response body as it arrives (Content-Length,
+        chunked or read-to-close framing), following redirects.
+
+        Raises:
+            OobiFetchError: On connection failures, timeouts or a non-200 answer.
+        """
+        for _ in range(max_redirects + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ("http", "https") or not parts.hostname:
+                raise OobiFetchError(url, "not an http(s) URL")
+            key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+            slot = self._slots.setdefault(key, asyncio.Semaphore(self.per_host))
+            async with slot:
+                connection, reusable = None, False
+                try:
+                    connection, reused = await self._acquire(key)
+                    try:
+                        status, headers = await self._send(connection, parts)
+                    except (ConnectionError, asyncio.IncompleteReadError) as e:
+                        if not reused:
+                            raise
+                        # The server dropped an idle keep-alive connection; retry once on a fresh one
+                        connection.close()
+                        connection, reused = await self._acquire(key)
+                        status, headers = await self._send(connection, parts)
+
+                    location = headers.get("location")
+                    if status in (301, 302, 303, 307, 308) and location:
+                        async for _ in self._read_body(connection, headers):
+                            pass
+                        reusable = headers.get("connection", "").lower() != "close"
+                        url = urljoin(url, location)
+                        continue
+                    if status != 200:
+                        snippet = b""
+                        async for chunk in self._read_body(connection, headers):
+                            snippet = (snippet + chunk)[:200]
+                        raise OobiFetchError(url, f"HTTP {status}: {snippet.decode('utf-8', errors='replace')}",
+                                             status)
+
+                    async for chunk in self._read_body(connection, headers):
+                        yield chunk
+                    reusable = (headers.get("connection", "").lower() != "close"
+                                and ("content-length" in headers or "chunked" in headers.get("transfer-encoding", "")))
+                    return
+                except asyncio.TimeoutError as e:
+                    raise OobiFetchError(url, f"timed out after {self.timeout}s") from e
+                except (OSError, asyncio.IncompleteReadError) as e:
+                    if isinstance(e, OobiFetchError):
+                        raise
+                    raise OobiFetchError(url, f"connection failed: {e}") from e
+                finally:
+                    # A body abandoned half way cannot be reused: the rest is still on the socket
+                    if connection is not None:
+                        self._release(key, connection, reusable)
+        raise OobiFetchError(url, f"more than {max_redirects} redirects")
+
+    async def _send(self, connection: _Connection, parts) -> Tuple[int, Dict[str, str]]:
+        """ Writes a GET request and reads the status line and headers. """
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        host = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+        request = (f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: {ACCEPT}\r\n"
+                   f"User-Agent: {USER_AGENT}\r\nConnection: keep-alive\r\n\r\n")
+        connection.writer.write(request.encode("ascii"))
+        await connection.writer.drain()
+        connection.requests += 1
+
+        status_line = await asyncio.wait_for(connection.reader.readline(), self.timeout)
+        if not status_line:
+            raise ConnectionResetError("connection closed before the response")
+        try:
+            version, status = status_line.decode("latin-1").split(None, 2)[:2]
+            status = int(status)
+        except ValueError:
+            raise OobiFetchError(parts.geturl(), f"malformed status line {status_line!r}")
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(connection.reader.readline(), self.timeout)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if version == "HTTP/1.0" and headers.get("connection", "").lower() != "keep-alive":
+            headers["connection"] = "close"
+        return status, headers
+
+    async def _read_body(self, connection: _Connection, headers: Dict[str, str]) -> AsyncIterator[bytes]:
+        reader = connection.reader
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            while True:
+                size_line = await asyncio.wait_for(reader.readline(), self.timeout)
+                size = int(size_line.split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    while await asyncio.wait_for(reader.readline(), self.timeout) not in (b"\r\n", b"\n", b""):
+                        pass # Trailer headers
+                    return
+                while size:
+                    chunk = await asyncio.wait_for(reader.read(min(size, READ_SIZE)), self.timeout)
+                    if not chunk:
+                        raise asyncio.IncompleteReadError(b"", size)
+                    size -= len(chunk)
+                    yield chunk
+                await asyncio.wait_for(reader.readline(), self.timeout)
+        elif "content-length" in headers:
+            remaining = int(headers["content-length"])
+            while remaining:
+                chunk = await asyncio.wait_for(reader.read(min(remaining, READ_SIZE)), self.timeout)
+                if not chunk:
+                    raise asyncio.IncompleteReadError(b"", remaining)
+                remaining -= len(chunk)
+                yield chunk
+        else:
+            while True:
+                chunk = await asyncio.wait_for(reader.read(READ_SIZE), self.timeout)
+                if not chunk:
+                    return
+                yield chunk
+
+
+# --- Streaming Parse ---
+
+class _ChunkFeed:
+    """
+    Hands response chunks from the event loop to one `iter_cesr_events` run
+    in a parser thread, one chunk at a time.
+
+    The parser asks for the next chunk only once it has framed every event
+    the data so far completes, so when it is `hungry` all of those are in
+    `events`. The parser's window keeps only the unfinished event, and each
+    byte is framed once however many chunks a large event arrives in.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.hungry = asyncio.Event() # Set when the parser waits for a chunk, or has stopped
+        self.events: List[CesrEvent] = []
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self._chunks: "queue.SimpleQueue[Optional[bytes]]" = queue.SimpleQueue()
+        self._lock = threading.Lock()
+
+    def _wake(self):
+        """ Sets `hungry` from the parser thread. """
+        try:
+            self.loop.call_soon_threadsafe(self.hungry.set)
+        except RuntimeError: # The loop already closed: the fetch ended before the parser and nobody waits
+            pass
+
+    def _next_chunks(self):
+        while True:
+            self._wake()
+            chunk = self._chunks.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    def parse(self):
+        """ Parser thread: frames the chunks until the end of the response or an error. """
+        try:
+            for event in iter_cesr_events(self._next_chunks()):
+                with self._lock:
+                    self.events.append(event)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._wake()
+
+    def put(self, chunk: Optional[bytes]):
+        """ Gives the parser its next chunk (None ends the response). Call only while `hungry`. """
+        self.hungry.clear()
+        self._chunks.put(chunk)
+
+    def take(self) -> List[CesrEvent]:
+        with self._lock:
+            events, self.events = self.events, []
+        return events
+
+
+async def iter_oobi_events(url: str, pool: Optional[ConnectionPool] = None) -> AsyncIterator[CesrEvent]:
+    """
+    Fetches an OOBI (or any CESR endpoint) and yields its events as soon as
+    each one has fully arrived. Only the unfinished tail of the response is
+    held in memory.
+
+    Args:
+        url: The OOBI URL.
+        pool: Connection pool to fetch through; a private one is used if None.
+
+    Raises:
+        OobiFetchError: If the fetch fails.
+        CesrParseError: As soon as the response stops parsing as CESR, or at
+                        its end if the last event is truncated.
+    """
+    if pool is None:
+        async with ConnectionPool() as pool:
+            async for event in iter_oobi_events(url, pool):
+                yield event
+        return
+
+    feed = _ChunkFeed(asyncio.get_running_loop())
+    threading.Thread(target=feed.parse, name="oobi-parse", daemon=True).start()
+    stream = pool.stream(url)
+    try:
+        async for chunk in stream:
+            await feed.hungry.wait()
+            for event in feed.take():
+                yield event
+            if feed.done:
+                break # Parse error; the rest of the response is not read
+            feed.put(chunk)
+        await feed.hungry.wait()
+        if not feed.done:
+            feed.put(None)
+            await feed.hungry.wait()
+        for event in feed.take():
+            yield event
+        if feed.error is not None:
+            raise feed.error
+    finally:
+        if not feed.done:
+            feed.put(None) # Lets the parser thread finish if the caller stopped early
+        await stream.aclose() # Hands the connection back (or closes it) even if the caller stops early
+
+
+# --- Concurrent Fetching ---
+
+@dataclass
+class FetchResult:
+    """ Outcome of fetching one OOBI: its events, or the error that stopped it. """
+    url: str
+    events: List[CesrEvent] = field(default_factory=list)
+    error: Optional[Exception] = None
+    seconds: float = 0.0
+
+
+async def fetch_oobis_async(urls: List[str], concurrency: int = DEFAULT_CONCURRENCY,
+                            per_host: int = DEFAULT_CONNECTIONS_PER_HOST,
+                            timeout: float = DEFAULT_TIMEOUT, pool: Optional[ConnectionPool] = None,
+                            on_event=None) -> List[FetchResult]:
+    """
+    Fetches many OOBIs concurrently through one connection pool.
+
+    Args:
+        urls: OOBI URLs to resolve.
+        concurrency: Maximum fetches in flight.
+        per_host: Maximum keep-alive connections per host.
+        timeout: Seconds to wait for a connection or the next part of a response.
+        pool: Connection pool to share across calls; a private one is used if None.
+        on_event: Optional callback `on_event(url, event)` called as each event
+                  arrives, e.g. to process events without keeping them. When
+                  given, `FetchResult.events` is left empty.
+
+    Returns:
+        One `FetchResult` per URL, in the order of `urls`. Failures are
+        reported in `error` rather than raised.
+    """
+    own_pool = pool is None
+    pool = pool or ConnectionPool(per_host=per_host, timeout=timeout)
+    limit = asyncio.Semaphore(concurrency)
+
+    async def fetch(url: str) -> FetchResult:
+        result = FetchResult(url)
+        async with limit:
+            started = time.perf_counter()
+            try:
+                async for event in iter_oobi_events(url, pool):
+                    if on_event is not None:
+                        on_event(url, event)
+                    else:
+                        result.events.append(event)
+            except (OobiFetchError, CesrParseError) as e:
+                result.error = e
+            result.seconds = time.perf_counter() - started
+        return result
+
+    try:
+        return await asyncio.gather(*(fetch(url) for url in urls))
+    finally:
+        if own_pool:
+            await pool.close()
+
+
+def fetch_oobis(urls: List[str], **kwargs) -> List[FetchResult]:
+    """
+    Blocking wrapper around `fetch_oobis_async`. Inside a running event loop
+    (a notebook cell) the fetch runs on a helper thread with its own loop; in
+    notebooks prefer `await fetch_oobis_async(...)` directly.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(fetch_oobis_async(urls, **kwargs))
+
+    results = []
+    worker = threading.Thread(target=lambda: results.append(asyncio.run(fetch_oobis_async(urls, **kwargs))))
+    worker.start()
+    worker.join()
+    return results[0]
+
+
+# --- CLI ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch OOBIs/KELs concurrently and print their CESR events.")
+    parser.add_argument("urls", nargs="*", help="OOBI URLs to fetch.")
+    parser.add_argument("-i", "--input", help="File with one OOBI URL per line.")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Fetches in flight.")
+    parser.add_argument("--per-host", type=int, default=DEFAULT_CONNECTIONS_PER_HOST,
+                        help="Keep-alive connections per host.")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Seconds before a fetch times out.")
+    parser.add_argument("-f", "--format", dest="output_format", choices=("text", "ndjson", "summary"),
+                        default="text", help="Print events as text (default), ndjson, or only a per URL summary.")
+    args = parser.parse_args(argv)
+
+    urls = list(args.urls)
+    if args.input:
+        with open(args.input, "r", encoding="utf-8") as f:
+            urls.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    if not urls:
+        parser.error("no OOBI URLs given")
+
+    started = time.perf_counter()
+    results = fetch_oobis(urls, concurrency=args.concurrency, per_host=args.per_host, timeout=args.timeout)
+    failed = 0
+    for result in results:
+        if result.error is not None:
+            failed += 1
+            message = result.error if isinstance(result.error, OobiFetchError) else f"{result.url}: {result.error}"
+            print(f"❌ {message}", file=sys.stderr)
+        if args.output_format == "summary":
+            if result.error is None:
+                print(f"✅ {result.url}: {len(result.events)} events in {result.seconds:.3f}s")
+        elif args.output_format == "ndjson":
+            for event in result.events:
+                print(ndjson_line(event))
+        else:
+            for event in result.events:
+                print("\n".join(iter_format_event(event)))
+    print(f"Fetched {len(urls) - failed}/{len(urls)} OOBIs in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+import argparse
+import fnmatch
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from itertools import repeat
+from typing import Any, Iterator, List, Optional, Sequence
+
+from keri.core import coring
+
+from scripts.saidify import JSON_SCHEMA_ID_KEY, digest_said, encode_key, scalar_text
+
+# Recompute and check every SAID in a bundle of schemas or credential data:
+# python -m scripts.said_verify config/schemas --jobs 0
+# python -m scripts.said_verify config/schemas --compare-codes
+#
+# from scripts.said_verify import verify_saids
+# report = verify_saids(["config/schemas"])
+# print(report["saids_checked"], report["mismatches"])
+
+
+# --- Constants ---
+DEFAULT_LABELS = (JSON_SCHEMA_ID_KEY, "d") # Schemas carry their SAIDs in '$id', ACDCs in 'd'
+DEFAULT_FILES_PER_TASK = 64 # Files handed to a worker per task
+COMPARE_HASH_CODES = (coring.MtrDex.Blake3_256, coring.MtrDex.Blake2b_256, coring.MtrDex.SHA3_256)
+
+
+def _said_code(value: Any) -> Optional[str]:
+    """ The digest code of a qb64 SAID, or None if `value` is not one. """
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        code = coring.Matter(qb64=value).code
+    except Exception:
+        return None
+    return code if code in coring.Saider.Digests else None
+
+
+def _pointer(path: list) -> str:
+    """ JSON pointer of a path of keys and indices. """
+    return "".join("/" + str(key).replace("~", "~0").replace("/", "~1") for key in path)
+
+
+class _Checker:
+    """
+    Recomputes SAIDs bottom-up in one pass over a document, the same way
+    scripts.saidify computes them: every dict with a label field holding a
+    SAID is serialized with that field set to the dummy and digested with
+    the SAID's own hash code. Nested SAIDs are used as found, so a block
+    is checked against its content as stored.
+
+    With `hash_code` set, every SAID is recomputed with that code and
+    nothing is compared (used to measure hash code throughput).
+    """
+
+    def __init__(self, labels: Sequence[str], hash_code: Optional[str] = None):
+        self.labels = labels
+        self.hash_code = hash_code
+        self.checked = 0
+        self.mismatches: List[dict] = []
+
+    def check(self, value: Any, path: list) -> str:
+        if isinstance(value, dict):
+            label = code = None
+            for candidate in self.labels:
+                code = _said_code(value.get(candidate))
+                if code is not None:
+                    label = candidate
+                    break
+            parts, label_at = [], None
+            for key, item in value.items():
+                if key == label:
+                    label_at = len(parts)
+                path.append(key)
+                text = self.check(item, path) if isinstance(item, (dict, list)) else scalar_text(item)
+                path.pop()
+                parts.append(f"{encode_key(key)}:{text}")
+            if label_at is not None:
+                self._verify(value, parts, label, label_at, self.hash_code or code, path)
+            return "{" + ",".join(parts) + "}"
+
+        texts = []
+        for index, item in enumerate(value):
+            path.append(index)
+            texts.append(self.check(item, path) if isinstance(item, (dict, list)) else scalar_text(item))
+            path.pop()
+        return "[" + ",".join(texts) + "]"
+
+    def _verify(self, block: dict, parts: list, label: str, label_at: int, code: str, path: list):
+        found = block[label]
+        try:
+            if "v" in block: # Versioned data has its version string sized too, which Saider does
+                expected = coring.Saider(sad=block, code=code, label=label).qb64
+            else:
+                text = parts[label_at]
+                parts[label_at] = f'{encode_key(label)}:"{coring.Saider.Dummy * coring.Matter.Sizes[code].fs}"'
+                expected = digest_said(("{" + ",".join(parts) + "}").encode("utf-8"), code)
+                parts[label_at] = text
+        except Exception as e:
+            self.mismatches.append({"path": _pointer(path), "label": label, "found": found, "expected": None,
+                                    "error": str(e)})
+            return
+        self.checked += 1
+        if self.hash_code is None and expected != found:
+            self.mismatches.append({"path": _pointer(path), "label": label, "found": found, "expected": expected})
+
+
+def verify_document(data: Any, labels: Sequence[str] = DEFAULT_LABELS) -> dict:
+    """
+    Checks every SAID in a loaded schema or credential: the top level and
+    every nested block whose '$id' (or other label) holds a SAID.
+
+    Returns:
+        {"saids_checked", "mismatches", "saidified"}; each mismatch has the
+        block's JSON pointer 'path', its 'label', the SAID 'found' and the one
+        'expected'. 'saidified' is False for documents without a SAID at the
+        top level (templates, plain attribute data); any nested SAIDs they
+        hold are still checked.
+    """
+    checker = _Checker(labels)
+    if isinstance(data, (dict, list)):
+        checker.check(data, [])
+    saidified = isinstance(data, dict) and any(_said_code(data.get(label)) for label in labels)
+    return {"saids_checked": checker.checked, "mismatches": checker.mismatches, "saidified": saidified}
+
+
+# --- Files ---
+
+def iter_files(paths: Sequence[str], pattern: str = "*.json") -> Iterator[str]:
+    """ Yields the given files and every file matching `pattern` under the given directories, in sorted order. """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(fnmatch.filter(files, pattern)):
+                if not name.startswith("."): # Manifests, index files and temp files of atomic writes
+                    yield os.path.join(root, name)
+
+
+def _verify_files(filepaths: List[str], labels: Sequence[str]) -> List[dict]:
+    """ Worker task: verifies a chunk of files. """
+    results = []
+    for filepath in filepaths:
+        result = {"file": filepath, "saids_checked": 0, "mismatches": [], "saidified": True, "bytes": 0}
+        try:
+            with open(filepath, "rb") as f:
+                raw = f.read()
+            result["bytes"] = len(raw)
+            result.update(verify_document(json.loads(raw), labels))
+        except (IOError, ValueError) as e:
+            result["error"] = str(e)
+        results.append(result)
+    return results
+
+
+def _chunks(items: Iterator[str], size: int) -> Iterator[List[str]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def verify_saids(paths: Sequence[str], workers: Optional[int] = None, labels: Sequence[str] = DEFAULT_LABELS,
+                 pattern: str = "*.json", files_per_task: int = DEFAULT_FILES_PER_TASK) -> dict:
+    """
+    Verifies every SAID in many schema or credential files in parallel.
+
+    Args:
+        paths: Files and directories (searched recursively for `pattern`).
+        workers: Worker processes (defaults to one per CPU; 1 verifies in this process).
+        labels: Fields that hold SAIDs, tried in order for each block.
+        pattern: File name pattern used inside directories.
+        files_per_task: Files handed to a worker at a time.
+
+    Returns:
+        A report with counts ('files', 'saids_checked', 'bytes'), throughput
+        ('seconds', 'saids_per_second'), 'mismatches' (each with its 'file'),
+        'unsaidified' files without a SAID at the top level (not an error)
+        and 'errors' for files that could not be read or parsed.
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunks(iter_files(paths, pattern), files_per_task)
+    if workers == 1:
+        batches = (_verify_files(chunk, labels) for chunk in chunks)
+        results = [result for batch in batches for result in batch]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = [result for batch in executor.map(_verify_files, chunks, repeat(labels))
+                       for result in batch]
+
+    report = {"files": len(results), "saids_checked": 0, "bytes": 0, "mismatches": [], "unsaidified": [],
+              "errors": []}
+    for result in results:
+        report["saids_checked"] += result["saids_checked"]
+        report["bytes"] += result["bytes"]
+        report["mismatches"].extend(dict(mismatch, file=result["file"]) for mismatch in result["mismatches"])
+        if not result["saidified"] and "error" not in result:
+            report["unsaidified"].append(result["file"])
+        if "error" in result:
+            report["errors"].append({"file": result["file"], "error": result["error"]})
+    report["seconds"] = time.perf_counter() - started
+    report["saids_per_second"] = report["saids_checked"] / report["seconds"] if report["seconds"] else 0.0
+    return report
+
+
+# --- Hash Code Comparison ---
+
+def compare_hash_codes(paths: Sequence[str], codes: Sequence[str] = COMPARE_HASH_CODES,
+                       labels: Sequence[str] = DEFAULT_LABELS, pattern: str = "*.json", rounds: int = 3) -> List[dict]:
+    """
+    Measures how fast every SAID in the files is recomputed with each hash
+    code, serialization included. Files are loaded once up front and each
+    code runs single threaded, so only the digest differs between runs.
+
+    Returns:
+        Per code: 'code', 'name', 'saids', best 'seconds' of `rounds`,
+        'saids_per_second' and 'mb_per_second' (of input JSON).
+    """
+    documents, size = [], 0
+    for filepath in iter_files(paths, pattern):
+        try:
+            with open(filepath, "rb") as f:
+                raw = f.read()
+            documents.append(json.loads(raw))
+            size += len(raw)
+        except (IOError, ValueError) as e:
+            print(f"Warning: Skipping {filepath}: {e}", file=sys.stderr)
+
+    names = {code: name for name, code in asdict(coring.MtrDex).items()}
+    results = []
+    for code in codes:
+        best, saids = None, 0
+        for _ in range(rounds):
+            checker = _Checker(labels, hash_code=code)
+            started = time.perf_counter()
+            for data in documents:
+                if isinstance(data, (dict, list)):
+                    checker.check(data, [])
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+            saids = checker.checked
+        results.append({"code": code, "name": names.get(code, code), "saids": saids, "seconds": best,
+                        "saids_per_second": saids / best if best else 0.0,
+                        "mb_per_second": size / best / 1024 ** 2 if best else 0.0})
+    return results
+
+
+# --- CLI ---
+
+def print_report(report: dict):
+    print(f"Checked {report['saids_checked']} SAIDs in {report['files']} files ({report['bytes']} bytes) "
+          f"in {report['seconds']:.2f}s ({report['saids_per_second']:.0f} SAIDs/s)")
+    for error in report["errors"]:
+        print(f"ERROR     {error['file']}: {error['error']}")
+    if report["unsaidified"]:
+        print(f"Skipped the top level of {len(report['unsaidified'])} files without a SAID: "
+              f"{', '.join(report['unsaidified'])}")
+    for mismatch in report["mismatches"]:
+        where = f"{mismatch['file']}#{mismatch['path']} {mismatch['label']}"
+        if mismatch["expected"] is None:
+            print(f"MISMATCH  {where}: {mismatch['error']}")
+        else:
+            print(f"MISMATCH  {where}={mismatch['found']} expected {mismatch['expected']}")
+    if not report["mismatches"] and not report["errors"]:
+        print("All SAIDs verified.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify every SAID in schema and credential files.")
+    parser.add_argument("paths", nargs="+", help="Files or directories of JSON files.")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="Worker processes, 0 for one per CPU (default).")
+    parser.add_argument("--pattern", default="*.json", help="File name pattern inside directories.")
+    parser.add_argument("--label", action="append", help="Field holding SAIDs (repeatable, default: $id and d).")
+    parser.add_argument("--compare-codes", action="store_true",
+                        help="Also compare SAID throughput across Blake3, Blake2b and SHA3.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args(argv)
+    labels = tuple(args.label) if args.label else DEFAULT_LABELS
+
+    report = verify_saids(args.paths, workers=args.jobs or None, labels=labels, pattern=args.pattern)
+    if args.compare_codes:
+        report["hash_codes"] = compare_hash_codes(args.paths, labels=labels, pattern=args.pattern)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+        for result in report.get("hash_codes", []):
+            print(f"{result['name']:<14} {result['saids_per_second']:>12.0f} SAIDs/s {result['mb_per_second']:>8.1f} MB/s")
+    return 1 if report["mismatches"] or report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,21 @@
+import argparse
+import copy
+import fnmatch
+import hashlib
 import json
 import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from json.encoder import encode_basestring
 from keri.core import coring, scheming
-import copy # Needed for deepcopy if preferred
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, TextIO, Tuple
+
+from scripts.files import file_digest, output_mode
 
 
 # --- Constants ---
@@ -10,121 +23,501 @@ DEFAULT_SAID_KEY = coring.Saids.dollar  # Use $id for the top-level schema SAID
 DEFAULT_HASH_CODE = coring.MtrDex.Blake3_256
 JSON_SCHEMA_ID_KEY = '$id' # Standard key for identifying sub-schemas
 PROPERTY_KEYS_TO_PROCESS = ["a", "e", "r"] # Keys whose contents might need SAIDs
+MANIFEST_NAME = '.saidify-manifest.json' # Input hashes of a batch run, kept in the output directory
+DEFAULT_SAID_CACHE_SIZE = 10_000 # SAIDs kept in memory by a SaidCache
+SAID_CACHE_COMMIT_EVERY = 1_000 # New SAIDs buffered before a SaidCache commits them to disk
+HEADER_CHUNK_SIZE = 4096 # Characters read at first when looking for a top-level SAID
+DATA_SAID_KEY = 'd' # SAID field of ACDC attribute, edge and rule blocks
+CREDENTIAL_SECTIONS = ('a', 'e', 'r') # Blocks of an ACDC prepared from credential data
+DEFAULT_RECORD_BATCH_SIZE = 1_000 # Credential data records handed to a worker per task
+
+
+# --- Helper Functions ---
+
+def encode_key(key) -> str:
+    """ JSON text of a dict key; json.dumps turns non-string keys into strings. """
+    return encode_basestring(key if isinstance(key, str) else json.dumps(key))
+
+
+def digest_said(ser: bytes, hash_code: str) -> str:
+    """ qb64 SAID of serialized bytes, digested exactly as coring.Saider does. """
+    klas, size, length = coring.Saider.Digests[hash_code]
+    digest = klas(ser, digest_size=size) if size else klas(ser)
+    raw = digest.digest(length=length) if length else digest.digest()
+    return coring.Matter(raw=raw, code=hash_code).qb64
 
 
-# --- Helper Function ---
+# --- SAID Cache ---
 
-def _try_calculate_and_set_said(item: dict, hash_code: str):
+class SaidCache:
     """
-    Checks if a dictionary item has '$id' and content besides '$id'.
-    If so, calculates its SAID using '$id' as the label and updates the item's '$id'.
+    Memoizes SAIDs by a short digest of the serialized block (with the SAID
+    field already filled with the dummy) and the hash code, so identical
+    blocks, such as rule and edge sections shared by many schemas, are only
+    SAIDified once.
+
+    SAIDs are kept in a bounded in-memory LRU and, when `path` is given, in
+    a sqlite file that later runs and other processes can share.
 
     Args:
-        item: The dictionary to process.
-        hash_code: The hash algorithm code (e.g., Blake3_256).
+        maxsize: Maximum SAIDs held in memory; 0 disables the memory cache.
+        path: Optional sqlite file for a persistent cache.
     """
-    # Ensure item is a dict and has the $id key
-    if not isinstance(item, dict) or JSON_SCHEMA_ID_KEY not in item:
-        return # Not applicable for SAID calculation
 
-    # Check if there's content other than the $id key itself
-    # Create a shallow copy is enough for this check
-    temp_copy_for_check = item.copy()
-    del temp_copy_for_check[JSON_SCHEMA_ID_KEY] # Remove $id for the check
+    def __init__(self, maxsize: int = DEFAULT_SAID_CACHE_SIZE, path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0 # Found in memory
+        self.disk_hits = 0 # Found in the sqlite file
+        self.misses = 0 # Computed
+        self._saids: OrderedDict = OrderedDict()
+        self._conn = None
+        self._unsaved = 0
+        if path:
+            self._conn = sqlite3.connect(path, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL") # Lets batch workers read while one writes
+            self._conn.execute("CREATE TABLE IF NOT EXISTS saids (key BLOB PRIMARY KEY, said TEXT NOT NULL)")
+
+    @staticmethod
+    def _key(ser: bytes, hash_code: str) -> bytes:
+        return hash_code.encode() + b":" + hashlib.blake2b(ser, digest_size=16).digest()
+
+    def said(self, ser: bytes, hash_code: str) -> str:
+        """ The SAID of `ser` (the block serialized with the dummy in its SAID field), computed only on a miss. """
+        key = self._key(ser, hash_code)
+        said = self._saids.get(key)
+        if said is not None:
+            self.hits += 1
+            self._saids.move_to_end(key)
+            return said
+        if self._conn is not None:
+            row = self._conn.execute("SELECT said FROM saids WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.disk_hits += 1
+                self._remember(key, row[0])
+                return row[0]
+        self.misses += 1
+        said = digest_said(ser, hash_code)
+        self._remember(key, said)
+        if self._conn is not None:
+            self._conn.execute("INSERT OR IGNORE INTO saids (key, said) VALUES (?, ?)", (key, said))
+            self._unsaved += 1
+            if self._unsaved >= SAID_CACHE_COMMIT_EVERY:
+                self.flush()
+        return said
+
+    def _remember(self, key: bytes, said: str):
+        if self.maxsize <= 0:
+            return
+        self._saids[key] = said
+        if len(self._saids) > self.maxsize:
+            self._saids.popitem(last=False)
+
+    def flush(self):
+        """ Commits SAIDs computed since the last flush to the sqlite file. """
+        if self._conn is not None and self._unsaved:
+            self._conn.commit()
+            self._unsaved = 0
+
+    def close(self):
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
 
-    if not temp_copy_for_check:
-        return # Skip SAID calculation if no content besides $id
+    def __enter__(self):
+        return self
 
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self) -> dict:
+        """ Hit/miss counters and the hit rate over all lookups so far. """
+        lookups = self.hits + self.disk_hits + self.misses
+        return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses, 'size': len(self._saids),
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0}
+
+
+SAID_CACHE = SaidCache() # Used whenever no cache is passed in
+
+
+def scalar_text(value: Any) -> str:
+    """ Compact JSON text of a non-container value, as json.dumps would write it. """
+    if isinstance(value, str):
+        return encode_basestring(value)
+    if value is None or isinstance(value, bool):
+        return json.dumps(value)
+    if isinstance(value, int):
+        return int.__repr__(value)
+    return json.dumps(value) # floats (and anything else json can encode)
+
+
+def _seal(item: dict, parts: list, label: str, label_at: int, hash_code: str,
+          cache: Optional[SaidCache] = None) -> str:
+    """
+    Computes the SAID of a dict from the serialized `parts` of its fields
+    (with the SAID field at `label_at`), stores it in `item[label]` and
+    returns the dict's final compact JSON text.
+    """
     try:
-        # Calculate SAID using $id as the label.
-        item_for_saider = item.copy()
-        said = coring.Saider(sad=item_for_saider,
-                             code=hash_code,
-                             label=JSON_SCHEMA_ID_KEY).qb64
-        # Update the original item's $id field with the calculated SAID
-        item[JSON_SCHEMA_ID_KEY] = said
+        if "v" in item: # Versioned data needs its version string sized, which Saider does
+            said = coring.Saider(sad=item, code=hash_code, label=label).qb64
+        else:
+            dummy = coring.Saider.Dummy * coring.Matter.Sizes[hash_code].fs
+            parts[label_at] = f'{encode_key(label)}:"{dummy}"'
+            said = (cache or SAID_CACHE).said(("{" + ",".join(parts) + "}").encode("utf-8"), hash_code)
     except Exception as e:
-        # Catch potential errors during SAID calculation (like EmptyMaterialError, though unlikely now)
-        original_id = item.get(JSON_SCHEMA_ID_KEY, 'N/A') # Get original $id for logging
-        print(f"Warning: Error generating SAID for item with original {JSON_SCHEMA_ID_KEY}='{original_id}'. Error: {e}")
+        print(f"Warning: Error generating SAID for item with original {label}='{item.get(label, 'N/A')}'. Error: {e}")
+        parts[label_at] = f"{encode_key(label)}:{scalar_text(item[label])}"
+        return "{" + ",".join(parts) + "}"
+    item[label] = said
+    parts[label_at] = f'{encode_key(label)}:"{said}"'
+    return "{" + ",".join(parts) + "}"
+
+
+def _saidify(value: Any, labels: Dict[int, str], hash_code: str,
+             cache: Optional[SaidCache] = None) -> Tuple[Any, str]:
+    """
+    Copies `value` and computes its compact JSON serialization in one
+    bottom-up pass. Every dict whose id() is in `labels` (and which has that
+    label as a field) gets a SAID in that field, computed from its children's
+    serializations (which already carry their own SAIDs) with the label
+    filled with the Saider dummy, exactly as coring.Saider would serialize it.
 
+    Returns:
+        (the copy with SAIDs set, its compact JSON text).
+    """
+    if isinstance(value, dict):
+        label = labels.get(id(value))
+        copied, parts, label_at = {}, [], None
+        for key, item in value.items():
+            copied[key], text = _saidify(item, labels, hash_code, cache)
+            if key == label:
+                label_at = len(parts)
+            parts.append(f"{encode_key(key)}:{text}")
+        if label_at is None: # Like Saider, only an existing field can hold the SAID
+            return copied, "{" + ",".join(parts) + "}"
+        return copied, _seal(copied, parts, label, label_at, hash_code, cache)
+
+    if isinstance(value, (list, tuple)):
+        copied, texts = [], []
+        for item in value:
+            item, text = _saidify(item, labels, hash_code, cache)
+            copied.append(item)
+            texts.append(text)
+        return copied, "[" + ",".join(texts) + "]"
+
+    return value, scalar_text(value)
+
+
+def _sub_schema_labels(data_dict: dict) -> Dict[int, str]:
+    """
+    Finds the sub-schemas that get their own SAID: the 'a', 'e' and 'r'
+    properties and their 'oneOf' items, where they have a '$id' and content
+    besides it.
+    """
+    labels = {}
+
+    def add(item):
+        if _is_sub_schema(item):
+            labels[id(item)] = JSON_SCHEMA_ID_KEY
+
+    properties = data_dict.get('properties')
+    if isinstance(properties, dict):
+        for prop_key in PROPERTY_KEYS_TO_PROCESS:
+            prop_value = properties.get(prop_key)
+            if isinstance(prop_value, dict):
+                add(prop_value)
+                if isinstance(prop_value.get('oneOf'), list):
+                    for item in prop_value['oneOf']:
+                        add(item)
+    return labels
+
+
+def _is_sub_schema(item: Any) -> bool:
+    """ True for a dict with a '$id' and content besides it. """
+    return isinstance(item, dict) and JSON_SCHEMA_ID_KEY in item and len(item) > 1
+
+
+def _nested_schema_labels(data_dict: dict) -> Dict[int, str]:
+    """ Finds every block below the root, at any depth, that has a '$id' and content besides it. """
+    labels = {}
+    stack = [value for value in data_dict.values() if isinstance(value, (dict, list))]
+    while stack:
+        value = stack.pop()
+        children = value.values() if isinstance(value, dict) else value
+        if _is_sub_schema(value):
+            labels[id(value)] = JSON_SCHEMA_ID_KEY
+        stack.extend(child for child in children if isinstance(child, (dict, list)))
+    return labels
 
 
 # --- Core Logic ---
 
-def add_saids_to_data(data_dict: dict, said_key: str = DEFAULT_SAID_KEY, hash_code: str = DEFAULT_HASH_CODE) -> dict:
+def add_saids_to_data(data_dict: dict, said_key: str = DEFAULT_SAID_KEY, hash_code: str = DEFAULT_HASH_CODE,
+                      recursive: bool = False, cache: Optional[SaidCache] = None) -> dict:
     """
     Adds Self-Addressing Identifiers (SAIDs) to the overall schema and specific sub-schemas.
     Processes specified top-level properties ('a', 'e', 'r') looking for sub-schemas
-    within 'oneOf' lists or directly if marked with '$id'.
+    within 'oneOf' lists or directly if marked with '$id'. With `recursive`,
+    every block with a '$id' at any depth gets a SAID instead, innermost first.
+
+    SAIDs are computed bottom-up in a single traversal that copies the data
+    once and serializes each subtree once: a sub-schema's SAID is computed
+    first and its serialization reused inside its parent's. The input is not
+    modified.
 
     Args:
         data_dict: The dictionary (e.g., loaded JSON schema) to process.
         said_key: The dictionary key for the SAID of the *entire* schema (e.g., '$id').
         hash_code: The KERI MtrDex code specifying the hashing algorithm.
+        recursive: SAIDify nested '$id' blocks at any depth, not only 'a', 'e' and 'r'.
+        cache: SaidCache to look SAIDs up in (defaults to the module wide `SAID_CACHE`).
 
     Returns:
-        The modified dictionary with SAIDs added.
+        A new dictionary with SAIDs added.
     """
-    # Use deepcopy for safety, ensuring original dict isn't modified until the end
-    processed_dict = copy.deepcopy(data_dict)
+    labels = _nested_schema_labels(data_dict) if recursive else _sub_schema_labels(data_dict)
+    if said_key in data_dict:
+        labels[id(data_dict)] = said_key
+    else:
+        print(f"Warning: Error generating top-level SAID ('{said_key}'): Error: no '{said_key}' field to hold it")
+    processed_dict, _ = _saidify(data_dict, labels, hash_code, cache)
+    return processed_dict
 
-    # --- Process specific properties for potential sub-schema SAIDs ---
-    if 'properties' in processed_dict:
-        properties = processed_dict['properties']
-        for prop_key in PROPERTY_KEYS_TO_PROCESS:
-            if prop_key in properties:
-                prop_value = properties[prop_key]
+# --- Incremental SAIDification ---
 
-                # Case 1: Direct property value is a dict (potentially with $id)
-                # The helper function will check for $id and content
-                if isinstance(prop_value, dict):
-                     _try_calculate_and_set_said(prop_value, hash_code)
+Path = Tuple[Any, ...] # Keys and list indices from the root, e.g. ('properties', 'a', 'oneOf', 1)
 
-                # Case 2: Property value contains 'oneOf' list
-                # Check items within the list
-                if isinstance(prop_value, dict) and 'oneOf' in prop_value and isinstance(prop_value['oneOf'], list):
-                    for item in prop_value['oneOf']:
-                        # Helper function checks if item is dict, has $id, and content
-                        _try_calculate_and_set_said(item, hash_code)
 
-    # --- Calculate and add SAID for the entire input dictionary ---
-    # Use the overall 'said_key' (e.g., '$id') provided to the function
-    dict_copy_for_said = copy.deepcopy(processed_dict) # Use a fresh deep copy for top-level SAID
-    try:
-        # Keri Saider handles the label exclusion internally based on the 'label' param.
-        processed_dict[said_key] = coring.Saider(sad=dict_copy_for_said,
-                                                 code=hash_code,
-                                                 label=said_key).qb64
-    except Exception as e:
-        print(f"Warning: Error generating top-level SAID ('{said_key}'): Error: {e}")
+def _parse_path(path) -> Path:
+    """ Accepts a tuple/list of keys and indices or a JSON pointer such as '/properties/a/oneOf/1'. """
+    if isinstance(path, str):
+        if not path:
+            return ()
+        tokens = path.lstrip("/").split("/")
+        return tuple(token.replace("~1", "/").replace("~0", "~") for token in tokens)
+    return tuple(path)
+
+
+def _pointer_of(path) -> str:
+    """ JSON pointer of a path of keys and indices. """
+    return "".join("/" + str(key).replace("~", "~0").replace("/", "~1") for key in path) or "/"
+
+
+class SchemaSaidifier:
+    """
+    Keeps a SAIDified copy of a schema up to date across edits.
+
+    The compact JSON text of every dict and list is cached by its path, so
+    after `update`/`delete` (or `mark_dirty` following an in-place change to
+    `data`) the next `saidify` only re-serializes and re-hashes the edited
+    subtree and the blocks that contain it; every other subtree is reused.
+
+    Args:
+        data: The schema to SAIDify; it is copied, not modified.
+        said_key: Field holding the SAID of the whole schema.
+        hash_code: The KERI MtrDex code of the digest.
+        recursive: SAIDify '$id' blocks at any depth (default), or only the
+                   'a', 'e' and 'r' blocks as `add_saids_to_data` does.
+        cache: SaidCache to look SAIDs up in (defaults to `SAID_CACHE`).
+    """
+
+    def __init__(self, data: dict, said_key: str = DEFAULT_SAID_KEY, hash_code: str = DEFAULT_HASH_CODE,
+                 recursive: bool = True, cache: Optional[SaidCache] = None):
+        self.data = copy.deepcopy(data)
+        self.said_key = said_key
+        self.hash_code = hash_code
+        self.recursive = recursive
+        self.cache = cache
+        self.saids: Dict[Path, str] = {} # SAIDed blocks by path
+        self.changed: Dict[Path, str] = {} # Blocks whose SAID changed in the last saidify()
+        self.hashed = 0 # SAIDs computed in the last saidify()
+        self._texts: Dict[Path, str] = {}
+        self.saidify()
+
+    def _label(self, node: dict, path: Path) -> Optional[str]:
+        if not path:
+            return self.said_key if self.said_key in node else None
+        if not _is_sub_schema(node):
+            return None
+        if self.recursive:
+            return JSON_SCHEMA_ID_KEY
+        if path[0] == 'properties' and len(path) in (2, 4) and path[1] in PROPERTY_KEYS_TO_PROCESS:
+            if len(path) == 2 or (path[2] == 'oneOf' and isinstance(path[3], int)):
+                return JSON_SCHEMA_ID_KEY
+        return None
+
+    def _build(self, node: Any, path: Path) -> str:
+        text = self._texts.get(path)
+        if text is not None:
+            return text
+        if isinstance(node, dict):
+            label = self._label(node, path)
+            parts, label_at = [], None
+            for key, item in node.items():
+                if key == label:
+                    label_at = len(parts)
+                child = self._build(item, path + (key,)) if isinstance(item, (dict, list)) else scalar_text(item)
+                parts.append(f"{encode_key(key)}:{child}")
+            if label_at is None:
+                text = "{" + ",".join(parts) + "}"
+            else:
+                previous = self.saids.get(path)
+                text = _seal(node, parts, label, label_at, self.hash_code, self.cache)
+                self.hashed += 1
+                self.saids[path] = node[label]
+                if node[label] != previous:
+                    self.changed[path] = node[label]
+        else:
+            text = "[" + ",".join(self._build(item, path + (index,)) if isinstance(item, (dict, list))
+                                  else scalar_text(item) for index, item in enumerate(node)) + "]"
+        self._texts[path] = text
+        return text
+
+    def saidify(self) -> dict:
+        """ Brings every SAID up to date, re-hashing only what changed since the last call. Returns `data`. """
+        self.hashed = 0
+        self.changed = {}
+        self._build(self.data, ())
+        return self.data
+
+    def _resolve(self, path: Path) -> Tuple[Any, Any]:
+        """ Returns (parent container, key or index) of a path, converting list indices to int. """
+        if not path:
+            raise ValueError("The root cannot be replaced; create a new SchemaSaidifier instead")
+        parent = self.data
+        for key in path[:-1]:
+            parent = parent[int(key) if isinstance(parent, list) else key]
+        key = path[-1]
+        return parent, int(key) if isinstance(parent, list) else key
+
+    def _normalize(self, path) -> Path:
+        """
+        Parses a path and converts list index tokens to non-negative ints, so
+        cache keys match. The last index may equal the list length (append).
+        Raises IndexError for indices out of range.
+        """
+        node, normalized = self.data, []
+        tokens = _parse_path(path)
+        for position, key in enumerate(tokens):
+            if isinstance(node, list):
+                key = int(key)
+                if key < 0:
+                    key += len(node)
+                last = position == len(tokens) - 1
+                if not 0 <= key < len(node) + last:
+                    raise IndexError(f"List index {tokens[position]} out of range at {_pointer_of(normalized)}")
+                node = node[key] if key < len(node) else None
+            else:
+                node = node.get(key) if isinstance(node, dict) else None
+            normalized.append(key)
+        return tuple(normalized)
+
+    def mark_dirty(self, path):
+        """
+        Invalidates the block at `path`, everything inside it and every block
+        that contains it. Call after changing `data` in place.
+        """
+        path = self._normalize(path)
+        for depth in range(len(path) + 1):
+            self._texts.pop(path[:depth], None)
+        stale = [cached for cached in self._texts if cached[:len(path)] == path]
+        for cached in stale:
+            del self._texts[cached]
+        for said_path in [said_path for said_path in self.saids if said_path[:len(path)] == path != said_path]:
+            del self.saids[said_path]
+
+    def update(self, path, value):
+        """ Sets the value at `path` (a key/index tuple or JSON pointer); `value` is copied. """
+        path = self._normalize(path)
+        parent, key = self._resolve(path)
+        if isinstance(parent, list) and key == len(parent):
+            parent.append(None)
+        parent[key] = copy.deepcopy(value)
+        self.mark_dirty(path)
+
+    def delete(self, path):
+        """ Removes the value at `path`. Removing a list item also invalidates the list, as later indices shift. """
+        path = self._normalize(path)
+        parent, key = self._resolve(path)
+        del parent[key]
+        self.saids.pop(path, None)
+        self.mark_dirty(path[:-1] if isinstance(parent, list) else path)
+
+    def dependents(self, path) -> list:
+        """ Paths of the SAIDed blocks whose SAID depends on `path`, innermost first. """
+        path = self._normalize(path)
+        return [path[:depth] for depth in range(len(path), -1, -1) if path[:depth] in self.saids]
 
-    return processed_dict
 
 # --- File Handling ---
-def _write_json_file(data: dict, filepath: str, indent: bool = True):
-    """ Writes dictionary to JSON file (indented or flat). """
-    # (Implementation remains the same as before)
+def write_json_file(data: dict, filepath: str, indent: bool = True, verbose: bool = True) -> bool:
+    """
+    Writes dictionary to JSON file (indented or flat). The file is written
+    under a temporary name and renamed into place, so readers never see a
+    partially written schema. Returns True on success.
+    """
+    temp_path = None
     try:
         output_dir = os.path.dirname(filepath)
         if output_dir:
              os.makedirs(output_dir, exist_ok=True)
-        with open(filepath, 'w') as f:
+        fd, temp_path = tempfile.mkstemp(dir=output_dir or '.', prefix='.saidify-', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
             if indent:
                 json.dump(data, f, indent=2)
             else:
                 json.dump(data, f, indent=None, separators=(',', ':'))
-        print(f"Successfully wrote processed data to {filepath}")
+        os.chmod(temp_path, output_mode(filepath)) # mkstemp creates files readable by their owner only
+        os.replace(temp_path, filepath)
+        temp_path = None
+        if verbose:
+            print(f"Successfully wrote processed data to {filepath}")
+        return True
     except IOError as e:
         print(f"Error writing JSON to {filepath}: {e}")
     except Exception as e:
         print(f"An unexpected error occurred while writing {filepath}: {e}")
+    finally:
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+    return False
 
 
 # --- Main Processing Function ---
-def process_schema_file(input_filepath: str, output_filepath: str, indent_output: bool = True):
+def saidify_schema(data: dict, recursive: bool = False, cache: Optional[SaidCache] = None) -> dict:
+    """
+    Adds SAIDs to a loaded schema and passes it through the KERI Schemer,
+    as `process_schema_file` does before writing it.
+
+    Returns:
+        The SAIDified schema.
+    """
+    # Add SAIDs using the refined logic
+    data_with_saids = add_saids_to_data(data, said_key=DEFAULT_SAID_KEY, hash_code=DEFAULT_HASH_CODE,
+                                        recursive=recursive, cache=cache)
+
+    # Schemer processing (Recommended by KERI)
+    try:
+        # Pass the SAIDified data (which should have $id fields populated)
+        schemer = scheming.Schemer(sed=data_with_saids)
+        return schemer.sed
+    except Exception as e:
+        print(f"Warning: Error creating or using KERI Schemer: {e}")
+        print("Proceeding with data after SAID calculation but before Schemer processing.")
+        return data_with_saids # Fallback
+
+
+def process_schema_file(input_filepath: str, output_filepath: str, indent_output: bool = True,
+                        recursive: bool = False, verbose: bool = True,
+                        cache: Optional[SaidCache] = None) -> Optional[dict]:
     """
     Reads JSON schema, adds SAIDs, orders keys, writes to output file.
+    With `recursive`, nested '$id' blocks at any depth are SAIDified too.
+
+    Returns:
+        The SAIDified schema as written, or None if it could not be read or written.
     """
     try:
         with open(input_filepath, 'r') as infile:
@@ -141,71 +534,415 @@ def process_schema_file(input_filepath: str, output_filepath: str, indent_output
         print(f"An unexpected error occurred while reading {input_filepath}: {e}")
         return
 
-    # Add SAIDs using the refined logic
-    data_with_saids = add_saids_to_data(original_data, said_key=DEFAULT_SAID_KEY, hash_code=DEFAULT_HASH_CODE)
+    processed_data_from_schemer = saidify_schema(original_data, recursive=recursive, cache=cache)
 
-    # Schemer processing (Recommended by KERI)
+    # Write the final data
+    if not write_json_file(processed_data_from_schemer, output_filepath, indent=indent_output, verbose=verbose):
+        return None
+    return processed_data_from_schemer
+
+
+# --- Batch Processing ---
+
+_worker_caches: Dict[str, SaidCache] = {} # Per worker process, by sqlite path
+
+
+def _process_batch_file(input_filepath: str, output_filepath: str, indent_output: bool,
+                        recursive: bool, cache_path: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """ Worker task: SAIDifies one schema. Returns (schema SAID, output content hash), or (None, None) on failure. """
+    cache = None
+    if cache_path:
+        cache = _worker_caches.get(cache_path)
+        if cache is None:
+            cache = _worker_caches[cache_path] = SaidCache(path=cache_path)
+    data = process_schema_file(input_filepath, output_filepath, indent_output, recursive=recursive, verbose=False,
+                               cache=cache)
+    if cache is not None:
+        cache.flush() # Workers are not told when the pool shuts down, so commit per schema
+    if data is None:
+        return None, None
+    return data.get(DEFAULT_SAID_KEY), file_digest(output_filepath)
+
+
+def load_manifest(manifest_path: str) -> dict:
+    """ Reads a JSON manifest or index file; a missing or unreadable one reads as empty. """
     try:
-        # Pass the SAIDified data (which should have $id fields populated)
-        schemer = scheming.Schemer(sed=data_with_saids)
-        processed_data_from_schemer = schemer.sed
-    except Exception as e:
-        print(f"Warning: Error creating or using KERI Schemer: {e}")
-        print("Proceeding with data after SAID calculation but before Schemer processing.")
-        processed_data_from_schemer = data_with_saids # Fallback
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"Warning: Ignoring unreadable manifest {manifest_path}: {e}")
+        return {}
 
-    # Write the final data
-    _write_json_file(processed_data_from_schemer, output_filepath, indent=indent_output)
+
+def process_schema_directory(input_dir: str, output_dir: Optional[str] = None, indent_output: bool = True,
+                             recursive: bool = False, workers: Optional[int] = None, pattern: str = '*.json',
+                             manifest_path: Optional[str] = None, force: bool = False,
+                             cache_path: Optional[str] = None) -> Dict[str, Optional[str]]:
+    """
+    SAIDifies every schema in a directory tree in a pool of worker processes.
+
+    A manifest of input content hashes is kept in the output directory, so
+    schemas whose input (and output) did not change since the last run are
+    skipped without being read as JSON. Outputs are written atomically. When
+    `output_dir` is the input directory (the default) schemas are SAIDified
+    in place; the rewritten file is then recognized as up to date next time.
+
+    Args:
+        input_dir: Directory searched (recursively) for schemas.
+        output_dir: Where to write the SAIDified schemas, mirroring the input
+                    tree. Defaults to `input_dir`.
+        indent_output: Write indented JSON.
+        recursive: SAIDify nested '$id' blocks at any depth.
+        workers: Number of worker processes (defaults to one per CPU).
+        pattern: File name pattern of the schemas.
+        manifest_path: Manifest location; defaults to `<output_dir>/.saidify-manifest.json`.
+        force: Reprocess every schema, ignoring the manifest.
+        cache_path: sqlite SaidCache shared by the workers (and later runs), so
+                    blocks repeated across schemas are hashed once.
+
+    Returns:
+        The SAID of each schema by its path relative to `input_dir` (None for
+        schemas that failed), including skipped ones.
+    """
+    output_dir = output_dir or input_dir
+    manifest_path = manifest_path or os.path.join(output_dir, MANIFEST_NAME)
+    manifest = {} if force else load_manifest(manifest_path)
+    options = {'indent': indent_output, 'recursive': recursive, 'hash_code': DEFAULT_HASH_CODE}
+
+    saids, tasks = {}, []
+    for root, _, files in os.walk(input_dir):
+        for name in sorted(fnmatch.filter(files, pattern)):
+            if name.startswith('.') or name == os.path.basename(manifest_path):
+                continue # Manifests, index files and temp files of atomic writes
+            input_filepath = os.path.join(root, name)
+            relative = os.path.relpath(input_filepath, input_dir)
+            output_filepath = os.path.join(output_dir, relative)
+            input_hash = file_digest(input_filepath)
+            entry = manifest.get(relative)
+            if (entry is not None and entry.get('options') == options and os.path.exists(output_filepath)
+                    and input_hash in (entry['input_hash'], entry['output_hash'] if output_filepath == input_filepath
+                                       else None)
+                    and (output_filepath == input_filepath or file_digest(output_filepath) == entry['output_hash'])):
+                saids[relative] = entry['said']
+                continue
+            tasks.append((relative, input_filepath, output_filepath, input_hash))
+
+    processed = failed = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+            futures = {executor.submit(_process_batch_file, input_filepath, output_filepath, indent_output,
+                                       recursive, cache_path): (relative, input_hash)
+                       for relative, input_filepath, output_filepath, input_hash in tasks}
+            for future in as_completed(futures):
+                relative, input_hash = futures[future]
+                try:
+                    said, output_hash = future.result()
+                except Exception as e:
+                    print(f"Error processing {relative}: {e}")
+                    said, output_hash = None, None
+                saids[relative] = said
+                if said is None:
+                    failed += 1
+                    manifest.pop(relative, None)
+                    continue
+                processed += 1
+                manifest[relative] = {'input_hash': input_hash, 'output_hash': output_hash, 'said': said,
+                                      'options': options}
+    finally:
+        # Record finished schemas even if the run is interrupted
+        write_json_file(manifest, manifest_path, indent=True, verbose=False)
+
+    print(f"SAIDified {processed} schemas, skipped {len(saids) - processed - failed} unchanged, {failed} failed "
+          f"({input_dir} -> {output_dir})")
+    return dict(sorted(saids.items()))
+
+
+# --- Credential Data Pipeline ---
+
+def _saidify_block(block: dict, hash_code: str, cache: Optional[SaidCache]) -> Tuple[dict, str]:
+    """ SAIDifies an attribute, edge or rule block in its 'd' field, adding 'd' first if it is missing. """
+    if DATA_SAID_KEY not in block:
+        block = {DATA_SAID_KEY: "", **block}
+    return _saidify(block, {id(block): DATA_SAID_KEY}, hash_code, cache)
+
+
+def _credential_sections(record: Any) -> Dict[str, dict]:
+    """ A record with only 'a', 'e' and/or 'r' blocks is taken as is; any other object is the attribute block. """
+    if (isinstance(record, dict) and record and set(record) <= set(CREDENTIAL_SECTIONS)
+            and all(isinstance(block, dict) for block in record.values())):
+        return record
+    if not isinstance(record, dict):
+        raise ValueError(f"expected a JSON object, found {type(record).__name__}")
+    return {'a': record}
+
+
+def saidify_credential_data(record: Any, hash_code: str = DEFAULT_HASH_CODE,
+                            cache: Optional[SaidCache] = None) -> dict:
+    """
+    SAIDifies the blocks of one credential: either an attribute block, or an
+    object with 'a', 'e' and/or 'r' blocks. Each block gets its SAID in 'd'
+    (added as the first field when missing), as `kli saidify --file` does.
+
+    Returns:
+        {'a': ..., 'e': ..., 'r': ...} with the blocks present in the record.
+    """
+    return {key: _saidify_block(block, hash_code, cache)[0] for key, block in _credential_sections(record).items()}
+
+
+def _saidify_record_batch(lines: List[str], first_line: int, hash_code: str) -> Tuple[str, int, List[str]]:
+    """
+    Worker task: SAIDifies a batch of NDJSON credential data records. Output
+    lines are assembled from the compact serializations the SAIDs were
+    computed over, without serializing again.
+
+    Returns:
+        (NDJSON output, records written, error messages).
+    """
+    out, errors, written = [], [], 0
+    for number, line in enumerate(lines, first_line):
+        if not line.strip():
+            continue
+        try:
+            sections = _credential_sections(json.loads(line))
+            texts = [f"{encode_key(key)}:{_saidify_block(block, hash_code, None)[1]}"
+                     for key, block in sections.items()]
+        except Exception as e:
+            errors.append(f"Error in credential data record on line {number}: {e}")
+            continue
+        out.append("{" + ",".join(texts) + "}\n")
+        written += 1
+    return "".join(out), written, errors
+
+
+def saidify_credential_stream(infile: TextIO, outfile: TextIO, workers: Optional[int] = None,
+                              batch_size: int = DEFAULT_RECORD_BATCH_SIZE,
+                              hash_code: str = DEFAULT_HASH_CODE) -> dict:
+    """
+    Streams NDJSON credential data records (see `saidify_credential_data`)
+    to NDJSON lines of SAIDified 'a'/'e'/'r' blocks, in input order.
+
+    Records are read in batches that worker processes SAIDify concurrently;
+    at most two batches per worker are in flight, so memory stays bounded
+    however long the input is. Each worker keeps its own SaidCache, so edge
+    and rule blocks shared by many credentials are hashed once per worker.
+    Records that fail are reported on stderr and left out.
+
+    Args:
+        infile: Text stream of NDJSON records.
+        outfile: Text stream the SAIDified records are written to.
+        workers: Worker processes (defaults to one per CPU; 1 runs in this process).
+        batch_size: Records per worker task.
+        hash_code: The KERI MtrDex code of the digests.
+
+    Returns:
+        {'records': written, 'errors': failed, 'seconds': elapsed}.
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    stats = {'records': 0, 'errors': 0}
+
+    def batches():
+        batch, first_line = [], 1
+        for number, line in enumerate(infile, 1):
+            batch.append(line)
+            if len(batch) == batch_size:
+                yield batch, first_line
+                batch, first_line = [], number + 1
+        if batch:
+            yield batch, first_line
+
+    def write(result):
+        text, written, errors = result
+        outfile.write(text)
+        stats['records'] += written
+        stats['errors'] += len(errors)
+        for error in errors:
+            print(error, file=sys.stderr)
+
+    if workers == 1:
+        for batch, first_line in batches():
+            write(_saidify_record_batch(batch, first_line, hash_code))
+    else:
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for batch, first_line in batches():
+                pending.append(executor.submit(_saidify_record_batch, batch, first_line, hash_code))
+                if len(pending) >= workers * 2:
+                    write(pending.popleft().result())
+            while pending:
+                write(pending.popleft().result())
+    stats['seconds'] = time.perf_counter() - started
+    return stats
+
+
+# --- SAID Lookup ---
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_SCALAR = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?|true|false|null')
+_STRUCTURE = re.compile(r'["\[\]{}]')
+_PARTIAL_SCALAR = re.compile(r'(?:[-+.eE0-9]*|[a-z]{0,5})\Z')
+_DELIMITERS = (',', '}', ']', ' ', '\t', '\n', '\r')
+
+
+class _NeedMore(Exception):
+    """ The scanned prefix of the file ends before the answer is known. """
+
+
+def _skip_value(text: str, pos: int) -> int:
+    """ Index just past the JSON value starting at `pos`, without building it. """
+    char = text[pos:pos + 1]
+    if char == '"':
+        return json.decoder.scanstring(text, pos + 1)[1]
+    if char not in ('{', '['):
+        match = _SCALAR.match(text, pos)
+        if match and text[match.end():match.end() + 1] in _DELIMITERS:
+            return match.end()
+        if _PARTIAL_SCALAR.match(text, pos): # The buffer may end inside a number or literal
+            raise _NeedMore()
+        raise ValueError(f"Unexpected value at {pos}")
+    depth = 0
+    while True:
+        match = _STRUCTURE.search(text, pos)
+        if match is None:
+            raise _NeedMore()
+        pos = match.end()
+        char = match.group()
+        if char == '"':
+            pos = json.decoder.scanstring(text, pos)[1]
+        elif char in '{[':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return pos
 
 
+def _scan_root_key(text: str, key: str) -> Tuple[bool, Any]:
+    """
+    Looks for `key` among the root fields of the JSON object at the start of
+    `text`, stopping at the first occurrence. Raises _NeedMore when `text`
+    ends first and ValueError when it is not a JSON object.
+
+    Returns:
+        (found, value).
+    """
+    pos = _WHITESPACE.match(text, 0).end()
+    if text[pos:pos + 1] != '{':
+        raise _NeedMore() if pos == len(text) else ValueError("JSON root is not an object")
+    pos = _WHITESPACE.match(text, pos + 1).end()
+    if text[pos:pos + 1] == '}':
+        return False, None
+    while True:
+        if pos == len(text):
+            raise _NeedMore()
+        if text[pos] != '"':
+            raise ValueError(f"Expected a field name at {pos}")
+        try:
+            name, pos = json.decoder.scanstring(text, pos + 1)
+        except json.JSONDecodeError:
+            raise _NeedMore() # Unterminated here may just mean the buffer ends mid string
+        pos = _WHITESPACE.match(text, pos).end()
+        if text[pos:pos + 1] != ':':
+            raise _NeedMore() if pos == len(text) else ValueError(f"Expected ':' at {pos}")
+        pos = _WHITESPACE.match(text, pos + 1).end()
+        try:
+            end = _skip_value(text, pos)
+        except json.JSONDecodeError:
+            raise _NeedMore()
+        if name == key:
+            return True, json.loads(text[pos:end])
+        pos = end
+        pos = _WHITESPACE.match(text, pos).end()
+        if text[pos:pos + 1] == '}':
+            return False, None
+        if text[pos:pos + 1] != ',':
+            raise _NeedMore() if pos == len(text) else ValueError(f"Expected ',' or '}}' at {pos}")
+        pos = _WHITESPACE.match(text, pos + 1).end()
+
+
+def read_root_key(filepath: str, key: str) -> Tuple[bool, Any]:
+    """
+    Reads a root-level field of a JSON file, reading only as much of the
+    file as it takes to reach it (the whole file if the field is absent or
+    last). Raises ValueError if the file is not a JSON object.
+    """
+    chunk_size = HEADER_CHUNK_SIZE
+    with open(filepath, 'r', encoding='utf-8') as infile:
+        text = infile.read(chunk_size)
+        while True:
+            try:
+                return _scan_root_key(text, key)
+            except _NeedMore:
+                more = infile.read(chunk_size)
+                if not more:
+                    raise ValueError("Unexpected end of JSON")
+                text += more
+                chunk_size *= 2
+
 
-def get_schema_said(filepath: str, top_level_key: str = JSON_SCHEMA_ID_KEY) -> str | None:
+def get_schema_said(filepath: str, top_level_key: str = JSON_SCHEMA_ID_KEY, fast: bool = True) -> str | None:
     """
     Reads a JSON schema file and extracts the value of the specified top-level key,
     which is expected to be the top-most SAID of the schema.
 
+    By default only the start of the file is parsed, up to the top-level key;
+    a file the fast path cannot read is parsed in full, which also reports
+    what is wrong with it. A duplicated top-level key resolves to its first
+    occurrence on the fast path (json.load keeps the last).
+
     Args:
         filepath: Path to the input JSON schema file (assumed to be SAIDified).
         top_level_key: The dictionary key at the root level that holds the SAID
                        (defaults to '$id').
+        fast: Stop reading at the top-level key instead of parsing the whole file.
 
     Returns:
         The SAID string if found and is a non-empty string, otherwise None.
         Prints error messages to console for failure cases.
     """
-    try:
-        # Ensure the file exists before trying to open
-        if not os.path.exists(filepath):
-             raise FileNotFoundError(f"Input file not found at {filepath}")
+    found = False
+    if fast:
+        try:
+            found, said_value = read_root_key(filepath, top_level_key)
+        except (IOError, ValueError):
+            pass # Let the full parse below report the problem
 
-        with open(filepath, 'r', encoding='utf-8') as infile:
-            data = json.load(infile)
+    if not found:
+        try:
+            # Ensure the file exists before trying to open
+            if not os.path.exists(filepath):
+                 raise FileNotFoundError(f"Input file not found at {filepath}")
 
-    except FileNotFoundError as e:
-        print(f"Error: {e}")
-        return None
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON from {filepath}: {e}")
-        return None
-    except IOError as e:
-        print(f"Error reading file {filepath}: {e}")
-        return None
-    except Exception as e:
-        print(f"An unexpected error occurred while reading {filepath}: {e}")
-        return None
+            with open(filepath, 'r', encoding='utf-8') as infile:
+                data = json.load(infile)
 
-    # Check if the loaded data is a dictionary
-    if not isinstance(data, dict):
-        print(f"Error: Expected JSON root to be a dictionary in {filepath}, but found {type(data)}.")
-        return None
+        except FileNotFoundError as e:
+            print(f"Error: {e}")
+            return None
+        except json.JSONDecodeError as e:
+            print(f"Error decoding JSON from {filepath}: {e}")
+            return None
+        except IOError as e:
+            print(f"Error reading file {filepath}: {e}")
+            return None
+        except Exception as e:
+            print(f"An unexpected error occurred while reading {filepath}: {e}")
+            return None
 
-    # Check if the specified top-level key exists
-    if top_level_key not in data:
-        print(f"Error: Top-level key '{top_level_key}' not found in the root of {filepath}.")
-        return None
+        # Check if the loaded data is a dictionary
+        if not isinstance(data, dict):
+            print(f"Error: Expected JSON root to be a dictionary in {filepath}, but found {type(data)}.")
+            return None
+
+        # Check if the specified top-level key exists
+        if top_level_key not in data:
+            print(f"Error: Top-level key '{top_level_key}' not found in the root of {filepath}.")
+            return None
 
-    # Get the value associated with the key
-    said_value = data[top_level_key]
+        # Get the value associated with the key
+        said_value = data[top_level_key]
 
     # Check if the value is a string
     if not isinstance(said_value, str):
@@ -217,4 +954,76 @@ def get_schema_said(filepath: str, top_level_key: str = JSON_SCHEMA_ID_KEY) -> s
          print(f"Warning: Value for top-level key '{top_level_key}' in {filepath} is an empty string. Returning None.")
          return None
 
-    return said_value
\ No newline at end of file
+    return said_value
+
+
+def get_schema_saids(directory: str, pattern: str = '*.json', top_level_key: str = JSON_SCHEMA_ID_KEY,
+                     fast: bool = True) -> Dict[str, Optional[str]]:
+    """
+    Extracts the top-level SAID of every schema in a directory tree with `get_schema_said`.
+
+    Returns:
+        The SAID of each schema by its path relative to `directory` (None
+        where it has none), in sorted order.
+    """
+    saids = {}
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(fnmatch.filter(files, pattern)):
+            if name.startswith('.'):
+                continue # Manifests and index files
+            filepath = os.path.join(root, name)
+            saids[os.path.relpath(filepath, directory)] = get_schema_said(filepath, top_level_key, fast=fast)
+    return dict(sorted(saids.items()))
+
+
+# --- CLI ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add SAIDs to a JSON schema file or to every schema in a directory.")
+    parser.add_argument("input", help="Schema file or directory of schemas (NDJSON file or - with --credentials).")
+    parser.add_argument("-o", "--output", help="Output file or directory (default: in place).")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="Worker processes for a directory, 0 for one per CPU.")
+    parser.add_argument("--recursive", action="store_true", help="SAIDify nested '$id' blocks at any depth.")
+    parser.add_argument("--compact", action="store_true", help="Write compact instead of indented JSON.")
+    parser.add_argument("--force", action="store_true", help="Reprocess every schema, ignoring the manifest.")
+    parser.add_argument("--cache", help="sqlite file to keep computed SAIDs in across schemas and runs.")
+    parser.add_argument("--credentials", action="store_true",
+                        help="Input is NDJSON credential data; write NDJSON of SAIDified a/e/r blocks.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_RECORD_BATCH_SIZE,
+                        help="Credential data records per worker task with --credentials.")
+    args = parser.parse_args(argv)
+
+    if args.credentials:
+        infile = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8')
+        outfile = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+        try:
+            stats = saidify_credential_stream(infile, outfile, workers=args.jobs or None, batch_size=args.batch_size)
+        finally:
+            if infile is not sys.stdin:
+                infile.close()
+            if outfile is not sys.stdout:
+                outfile.close()
+        print(f"SAIDified {stats['records']} credential data records in {stats['seconds']:.2f}s, "
+              f"{stats['errors']} failed", file=sys.stderr)
+        return 1 if stats['errors'] else 0
+
+    if os.path.isdir(args.input):
+        saids = process_schema_directory(args.input, args.output, indent_output=not args.compact,
+                                         recursive=args.recursive, workers=args.jobs or None, force=args.force,
+                                         cache_path=args.cache)
+        for relative, said in saids.items():
+            print(f"{said or 'FAILED':<44}  {relative}")
+        return 1 if None in saids.values() else 0
+
+    with SaidCache(path=args.cache) as cache:
+        data = process_schema_file(args.input, args.output or args.input, indent_output=not args.compact,
+                                   recursive=args.recursive, cache=cache)
+    if data is None:
+        return 1
+    print(data.get(DEFAULT_SAID_KEY))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
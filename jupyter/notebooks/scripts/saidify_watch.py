@@ -0,0 +1,291 @@
+import argparse
+import ctypes
+import ctypes.util
+import fnmatch
+import json
+import os
+import select
+import struct
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Set
+
+from scripts.files import file_digest
+from scripts.saidify import DATA_SAID_KEY, DEFAULT_SAID_KEY, add_saids_to_data, saidify_schema, write_json_file
+
+# Keep schemas and credential data SAIDified while editing them:
+# python -m scripts.saidify_watch config/schemas config/credential_data
+#
+# from scripts.saidify_watch import SaidifyWatcher
+# SaidifyWatcher(["config/schemas"]).run()
+#
+# Editing sample_schema.bak.json writes the SAIDified sample_schema.json, the
+# way the notebooks call process_schema_file; other schemas are SAIDified in
+# place. Credential data with a top-level 'd' (edges, rules) gets its SAID
+# as `kli saidify --file` would compute it.
+
+
+# --- Constants ---
+DEFAULT_DEBOUNCE = 0.2 # Seconds without further changes before a batch of edits is processed
+DEFAULT_POLL_INTERVAL = 0.5 # Seconds between scans when inotify is unavailable
+SOURCE_SUFFIX = ".bak.json" # Unsaidified source of a schema; the output drops the '.bak'
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct("iIII") # wd, mask, cookie, name length
+
+
+def output_path(filepath: str) -> str:
+    """ Where the SAIDified version of a file goes: `x.bak.json` -> `x.json`, anything else in place. """
+    if filepath.endswith(SOURCE_SUFFIX):
+        return filepath[:-len(SOURCE_SUFFIX)] + ".json"
+    return filepath
+
+
+# --- Change Sources ---
+
+class _InotifyChanges:
+    """ Files closed after writing or moved into the watched trees, from Linux inotify through libc. """
+
+    def __init__(self, directories: Sequence[str]):
+        libc_name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, str] = {}
+        for directory in directories:
+            self._watch_tree(directory)
+
+    def _watch_tree(self, directory: str):
+        for root, _, _ in os.walk(directory):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(root), WATCH_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"Cannot watch {root}")
+            self._dirs[wd] = root
+
+    def wait(self, timeout: Optional[float]) -> Set[str]:
+        """ Paths changed within `timeout` seconds (None waits indefinitely); empty if nothing changed. """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed, pos = set(), 0
+        while pos < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, pos)
+            pos += EVENT_HEADER.size
+            name = os.fsdecode(data[pos:pos + length].rstrip(b"\0"))
+            pos += length
+            directory = self._dirs.get(wd)
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+            elif directory is not None and name:
+                path = os.path.join(directory, name)
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        self._watch_tree(path)
+                        changed.update(os.path.join(root, file) for root, _, files in os.walk(path) for file in files)
+                elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                    changed.add(path)
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class _PollingChanges:
+    """ Files whose size or modification time changed, found by scanning the watched trees. """
+
+    def __init__(self, directories: Sequence[str], pattern: str, interval: float = DEFAULT_POLL_INTERVAL):
+        self.directories = directories
+        self.pattern = pattern
+        self.interval = interval
+        self._stats = self._scan()
+
+    def _scan(self) -> Dict[str, tuple]:
+        stats = {}
+        for directory in self.directories:
+            for root, _, files in os.walk(directory):
+                for name in fnmatch.filter(files, self.pattern):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    stats[path] = (stat.st_mtime_ns, stat.st_size)
+        return stats
+
+    def wait(self, timeout: Optional[float]) -> Set[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+            if remaining > 0:
+                time.sleep(remaining)
+            stats = self._scan()
+            changed = {path for path, stat in stats.items() if self._stats.get(path) != stat}
+            self._stats = stats
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+# --- Watcher ---
+
+class SaidifyWatcher:
+    """
+    Re-SAIDifies schemas and credential data as they are saved.
+
+    Changes are debounced: a batch is processed once no further change has
+    arrived for `debounce` seconds, so an editor's save (or a `git checkout`)
+    is handled once. Only the changed files are processed, in this warm
+    process, and files whose content matches what was last read or written
+    for them are skipped, so the watcher's own writes do not retrigger it.
+
+    Args:
+        directories: Trees to watch.
+        pattern: File name pattern of the files to SAIDify.
+        debounce: Quiet period, in seconds, that ends a batch of changes.
+        recursive: SAIDify nested '$id' blocks of schemas at any depth.
+        indent_output: Write indented JSON.
+        polling: Scan for changes instead of using inotify.
+    """
+
+    def __init__(self, directories: Sequence[str], pattern: str = "*.json", debounce: float = DEFAULT_DEBOUNCE,
+                 recursive: bool = False, indent_output: bool = True, polling: bool = False):
+        self.directories = list(directories)
+        self.pattern = pattern
+        self.debounce = debounce
+        self.recursive = recursive
+        self.indent_output = indent_output
+        self._digests: Dict[str, str] = {} # Content last read or written, per file
+        self.changes = None
+        if not polling:
+            try:
+                self.changes = _InotifyChanges(self.directories)
+            except (OSError, AttributeError) as e:
+                print(f"Warning: inotify unavailable ({e}), polling for changes instead.", file=sys.stderr)
+        if self.changes is None:
+            self.changes = _PollingChanges(self.directories, pattern)
+
+    def _wanted(self, path: str) -> bool:
+        name = os.path.basename(path)
+        return fnmatch.fnmatch(name, self.pattern) and not name.startswith(".") and os.path.isfile(path)
+
+    def process(self, path: str) -> Optional[str]:
+        """
+        SAIDifies one changed file unless its content is what was last seen.
+
+        Returns:
+            The new top-level SAID, or None if the file was skipped or failed.
+        """
+        try:
+            digest = file_digest(path)
+            if self._digests.get(path) == digest:
+                return None
+            self._digests[path] = digest
+            with open(path, "r") as infile:
+                data = json.load(infile)
+        except FileNotFoundError:
+            return None
+        except (IOError, ValueError) as e:
+            print(f"Error reading {path}: {e}") # Often a half-saved file; the next save retries
+            return None
+        if not isinstance(data, dict):
+            return None
+
+        target = output_path(path)
+        if DEFAULT_SAID_KEY in data:
+            said_key, result = DEFAULT_SAID_KEY, saidify_schema(data, recursive=self.recursive)
+        elif DATA_SAID_KEY in data:
+            said_key, result = DATA_SAID_KEY, add_saids_to_data(data, said_key=DATA_SAID_KEY)
+        else:
+            return None # Attribute data gets its SAID from `kli vc create`
+        if target == path and result == data:
+            return None # Already SAIDified; rewriting would only reformat it
+        if not write_json_file(result, target, indent=self.indent_output, verbose=False):
+            return None
+        said = result.get(said_key)
+        if said is not None:
+            self._digests[target] = file_digest(target)
+        return said
+
+    def process_batch(self, paths: Set[str]) -> List[tuple]:
+        """ Processes a batch of changed paths. Returns (path, SAID, milliseconds) of each file SAIDified. """
+        results = []
+        for path in sorted(paths):
+            if not self._wanted(path):
+                continue
+            started = time.perf_counter()
+            said = self.process(path)
+            if said is not None:
+                elapsed = (time.perf_counter() - started) * 1000
+                results.append((path, said, elapsed))
+                print(f"{said}  {output_path(path)}  ({elapsed:.1f} ms)")
+        return results
+
+    def run(self, initial: bool = True, max_batches: Optional[int] = None):
+        """
+        Watches until interrupted (or `max_batches` batches were processed).
+
+        Args:
+            initial: First SAIDify every matching file once, so the trees start out current.
+            max_batches: Stop after this many batches that SAIDified something; None runs until Ctrl-C.
+        """
+        if initial:
+            self.process_batch({os.path.join(root, name) for directory in self.directories
+                                for root, _, files in os.walk(directory) for name in files})
+        print(f"Watching {', '.join(self.directories)} for changes to {self.pattern} (Ctrl-C to stop)")
+        batches = 0
+        try:
+            while max_batches is None or batches < max_batches:
+                pending = self.changes.wait(None)
+                while pending:
+                    more = self.changes.wait(self.debounce)
+                    if not more:
+                        break
+                    pending |= more
+                if self.process_batch(pending): # Echoes of our own writes are not counted
+                    batches += 1
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.changes.close()
+
+
+# --- CLI ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-SAIDify schemas and credential data whenever they change.")
+    parser.add_argument("directories", nargs="+", help="Directories to watch.")
+    parser.add_argument("--pattern", default="*.json", help="File name pattern to SAIDify.")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE, help="Seconds of quiet ending a batch.")
+    parser.add_argument("--recursive", action="store_true", help="SAIDify nested '$id' blocks at any depth.")
+    parser.add_argument("--compact", action="store_true", help="Write compact instead of indented JSON.")
+    parser.add_argument("--poll", action="store_true", help="Poll for changes instead of using inotify.")
+    parser.add_argument("--no-initial", action="store_true", help="Do not SAIDify every file on start.")
+    args = parser.parse_args(argv)
+
+    watcher = SaidifyWatcher(args.directories, pattern=args.pattern, debounce=args.debounce,
+                             recursive=args.recursive, indent_output=not args.compact, polling=args.poll)
+    watcher.run(initial=not args.no_initial)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
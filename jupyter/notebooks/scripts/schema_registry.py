@@ -0,0 +1,237 @@
+import argparse
+import fnmatch
+import json
+import mmap
+import os
+import sys
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional
+
+from scripts.saidify import JSON_SCHEMA_ID_KEY, load_manifest, read_root_key, write_json_file
+
+# Resolve schemas by SAID without scanning the schema directory every time:
+# python -m scripts.schema_registry config/schemas
+# python -m scripts.schema_registry config/schemas EBfdlu8R27Fbx-ehrqwImnK-8Cm79sqbAQ4MmvEAYqao
+#
+# from scripts.schema_registry import SchemaRegistry
+# with SchemaRegistry("config/schemas") as registry:
+#     schema = registry["EBfdlu8R27Fbx-ehrqwImnK-8Cm79sqbAQ4MmvEAYqao"]
+
+
+# --- Constants ---
+INDEX_NAME = ".schema-index.json" # Persisted SAID index, kept in the schema directory
+INDEX_VERSION = 1
+DEFAULT_SCHEMA_CACHE_SIZE = 256 # Parsed schemas kept in memory
+SCHEMA_PATTERNS = ("*.json",) # One schema per file
+BUNDLE_PATTERNS = ("*.ndjson", "*.jsonl") # One schema per line
+
+
+def _scan_file(filepath: str, bundle: bool) -> List[list]:
+    """ [said, offset, length] of every schema with a SAID in a schema file or bundle. """
+    if not bundle: # Only read up to the root '$id'; the schema is parsed when it is first requested
+        try:
+            found, said = read_root_key(filepath, JSON_SCHEMA_ID_KEY)
+        except ValueError as e:
+            print(f"Warning: Skipping unparseable schema {filepath}: {e}", file=sys.stderr)
+            return []
+        return [[said, 0, os.path.getsize(filepath)]] if found and isinstance(said, str) and said else []
+
+    entries, lines, offset = [], [], 0
+    with open(filepath, "rb") as f:
+        for line in f:
+            lines.append((offset, line))
+            offset += len(line)
+    for offset, raw in lines:
+        if not raw.strip():
+            continue
+        try:
+            data = json.loads(raw)
+        except ValueError as e:
+            print(f"Warning: Skipping unparseable schema in {filepath} at offset {offset}: {e}", file=sys.stderr)
+            continue
+        said = data.get(JSON_SCHEMA_ID_KEY) if isinstance(data, dict) else None
+        if isinstance(said, str) and said:
+            entries.append([said, offset, len(raw.rstrip(b"\r\n"))])
+    return entries
+
+
+class SchemaRegistry:
+    """
+    Schemas of a directory tree looked up by SAID.
+
+    A SAID -> (file, offset, length) index is built on first use and
+    persisted in the directory; later instances only rescan files whose size
+    or modification time changed. Schema bodies are not read until they are
+    requested: the file (or NDJSON bundle of schemas) is memory mapped, the
+    schema's bytes are parsed, and the result is kept in a bounded LRU cache.
+
+    Schemas returned are shared with the cache and must not be modified.
+
+    Args:
+        directory: Root of the schema tree.
+        index_path: Where to persist the index; defaults to `<directory>/.schema-index.json`.
+        cache_size: Parsed schemas kept in memory.
+    """
+
+    def __init__(self, directory: str, index_path: Optional[str] = None,
+                 cache_size: int = DEFAULT_SCHEMA_CACHE_SIZE):
+        self.directory = directory
+        self.index_path = index_path or os.path.join(directory, INDEX_NAME)
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._files: Dict[str, dict] = {} # Per relative path: size, mtime_ns and its schemas
+        self._saids: Dict[str, tuple] = {} # SAID -> (relative path, offset, length)
+        self._cache: OrderedDict = OrderedDict()
+        self._maps: Dict[str, mmap.mmap] = {}
+        index = load_manifest(self.index_path)
+        if index.get("version") == INDEX_VERSION:
+            self._files = index.get("files", {})
+        self.refresh()
+
+    # --- Index ---
+
+    def _iter_schema_files(self) -> Iterator[tuple]:
+        for root, dirs, files in os.walk(self.directory):
+            dirs.sort()
+            for name in sorted(files):
+                if name.startswith("."):
+                    continue
+                bundle = any(fnmatch.fnmatch(name, pattern) for pattern in BUNDLE_PATTERNS)
+                if bundle or any(fnmatch.fnmatch(name, pattern) for pattern in SCHEMA_PATTERNS):
+                    yield os.path.relpath(os.path.join(root, name), self.directory), bundle
+
+    def refresh(self) -> int:
+        """
+        Brings the index up to date with the directory, rescanning only new
+        and changed files, and persists it if anything changed.
+
+        Returns:
+            The number of files (re)scanned or dropped.
+        """
+        files, changed = {}, 0
+        for relative, bundle in self._iter_schema_files():
+            stat = os.stat(os.path.join(self.directory, relative))
+            entry = self._files.get(relative)
+            if entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+                entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                         "schemas": _scan_file(os.path.join(self.directory, relative), bundle)}
+                changed += 1
+                self._unmap(relative)
+            files[relative] = entry
+        for relative in set(self._files) - set(files):
+            self._unmap(relative)
+            changed += 1
+        self._files = files
+
+        self._saids = {}
+        for relative, entry in files.items():
+            for said, offset, length in entry["schemas"]:
+                self._saids.setdefault(said, (relative, offset, length)) # Copies resolve to the first file
+        if changed:
+            self._cache.clear()
+            write_json_file({"version": INDEX_VERSION, "files": files}, self.index_path, indent=False, verbose=False)
+        return changed
+
+    def __len__(self) -> int:
+        return len(self._saids)
+
+    def __contains__(self, said: str) -> bool:
+        return said in self._saids
+
+    def saids(self) -> List[str]:
+        """ SAIDs of every indexed schema. """
+        return list(self._saids)
+
+    def path(self, said: str) -> str:
+        """ File holding the schema with this SAID. Raises KeyError for an unknown SAID. """
+        return os.path.join(self.directory, self._saids[said][0])
+
+    # --- Loading ---
+
+    def _map(self, relative: str) -> mmap.mmap:
+        mapped = self._maps.get(relative)
+        if mapped is None:
+            with open(os.path.join(self.directory, relative), "rb") as f:
+                mapped = self._maps[relative] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return mapped
+
+    def _unmap(self, relative: str):
+        mapped = self._maps.pop(relative, None)
+        if mapped is not None:
+            mapped.close()
+
+    def _load(self, said: str) -> dict:
+        relative, offset, length = self._saids[said]
+        entry = self._files[relative]
+        try:
+            stat = os.stat(os.path.join(self.directory, relative))
+            stale = entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns
+        except FileNotFoundError:
+            stale = True
+        if stale:
+            self.refresh() # Edited since it was indexed; the schema may have moved or gone
+            relative, offset, length = self._saids[said]
+        schema = json.loads(self._map(relative)[offset:offset + length])
+        if schema.get(JSON_SCHEMA_ID_KEY) != said:
+            raise KeyError(said)
+        return schema
+
+    def __getitem__(self, said: str) -> dict:
+        schema = self._cache.get(said)
+        if schema is not None:
+            self.hits += 1
+            self._cache.move_to_end(said)
+            return schema
+        self.misses += 1
+        schema = self._load(said)
+        if self.cache_size > 0:
+            self._cache[said] = schema
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return schema
+
+    def get(self, said: str, default=None) -> Optional[dict]:
+        """ The schema with this SAID, or `default` if there is none. """
+        try:
+            return self[said]
+        except KeyError:
+            return default
+
+    def close(self):
+        """ Releases the memory maps; the index stays usable and maps are reopened on demand. """
+        for relative in list(self._maps):
+            self._unmap(relative)
+        self._cache.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- CLI ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index the schemas of a directory by SAID and look them up.")
+    parser.add_argument("directory", help="Schema directory.")
+    parser.add_argument("said", nargs="?", help="Print the schema with this SAID instead of listing the index.")
+    parser.add_argument("--index", help=f"Index location (default: <directory>/{INDEX_NAME}).")
+    args = parser.parse_args(argv)
+
+    with SchemaRegistry(args.directory, index_path=args.index) as registry:
+        if args.said:
+            schema = registry.get(args.said)
+            if schema is None:
+                print(f"No schema with SAID {args.said} in {args.directory}", file=sys.stderr)
+                return 1
+            print(json.dumps(schema, indent=2))
+            return 0
+        for said in registry.saids():
+            print(f"{said:<44}  {os.path.relpath(registry.path(said), args.directory)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
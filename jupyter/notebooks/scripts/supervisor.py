@@ -0,0 +1,324 @@
+import atexit
+import os
+import re
+import signal
+import socket
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+# Start background processes (witnesses, delegation and multisig waits) and
+# block only until they are actually ready:
+#
+# from scripts.supervisor import get_supervisor, port_open, log_line
+# witnesses = get_supervisor().start("kli witness demo", name="witnesses", ready=port_open(5642))
+# join = get_supervisor().start("kli multisig join --name party2 --group g --auto", ready=log_line("Waiting"))
+# join.wait(60)
+# print(join.tail(20))
+
+
+# --- Constants ---
+DEFAULT_LOG_LINES = 1_000 # Output lines kept per process
+MAX_LINE_LENGTH = 4_096 # Longer output lines are truncated in the log
+PROBE_INTERVAL = 0.05 # Seconds between readiness checks
+DEFAULT_READY_TIMEOUT = 60.0
+DEFAULT_STOP_GRACE = 5.0 # Seconds between SIGTERM and SIGKILL
+
+Probe = Callable[["ManagedProcess"], bool]
+
+
+# --- Readiness Probes ---
+
+def port_open(port: int, host: str = "127.0.0.1") -> Probe:
+    """ Ready once a TCP connection to host:port succeeds. """
+    def probe(_):
+        try:
+            with socket.create_connection((host, port), timeout=0.2):
+                return True
+        except OSError:
+            return False
+    probe.description = f"port {host}:{port} open"
+    return probe
+
+
+def log_line(pattern: str) -> Probe:
+    """ Ready once an output line matches the regular expression `pattern`. """
+    regex = re.compile(pattern)
+
+    def probe(process):
+        return process.matched(regex)
+    probe.description = f"output matching {pattern!r}"
+    probe.pattern = regex # Lets Supervisor.start watch for it from the first line on
+    return probe
+
+
+def http_ok(url: str, status: int = 200) -> Probe:
+    """ Ready once a GET of `url` answers with `status`. """
+    def probe(_):
+        try:
+            with urllib.request.urlopen(url, timeout=0.5) as response:
+                return response.status == status
+        except urllib.error.HTTPError as e:
+            return e.code == status
+        except (OSError, ValueError):
+            return False
+    probe.description = f"GET {url} -> {status}"
+    return probe
+
+
+# --- Processes ---
+
+class ManagedProcess:
+    """
+    A background shell command whose output (stdout and stderr) is kept in a
+    bounded ring buffer of lines. It runs in its own process group so
+    stopping it also stops whatever the shell started.
+
+    Attribute access falls through to the underlying `subprocess.Popen`, so
+    code written against `exec_bg`'s Popen (`poll()`, `pid`, `wait()`) works
+    unchanged.
+    """
+
+    def __init__(self, command: str, name: str, log_lines: int = DEFAULT_LOG_LINES, cwd: Optional[str] = None,
+                 watch: Optional[List[re.Pattern]] = None):
+        self.command = command
+        self.name = name
+        self.log: deque = deque(maxlen=log_lines)
+        self.lines_seen = 0
+        self.bytes_seen = 0
+        self.started = time.monotonic()
+        self.ended: Optional[float] = None # When the process exit was seen
+        self.ready_after: Optional[float] = None # Seconds from start until the readiness probe passed
+        self.stopped = False # Set when `stop` signalled the process while it was running
+        self._output = threading.Condition()
+        self._patterns: Dict[str, re.Pattern] = {regex.pattern: regex for regex in watch or []} # Not matched yet
+        self._matched: set = set() # Patterns some output line matched
+        self.process = subprocess.Popen(command, shell=True, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, cwd=cwd, start_new_session=True)
+        self._reader = threading.Thread(target=self._read, name=f"{name}-output", daemon=True)
+        self._reader.start()
+
+    def __getattr__(self, attr):
+        return getattr(self.process, attr)
+
+    def _read(self):
+        for raw in iter(self.process.stdout.readline, b""):
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")[:MAX_LINE_LENGTH]
+            with self._output:
+                self.log.append(line)
+                for pattern, regex in list(self._patterns.items()):
+                    if regex.search(line):
+                        self._matched.add(pattern)
+                        del self._patterns[pattern]
+                self.lines_seen += 1
+                self.bytes_seen += len(raw)
+                self._output.notify_all()
+        self.process.stdout.close()
+        self.process.wait()
+        self.ended = time.monotonic()
+        with self._output:
+            self._output.notify_all()
+
+    def matched(self, regex: re.Pattern) -> bool:
+        """
+        True once an output line matched `regex`. Patterns passed as `watch`
+        are checked against every line as it is read; any other pattern is
+        checked against the lines still in the log on its first call, and
+        against every line read after that, so a match is never lost when
+        its line rotates out of the log.
+        """
+        with self._output:
+            if regex.pattern in self._matched:
+                return True
+            if regex.pattern not in self._patterns:
+                if any(regex.search(line) for line in self.log):
+                    self._matched.add(regex.pattern)
+                    return True
+                self._patterns[regex.pattern] = regex
+            return False
+
+    def tail(self, lines: int = 20) -> List[str]:
+        """ The last `lines` output lines. """
+        with self._output:
+            return list(self.log)[-lines:]
+
+    def output(self) -> str:
+        """ All output still held in the ring buffer. """
+        with self._output:
+            return "\n".join(self.log)
+
+    def running(self) -> bool:
+        return self.process.poll() is None
+
+    def wait_ready(self, probe: Probe, timeout: float = DEFAULT_READY_TIMEOUT) -> bool:
+        """
+        Blocks until `probe` passes, the process exits or `timeout` seconds
+        pass. New output wakes the wait immediately, so log probes react at
+        once; other probes are retried every PROBE_INTERVAL seconds.
+
+        Returns:
+            True if ready. A process that exited is ready only if the probe passes after it exits.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            if probe(self):
+                self.ready_after = time.monotonic() - self.started
+                return True
+            if not self.running():
+                self._reader.join(1)
+                return probe(self)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            with self._output:
+                self._output.wait(min(PROBE_INTERVAL, remaining))
+
+    def _signal_group(self, sig: int) -> bool:
+        """ Signals every process left in the group. False if none is left. """
+        try:
+            os.killpg(self.process.pid, sig)
+            return True
+        except ProcessLookupError:
+            return False
+
+    def stop(self, grace: float = DEFAULT_STOP_GRACE) -> Optional[int]:
+        """
+        Terminates the process group, killing what is left of it after
+        `grace` seconds. The group is signalled even when the shell has
+        already exited, so processes it started in the background stop too.
+        Returns the exit code of the shell; `stopped` tells whether it was
+        still running, i.e. whether that code is from the stop signal.
+        """
+        deadline = time.monotonic() + grace
+        if self.process.poll() is None:
+            self.stopped = True
+        if self._signal_group(signal.SIGTERM):
+            try:
+                self.process.wait(grace)
+            except subprocess.TimeoutExpired:
+                pass
+            while self._signal_group(0) and time.monotonic() < deadline:
+                time.sleep(PROBE_INTERVAL)
+            self._signal_group(signal.SIGKILL)
+        self.process.wait()
+        self._reader.join(1)
+        return self.process.returncode
+
+    def __repr__(self):
+        state = "running" if self.running() else f"exited {self.process.returncode}"
+        return f"ManagedProcess({self.name!r}, pid={self.process.pid}, {state})"
+
+
+class ProcessNotReady(RuntimeError):
+    """ A background process exited or timed out before its readiness probe passed. """
+
+
+# --- Supervisor ---
+
+class Supervisor:
+    """
+    Tracks background processes and guarantees they are stopped: on `stop`,
+    `stop_all`, leaving a `with` block, or interpreter exit.
+    """
+
+    def __init__(self):
+        self.processes: Dict[str, ManagedProcess] = {}
+        self._lock = threading.Lock()
+        self._count = 0
+        atexit.register(self.stop_all)
+
+    def start(self, command: str, name: Optional[str] = None, ready: Optional[Probe] = None,
+              timeout: float = DEFAULT_READY_TIMEOUT, log_lines: int = DEFAULT_LOG_LINES,
+              cwd: Optional[str] = None) -> ManagedProcess:
+        """
+        Starts a shell command in the background.
+
+        Args:
+            command: Shell command.
+            name: Name to look the process up by; defaults to "bg-<n>". Reusing
+                  the name of a process still running stops that one first.
+            ready: Readiness probe (`port_open`, `log_line`, `http_ok` or any
+                   callable taking the ManagedProcess); returns only once it passes.
+            timeout: Seconds to wait for readiness.
+            log_lines: Output lines kept in the ring buffer.
+            cwd: Working directory (defaults to the current one).
+
+        Returns:
+            The ManagedProcess. Raises ProcessNotReady, with the last output
+            lines, if the process exits or times out before it is ready; the
+            process is stopped in that case.
+        """
+        with self._lock:
+            self._count += 1
+            name = name or f"bg-{self._count}"
+            previous = self.processes.pop(name, None)
+        if previous is not None:
+            previous.stop()
+        watch = [ready.pattern] if getattr(ready, "pattern", None) is not None else None
+        process = ManagedProcess(command, name, log_lines=log_lines, cwd=cwd, watch=watch)
+        with self._lock:
+            self.processes[name] = process
+        if ready is not None and not process.wait_ready(ready, timeout):
+            reason = "exited" if not process.running() else f"not ready after {timeout}s"
+            process.stop()
+            tail = "".join("\n" + line for line in process.tail(20))
+            raise ProcessNotReady(f"{name} {reason} waiting for {getattr(ready, 'description', 'readiness')}: "
+                                  f"{command}{tail}")
+        return process
+
+    def get(self, name: str) -> ManagedProcess:
+        return self.processes[name]
+
+    def wait_all(self, timeout: Optional[float] = None, names: Optional[List[str]] = None) -> Dict[str, Optional[int]]:
+        """ Waits for processes to exit. Returns exit codes by name (None for those still running at the timeout). """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        codes = {}
+        for name in names or list(self.processes):
+            process = self.processes[name]
+            try:
+                process.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                pass
+            codes[name] = process.poll()
+        return codes
+
+    def stop(self, name: str, grace: float = DEFAULT_STOP_GRACE) -> Optional[int]:
+        """ Stops a process and forgets it. Returns its exit code. """
+        with self._lock:
+            process = self.processes.pop(name, None)
+        return process.stop(grace) if process is not None else None
+
+    def stop_all(self, grace: float = DEFAULT_STOP_GRACE):
+        """ Stops every tracked process. """
+        for name in list(self.processes):
+            self.stop(name, grace)
+
+    def status(self) -> List[dict]:
+        """ Name, pid, state, exit code, uptime and readiness time of every tracked process. """
+        now = time.monotonic()
+        return [{"name": name, "pid": process.pid, "running": process.running(), "code": process.poll(),
+                 "seconds": now - process.started, "ready_after": process.ready_after, "command": process.command}
+                for name, process in list(self.processes.items())]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_all()
+
+
+_supervisor: Optional[Supervisor] = None
+_supervisor_lock = threading.Lock()
+
+
+def get_supervisor() -> Supervisor:
+    """ The shared supervisor of this process (used by scripts.utils.exec_bg). """
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None:
+            _supervisor = Supervisor()
+        return _supervisor
@@ -0,0 +1,359 @@
+import atexit
+import cProfile
+import json
+import os
+import re
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+# Find where the time of a notebook or automation run goes. Tracing is off
+# unless enabled; then every exec, exec_bg, exec_many, clear_keri and
+# restore_keri call of scripts.utils is recorded:
+#
+# from scripts.tracing import enable_tracing
+# tracer = enable_tracing(profile=True)
+# ... run the notebook cells ...
+# tracer.summary()
+# tracer.export_chrome_trace("./logs/trace.json") # Open in chrome://tracing or ui.perfetto.dev
+#
+# Or for a whole run: SCRIPTS_TRACE=./logs/trace.json ./run_notebooks.sh writes
+# the JSON trace, a Chrome trace next to it and prints the summary at exit.
+
+
+# --- Constants ---
+TRACE_ENV = "SCRIPTS_TRACE" # Path of a trace file; enables tracing and writes the trace at exit
+PROFILE_ENV = "SCRIPTS_TRACE_PROFILE" # Set to 1 to also capture cProfile profiles
+DEFAULT_PROFILE_DIR = "./logs/profiles"
+SUMMARY_ROWS = 10
+COMMAND_WIDTH = 60 # Command text shown in the summary table
+SUBCOMMAND = re.compile(r"[A-Za-z][\w-]*\Z")
+STOP_SIGNALS = (signal.SIGTERM, signal.SIGKILL) # What the supervisor stops background processes with
+
+
+@dataclass
+class TraceEvent:
+    """ One traced call. Times are seconds; `start` is relative to when tracing was enabled. """
+    kind: str # exec, exec_bg, exec_many, clear_keri or restore_keri
+    command: str
+    start: float = 0.0
+    seconds: Optional[float] = None
+    cpu_seconds: Optional[float] = None # CPU of the command itself where it can be measured
+    code: Optional[int] = None # Exit status, where known
+    output_bytes: int = 0
+    output_lines: int = 0
+    thread: str = ""
+    profile: Optional[str] = None # cProfile stats file
+    ready_seconds: Optional[float] = None # exec_bg: until the readiness probe passed
+    stopped: bool = False # exec_bg: the supervisor stopped the process while it was running
+    extra: Dict[str, object] = field(default_factory=dict)
+
+    @property
+    def failed(self) -> bool:
+        """ Exited nonzero, other than by the signal the supervisor stopped it with. """
+        if not self.code:
+            return False
+        if self.stopped and (-self.code in STOP_SIGNALS or self.code - 128 in STOP_SIGNALS):
+            return False
+        return True
+
+    def attach_process(self, process):
+        """ Marks an exec_bg event: its exit status and run time come from `process` once it exits. """
+        self._process = process
+
+    def set_output(self, output: str):
+        self.output_bytes = len(output.encode("utf-8"))
+        self.output_lines = len(output.splitlines())
+
+
+def command_group(command: str) -> str:
+    """ What a command is grouped under in the summary: its program and leading subcommands (`kli vc create`). """
+    try:
+        words = shlex.split(command)
+    except ValueError:
+        words = command.split()
+    if not words:
+        return ""
+    subcommands = []
+    for word in words[1:3]:
+        if not SUBCOMMAND.match(word): # Options, arguments and shell syntax end the subcommands
+            break
+        subcommands.append(word)
+    return " ".join([os.path.basename(words[0])] + subcommands)
+
+
+def run_command(command: Union[str, Sequence[str]], merge_stderr: bool = False,
+                executable: Optional[str] = None) -> Tuple[int, str, str, Optional[float]]:
+    """
+    Runs a command (a shell string or an argument list) to completion with
+    its output captured, and measures the CPU of that one process tree.
+
+    The child is reaped with `os.wait4`, whose resource usage covers exactly
+    it and the descendants it waited for, so concurrent commands in other
+    threads are not charged to it.
+
+    Args:
+        command: Shell command string, or argument list run without a shell.
+        merge_stderr: Capture stderr into stdout, in the order written (as IPython's `!` does).
+        executable: Shell to run a string command with (defaults to /bin/sh).
+
+    Returns:
+        (exit code, stdout, stderr, CPU seconds or None where wait4 is unavailable).
+    """
+    process = subprocess.Popen(command, shell=isinstance(command, str), executable=executable,
+                               stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE)
+    outputs = {}
+
+    def read(name, pipe):
+        with pipe:
+            outputs[name] = pipe.read().decode("utf-8", errors="replace")
+
+    readers = [threading.Thread(target=read, args=("stdout", process.stdout), daemon=True)]
+    if not merge_stderr:
+        readers.append(threading.Thread(target=read, args=("stderr", process.stderr), daemon=True))
+    try:
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        cpu_seconds = None
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            cpu_seconds = usage.ru_utime + usage.ru_stime
+        else:
+            process.wait()
+    finally:
+        if process.returncode is None: # Interrupted; leave nothing behind
+            process.kill()
+            process.wait()
+    return process.returncode, outputs.get("stdout", ""), outputs.get("stderr", ""), cpu_seconds
+
+
+class Tracer:
+    """
+    Records wall time, CPU, exit status and output size of traced calls.
+
+    Args:
+        profile: Also capture a cProfile profile of each call: kli commands
+                 on the worker are profiled inside the worker, other in-process
+                 calls (restore_keri) here. Shell commands are not profiled.
+        profile_dir: Where profile files (`<n>-<kind>.prof`, for pstats or snakeviz) go.
+    """
+
+    def __init__(self, profile: bool = False, profile_dir: str = DEFAULT_PROFILE_DIR):
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.events: List[TraceEvent] = []
+        self.origin = time.perf_counter()
+        self.origin_time = time.time()
+        self._lock = threading.Lock()
+        self._pending: List[tuple] = [] # (event, process) of background processes still to finish
+
+    def profile_path(self, kind: str) -> Optional[str]:
+        """ A new profile file path, or None if profiling is off. """
+        if not self.profile:
+            return None
+        os.makedirs(self.profile_dir, exist_ok=True)
+        with self._lock:
+            number = len(self.events) + len(self._pending) + 1
+        return os.path.abspath(os.path.join(self.profile_dir, f"{number:04d}-{kind}-{time.time_ns()}.prof"))
+
+    def record(self, event: TraceEvent):
+        with self._lock:
+            self.events.append(event)
+
+    def record_background(self, event: TraceEvent, process):
+        """ Records an exec_bg process; its exit status and run time are filled in once it has exited. """
+        with self._lock:
+            self._pending.append((event, process))
+
+    def _settle(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        still_running = []
+        for event, process in pending:
+            ended = getattr(process, "ended", None)
+            if process.poll() is None or ended is None:
+                still_running.append((event, process))
+                continue
+            event.code = process.returncode
+            event.stopped = getattr(process, "stopped", False)
+            event.seconds = ended - process.started
+            event.output_bytes = process.bytes_seen
+            event.output_lines = process.lines_seen
+            self.record(event)
+        with self._lock:
+            self._pending.extend(still_running)
+
+    def all_events(self) -> List[TraceEvent]:
+        """ Finished events plus background processes still running (with `seconds` so far and no code). """
+        self._settle()
+        now = time.perf_counter()
+        with self._lock:
+            running = []
+            for event, process in self._pending:
+                snapshot = TraceEvent(**asdict(event))
+                snapshot.seconds = now - self.origin - event.start
+                snapshot.extra = dict(event.extra, running=True)
+                running.append(snapshot)
+            return sorted(self.events + running, key=lambda event: event.start)
+
+    # --- Reports ---
+
+    def slowest(self, count: int = SUMMARY_ROWS) -> List[TraceEvent]:
+        return sorted(self.all_events(), key=lambda event: event.seconds or 0.0, reverse=True)[:count]
+
+    def by_group(self) -> List[dict]:
+        """
+        Call count, total and worst wall time per command group (`kli incept`,
+        `kli vc create`, ...). Background processes the supervisor stopped
+        are not counted as failures.
+        """
+        groups: Dict[str, dict] = {}
+        for event in self.all_events():
+            key = event.kind if event.kind in ("clear_keri", "restore_keri") else command_group(event.command)
+            group = groups.setdefault(key, {"group": key, "calls": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                            "cpu_seconds": 0.0, "failures": 0})
+            group["calls"] += 1
+            group["seconds"] += event.seconds or 0.0
+            group["max_seconds"] = max(group["max_seconds"], event.seconds or 0.0)
+            group["cpu_seconds"] += event.cpu_seconds or 0.0
+            group["failures"] += event.failed
+        return sorted(groups.values(), key=lambda group: group["seconds"], reverse=True)
+
+    def summary(self, count: int = SUMMARY_ROWS, file=None):
+        """ Prints the slowest calls and the time per command group. """
+        file = file or sys.stdout
+        events = self.all_events()
+        total = sum(event.seconds or 0.0 for event in events)
+        print(f"{len(events)} traced calls, {total:.2f}s in total", file=file)
+        print(f"\n{'Seconds':>9} {'CPU':>7} {'Code':>5} {'Bytes':>8}  {'Kind':<10} Command", file=file)
+        for event in self.slowest(count):
+            cpu = f"{event.cpu_seconds:7.2f}" if event.cpu_seconds is not None else f"{'-':>7}"
+            code = "run" if event.extra.get("running") else ("-" if event.code is None else str(event.code))
+            if event.stopped and not event.failed:
+                code = "stop"
+            command = event.command if len(event.command) <= COMMAND_WIDTH else event.command[:COMMAND_WIDTH - 3] + "..."
+            print(f"{event.seconds or 0.0:9.3f} {cpu} {code:>5} {event.output_bytes:>8}  {event.kind:<10} {command}",
+                  file=file)
+        print(f"\n{'Seconds':>9} {'Share':>6} {'Calls':>6} {'Max':>8} {'Failed':>6}  Group", file=file)
+        for group in self.by_group()[:count]:
+            share = group["seconds"] / total * 100 if total else 0.0
+            print(f"{group['seconds']:9.3f} {share:5.1f}% {group['calls']:>6} {group['max_seconds']:8.3f} "
+                  f"{group['failures']:>6}  {group['group']}", file=file)
+
+    def export_json(self, path: str):
+        """ Writes every event as JSON: {"started": epoch seconds, "events": [...]}. """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"started": self.origin_time, "events": [asdict(event) for event in self.all_events()]},
+                      f, indent=2)
+
+    def export_chrome_trace(self, path: str):
+        """ Writes the events in Chrome trace format (chrome://tracing, ui.perfetto.dev), one track per thread. """
+        pid = os.getpid()
+        threads: Dict[str, int] = {}
+        trace = []
+        for event in self.all_events():
+            tid = threads.setdefault(event.thread, len(threads) + 1)
+            args = {key: value for key, value in asdict(event).items()
+                    if key not in ("kind", "start", "seconds", "thread") and value not in (None, {}, "")}
+            trace.append({"name": event.command, "cat": event.kind, "ph": "X", "pid": pid, "tid": tid,
+                          "ts": event.start * 1e6, "dur": (event.seconds or 0.0) * 1e6, "args": args})
+        trace.extend({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                     for name, tid in threads.items())
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+
+# --- Tracing State ---
+
+_tracer: Optional[Tracer] = None
+
+
+def enable_tracing(profile: bool = False, profile_dir: str = DEFAULT_PROFILE_DIR) -> Tracer:
+    """ Starts recording traced calls in a new Tracer and returns it. """
+    global _tracer
+    _tracer = Tracer(profile=profile, profile_dir=profile_dir)
+    return _tracer
+
+
+def disable_tracing() -> Optional[Tracer]:
+    """ Stops recording. Returns the tracer that was active, whose events can still be reported. """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    """ The active tracer, or None if tracing is off. """
+    return _tracer
+
+
+@contextmanager
+def trace(kind: str, command: str, in_process: bool = False) -> Iterator[Optional[TraceEvent]]:
+    """
+    Traces one call. Yields None when tracing is off; otherwise the caller
+    fills in the yielded event's `code`, output and `cpu_seconds` if it
+    knows them (`run_command` measures it for a child process). For
+    `in_process` calls, CPU not set by the caller is the calling thread's.
+
+    With profiling on, `in_process` calls run under cProfile; other callers
+    can pass `event.profile` (a path to write to) on to where the work runs.
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield None
+        return
+
+    event = TraceEvent(kind=kind, command=command, thread=threading.current_thread().name)
+    profiler = None
+    if tracer.profile:
+        event.profile = tracer.profile_path(kind)
+        if in_process:
+            profiler = cProfile.Profile()
+    cpu_started = time.thread_time()
+    started = time.perf_counter()
+    event.start = started - tracer.origin
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield event
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(event.profile)
+        event.seconds = time.perf_counter() - started
+        process = getattr(event, "_process", None)
+        if event.cpu_seconds is None and in_process:
+            event.cpu_seconds = time.thread_time() - cpu_started
+        if event.profile is not None and not os.path.exists(event.profile):
+            event.profile = None # Nothing ran where it could be profiled (e.g. a shell command)
+        if process is not None:
+            tracer.record_background(event, process)
+        else:
+            tracer.record(event)
+
+
+def _export_at_exit(path: str):
+    tracer = disable_tracing()
+    if tracer is None:
+        return
+    tracer.export_json(path)
+    stem = path[:-len(".json")] if path.endswith(".json") else path
+    tracer.export_chrome_trace(stem + ".chrome.json")
+    tracer.summary()
+
+
+if os.getenv(TRACE_ENV):
+    enable_tracing(profile=os.getenv(PROFILE_ENV, "0") == "1")
+    atexit.register(_export_at_exit, os.environ[TRACE_ENV])
@@ -2,6 +2,15 @@ import subprocess
 import os
 import platform
 import shlex 
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from scripts.keystore_snapshot import keystore_path, restore_snapshot, save_snapshot
+from scripts.kli_worker import get_pool, kli_argv, run_kli, worker_enabled
+from scripts.supervisor import DEFAULT_READY_TIMEOUT, ProcessNotReady, get_supervisor
+from scripts.tracing import run_command, trace
 
 class Ansi:
     # Text Colors
@@ -61,21 +70,10 @@ def pr_continue():
 
 def clear_keri(prompt_confirmation=False):
 
-    os_name = platform.system()
-
-    path = "/usr/local/var/keri/"
-    match os_name:
-        case "Linux":
-            path = "/usr/local/var/keri/"
-        case "Darwin":  # macOS
-            user_path = os.path.expanduser("~")
-            path = os.path.join(user_path, ".keri")
-        case "Windows":
-            user_path = os.path.expanduser("~")
-            path = os.path.join(user_path, "keri")  # Adjust as needed for Windows
-        case _:
-            print(f"❌ Unsupported OS: {os_name}. Cannot clear keystore.")
-            return
+    path = keystore_path()
+    if path is None:
+        print(f"❌ Unsupported OS: {platform.system()}. Cannot clear keystore.")
+        return
     # check 
     proceed_with_deletion = False
 
@@ -95,7 +93,12 @@ def clear_keri(prompt_confirmation=False):
             if not os.path.exists(path):
                 print(f"⚠️ Path not found: {path}. Nothing to remove.")
                 return
-            subprocess.run(["rm", "-rf", path], check=True)
+            with trace("clear_keri", f"rm -rf {path}") as event:
+                code, _, _, cpu_seconds = run_command(["rm", "-rf", path])
+                if event is not None:
+                    event.code, event.cpu_seconds = code, cpu_seconds
+            if code != 0:
+                raise subprocess.CalledProcessError(code, ["rm", "-rf", path])
             print(f"✅ Successfully removed: {path}")
         except subprocess.CalledProcessError as e:
             print(f"❌ Error removing {path}: {e}")
@@ -104,14 +107,67 @@ def clear_keri(prompt_confirmation=False):
         except Exception as e: # Catch any other potential errors
             print(f"❌ An unexpected error occurred: {e}")
 
+def snapshot_keri(name):
+    """
+    Saves the current keystore as snapshot `name` (see scripts.keystore_snapshot),
+    so `restore_keri(name)` can later reset to it without re-running kli init/incept.
+    """
+    try:
+        manifest = save_snapshot(name)
+        print(f"✅ Saved keystore snapshot '{name}' ({len(manifest['files'])} files, {manifest['added']} new)")
+    except Exception as e:
+        print(f"❌ Error saving keystore snapshot '{name}': {e}")
+
+def restore_keri(name):
+    """
+    Replaces the keystore with snapshot `name`, as clear_keri followed by
+    re-creating the saved identifiers would. Returns True on success.
+
+    The keystore directory is normally swapped in a single rename. When it is
+    a mount point (e.g. a Docker volume) it cannot be renamed, so its entries
+    are swapped one by one, and a reader may briefly see a mix of both.
+    """
+    try:
+        with trace("restore_keri", f"restore snapshot {name}", in_process=True):
+            result = restore_snapshot(name)
+        print(f"✅ Restored keystore snapshot '{name}' in {result['seconds'] * 1000:.0f} ms")
+        if result["in_place"]:
+            print(f"⚠️ The keystore at '{keystore_path()}' is a mount point, so it was restored entry by entry "
+                  f"instead of in a single rename. Make sure no kli command or agent is using it while restoring.")
+        return True
+    except KeyError:
+        print(f"❌ No keystore snapshot named '{name}'. Create it with snapshot_keri('{name}').")
+    except Exception as e:
+        print(f"❌ Error restoring keystore snapshot '{name}': {e}")
+    return False
+
 def exec(command_string: str, return_all_lines: bool = False):
-    ipython = get_ipython()
-    if ipython is None:
-        print("Warning: Not running in IPython/Jupyter.")
-        return [] if return_all_lines else None
+    # Plain kli commands run on a warm worker process (see scripts.kli_worker)
+    # instead of a new shell and interpreter per call; KLI_WORKER=0 disables it.
+    with trace("exec", command_string) as event:
+        if worker_enabled() and kli_argv(command_string) is not None:
+            result = run_kli(command_string, profile=event.profile if event else None)
+            output_lines = result.output.splitlines()
+            if event is not None:
+                event.code, event.cpu_seconds = result.code, result.cpu_seconds
+                event.set_output(result.output)
+        else:
+            ipython = get_ipython()
+            if ipython is None:
+                print("Warning: Not running in IPython/Jupyter.")
+                return [] if return_all_lines else None
 
-    # This is the equivalent of output_lines = !{command_string}
-    output_lines = ipython.getoutput(command_string, split=True)
+            # This is the equivalent of output_lines = !{command_string}, run
+            # here rather than through ipython.getoutput to get its exit status
+            if command_string.rstrip().endswith('&'):
+                raise OSError("Background processes not supported.")
+            expanded = ipython.var_expand(command_string, depth=0)
+            code, output, _, cpu_seconds = run_command(expanded, merge_stderr=True,
+                                                        executable=os.environ.get("SHELL"))
+            output_lines = output.splitlines()
+            if event is not None:
+                event.code, event.cpu_seconds = code, cpu_seconds
+                event.set_output(output)
 
     if not output_lines:
         # Handle no output
@@ -126,26 +182,150 @@ def exec(command_string: str, return_all_lines: bool = False):
         # We already checked output_lines is not empty
         return stripped_lines[0]
 
-def exec_bg(command_string):
+def exec_bg(command_string, ready=None, timeout=DEFAULT_READY_TIMEOUT, name=None):
     """
-    Runs a shell command in the background.
+    Runs a shell command in the background under the shared process
+    supervisor, which keeps its last output lines in memory and stops it at
+    interpreter exit at the latest.
 
     Args:
         command_string (str): The shell command to execute.
+        ready (callable, optional): Readiness probe from scripts.supervisor
+                                    (`port_open(5642)`, `log_line("Waiting")`,
+                                    `http_ok(url)`); if given, returns only once
+                                    it passes instead of right after starting.
+        timeout (float): Seconds to wait for readiness.
+        name (str, optional): Name to find the process by in `get_supervisor()`.
 
     Returns:
-        subprocess.Popen: The Popen object for the started process.
-                          This can be used to check status, wait, or terminate.
+        ManagedProcess: The started process. It supports the Popen calls
+                        (`poll()`, `wait()`, `pid`, `terminate()`) and adds
+                        `tail()`, `wait_ready()` and `stop()`.
+                        None if it could not be started or never became ready.
     """
-    try:
-        process = subprocess.Popen(
-            command_string,
-            shell=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
-        print(f"Command {command_string} started with PID: {process.pid}")
-        return process
-    except Exception as e:
-        print(f"Error starting command '{command_string}': {e}")
-        return None
\ No newline at end of file
+    with trace("exec_bg", command_string) as event:
+        try:
+            process = get_supervisor().start(command_string, name=name, ready=ready, timeout=timeout)
+        except ProcessNotReady as e:
+            if event is not None:
+                event.extra["error"] = str(e).splitlines()[0]
+            print(f"Error: {e}")
+            return None
+        except Exception as e:
+            print(f"Error starting command '{command_string}': {e}")
+            return None
+        if event is not None:
+            event.ready_seconds = process.ready_after
+            event.attach_process(process)
+    ready_note = f", ready after {process.ready_after:.2f}s" if process.ready_after is not None else ""
+    print(f"Command {command_string} started with PID: {process.pid}{ready_note}")
+    return process
+
+
+@dataclass
+class ExecResult:
+    """ Outcome of one command run by `exec_many`. `code` is None if the command was skipped. """
+    name: str
+    command: str
+    code: Optional[int] = None
+    stdout: str = ""
+    stderr: str = ""
+    started: float = 0.0 # Seconds after exec_many started
+    seconds: float = 0.0
+    after: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.code == 0
+
+    def lines(self) -> List[str]:
+        """ Stripped stdout lines, like `exec(command, True)`. """
+        return [line.strip() for line in self.stdout.splitlines()]
+
+
+def _run_command(command: str, workers: int) -> tuple:
+    """ Runs one command: plain kli commands on the worker pool, anything else in a shell. Returns (code, stdout, stderr). """
+    with trace("exec_many", command) as event:
+        if worker_enabled() and kli_argv(command) is not None:
+            result = get_pool(workers).run(command, profile=event.profile if event else None)
+            code, stdout, stderr = result.code, result.stdout, result.stderr
+            if event is not None:
+                event.cpu_seconds = result.cpu_seconds
+        else:
+            code, stdout, stderr, cpu_seconds = run_command(command)
+            if event is not None:
+                event.cpu_seconds = cpu_seconds
+        if event is not None:
+            event.code = code
+            event.set_output(stdout + stderr)
+    return code, stdout, stderr
+
+
+def exec_many(commands, max_workers: int = 4, verbose: bool = True) -> List[ExecResult]:
+    """
+    Runs several commands, independent ones concurrently.
+
+    Args:
+        commands: A list whose items are command strings, which run
+                  independently, or dicts {"command": ..., "name": ...,
+                  "after": [names]} naming the commands that must succeed
+                  first. Names default to the item's index as a string.
+        max_workers: Commands run at the same time.
+        verbose: Print a line per finished command and the total time.
+
+    Returns:
+        One ExecResult per command, in the order given. Commands whose
+        prerequisites failed or were skipped are skipped (code None).
+    """
+    results = []
+    for index, item in enumerate(commands):
+        if isinstance(item, str):
+            item = {"command": item}
+        results.append(ExecResult(name=str(item.get("name", index)), command=item["command"],
+                                  after=[str(name) for name in item.get("after", [])]))
+    by_name = {result.name: result for result in results}
+    if len(by_name) != len(results):
+        raise ValueError("exec_many: command names must be unique")
+    for result in results:
+        unknown = [name for name in result.after if name not in by_name]
+        if unknown:
+            raise ValueError(f"exec_many: '{result.name}' runs after unknown commands {unknown}")
+
+    done = set()
+    pending = {result.name for result in results}
+    begin = time.perf_counter()
+
+    def run(result):
+        result.started = time.perf_counter() - begin
+        result.code, result.stdout, result.stderr = _run_command(result.command, max_workers)
+        result.seconds = time.perf_counter() - begin - result.started
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = set()
+        while pending or running:
+            for result in results:
+                if result.name not in pending or not all(name in done for name in result.after):
+                    continue
+                pending.discard(result.name)
+                if all(by_name[name].ok for name in result.after):
+                    running.add(executor.submit(run, result))
+                else:
+                    done.add(result.name) # Skipped; its dependents are skipped in turn
+                    if verbose:
+                        print(f"⏭️  Skipped {result.name}: a prerequisite failed")
+            if not running:
+                if pending:
+                    raise ValueError(f"exec_many: circular dependencies between {sorted(pending)}")
+                break
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                done.add(result.name)
+                if verbose:
+                    status = "✅" if result.ok else f"❌ exit {result.code}"
+                    print(f"{status} {result.name} ({result.seconds:.2f}s): {result.command}")
+
+    if verbose:
+        print(f"Ran {len(results)} commands in {time.perf_counter() - begin:.2f}s")
+    return results
@@ -0,0 +1,53 @@
+import pytest
+from keri.core import coring, eventing
+from keri.core.coring import Counter, CtrDex, Salter
+
+
+class KelBuilder:
+    """ Builds a small signed KEL for one AID, one establishment key at a time. """
+
+    def __init__(self, kind: str = "JSON", seed: bytes = b"0123456789abcdef"):
+        self.kind = kind
+        self.signers = Salter(raw=seed).signers(count=16, path="kel", temp=True)
+        self.key_index = 0 # Signer of the current establishment event
+        self.saids = {} # sn -> SAID of the event at that sn on the current branch
+        self.pre = None
+        self.sn = -1
+
+    def _next_digest(self) -> str:
+        return coring.Diger(ser=self.signers[self.key_index + 1].verfer.qb64b).qb64
+
+    def _message(self, serder) -> bytes:
+        self.sn = serder.sn
+        self.saids[serder.sn] = serder.said
+        signature = self.signers[self.key_index].sign(serder.raw, index=0)
+        return serder.raw + Counter(code=CtrDex.ControllerIdxSigs, count=1).qb64b + signature.qb64b
+
+    def incept(self) -> bytes:
+        serder = eventing.incept(keys=[self.signers[0].verfer.qb64], ndigs=[self._next_digest()],
+                                 code=coring.MtrDex.Blake3_256, kind=self.kind)
+        self.pre = serder.pre
+        return self._message(serder)
+
+    def interact(self) -> bytes:
+        return self._message(eventing.interact(pre=self.pre, dig=self.saids[self.sn], sn=self.sn + 1, kind=self.kind))
+
+    def rotate(self, sn: int = None) -> bytes:
+        """ A rotation at `sn` (the next sn by default; a lower one supersedes the events from there on). """
+        sn = self.sn + 1 if sn is None else sn
+        self.key_index += 1
+        serder = eventing.rotate(pre=self.pre, keys=[self.signers[self.key_index].verfer.qb64],
+                                 dig=self.saids[sn - 1], sn=sn, ndigs=[self._next_digest()], kind=self.kind)
+        return self._message(serder)
+
+
+@pytest.fixture
+def kel():
+    """ A KelBuilder for a JSON KEL. """
+    return KelBuilder()
+
+
+@pytest.fixture
+def kel_builder():
+    """ The KelBuilder class, for KELs of other kinds or AIDs (`kel_builder(kind="CBOR", seed=...)`). """
+    return KelBuilder
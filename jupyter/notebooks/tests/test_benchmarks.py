@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from scripts.benchmarks.runner import compare_results, main, run_benchmarks
+from scripts.benchmarks.streams import generate_stream, parse_mix, parse_size, stream_name
+from scripts.format_cesr import iter_cesr_events
+
+
+def test_parse_size_and_mix():
+    assert [parse_size(text) for text in ("512", "4KB", "1.5mb", "2GB")] == [512, 4096, 1572864, 2 * 1024 ** 3]
+    assert parse_mix("icp=1, ixn=8,rct") == {"icp": 1, "ixn": 8, "rct": 1}
+    with pytest.raises(ValueError, match="Unknown event types vcp"):
+        parse_mix("vcp=1")
+
+
+@pytest.mark.parametrize("kind", ["JSON", "CBOR", "MGPK"])
+def test_generated_streams_parse(kind, tmp_path):
+    path = tmp_path / "synthetic.cesr"
+    stream = generate_stream(str(path), 16 * 1024, signatures=3, receipts=2, kind=kind, seed=7)
+    events = list(iter_cesr_events(path.read_bytes()))
+
+    assert len(events) == stream["events"] and events[-1].end == stream["bytes"] == path.stat().st_size
+    assert stream["bytes"] >= 16 * 1024
+    assert {event.kind for event in events} == {kind}
+    assert {event.body.get("t", "acdc") for event in events} <= {"icp", "rot", "ixn", "rct", "rpy", "acdc"}
+    for event in events:
+        counts = {group["code"]: group["count"] for group in event.attachment_groups}
+        expected = {"icp": {"-A": 3, "-B": 2}, "rot": {"-A": 3, "-B": 2}, "ixn": {"-A": 3, "-B": 2},
+                    "rct": {"-C": 2}, "rpy": {"-A": 3}}.get(event.body.get("t"), {})
+        assert counts == expected
+
+
+def test_generation_is_deterministic(tmp_path):
+    first, second, third = tmp_path / "a.cesr", tmp_path / "b.cesr", tmp_path / "c.cesr"
+    generate_stream(str(first), 4096, mix={"ixn": 1, "rct": 1}, seed=1)
+    generate_stream(str(second), 4096, mix={"ixn": 1, "rct": 1}, seed=1)
+    generate_stream(str(third), 4096, mix={"ixn": 1, "rct": 1}, seed=2)
+    assert first.read_bytes() == second.read_bytes() != third.read_bytes()
+    assert stream_name(parse_size("16MB"), kind="CBOR") != stream_name(parse_size("16MB"), kind="CBOR", seed=1)
+    assert stream_name(parse_size("16MB"), kind="CBOR").startswith("synthetic-16MB-cbor-s1-r0-")
+
+
+def test_run_and_compare(tmp_path, capsys):
+    report = run_benchmarks([8 * 1024], benchmarks=["parse", "format_ndjson"], workdir=str(tmp_path))
+    [stream] = report["streams"]
+    with open(stream["path"], "rb") as f:
+        events = sum(1 for _ in iter_cesr_events(f))
+    assert [result["benchmark"] for result in report["results"]] == ["parse", "format_ndjson"]
+    for result in report["results"]:
+        assert result["events"] == events and result["bytes"] == stream["bytes"]
+        assert result["events_per_second"] > 0 and set(result["latency_us"]) == {"p50", "p90", "p99", "p99.9", "max"}
+    assert "Generating" in capsys.readouterr().err
+
+    before, after = tmp_path / "before.json", tmp_path / "after.json"
+    before.write_text(json.dumps(report))
+    assert main(["run", "--size", "8KB", "--bench", "parse", "--workdir", str(tmp_path), "-o", str(after)]) == 0
+    assert "Generating" not in capsys.readouterr().err # The stream of the first run is reused
+
+    [change] = compare_results(report, json.loads(after.read_text()))
+    assert change["benchmark"] == "parse" and change["throughput_change"] is not None
+    assert main(["compare", str(before), str(after)]) == 0
+    assert "parse" in capsys.readouterr().out
@@ -0,0 +1,71 @@
+import json
+
+from keri.core import eventing
+from keri.core.coring import Counter, CtrDex, Salter
+
+from scripts.cesr_events import EventTable, load_event_table, main
+from scripts.format_cesr import iter_cesr_events
+
+
+def _receipt(kel, sn: int, count: int) -> bytes:
+    """ An 'rct' message with `count` non-transferable receipt couples for event `sn` of the KEL. """
+    witnesses = Salter(raw=b"witness-salt-000").signers(count=count, transferable=False, temp=True)
+    message = eventing.receipt(pre=kel.pre, sn=sn, said=kel.saids[sn]).raw
+    message += Counter(code=CtrDex.NonTransReceiptCouples, count=count).qb64b
+    for witness in witnesses:
+        message += witness.verfer.qb64b + witness.sign(b"receipted event").qb64b
+    return message
+
+
+def test_event_table_statistics(kel, kel_builder, tmp_path, capsys):
+    other = kel_builder(seed=b"fedcba9876543210")
+    dump = tmp_path / "kel.cesr"
+    dump.write_bytes(kel.incept() + other.incept() + kel.interact() + _receipt(kel, 1, 3) + kel.rotate()
+                     + kel.rotate() + other.rotate() + other.interact())
+
+    with load_event_table(str(dump)) as table:
+        assert len(table) == 8
+        assert table.ilk_counts() == {"icp": 2, "ixn": 2, "rot": 3, "rct": 1}
+        assert table.events_per_aid() == {kel.pre: 5, other.pre: 3}
+        assert table.rotation_frequency() == {kel.pre: 2, other.pre: 1}
+        assert table.receipt_counts() == {kel.pre: 3}
+        assert [record.sn for record in table.records(prefix=kel.pre, ilk="rot")] == [2, 3]
+        assert list(table.records(ilk="dip")) == []
+        last = table[-1]
+        assert (last.index, last.prefix, last.ilk, last.kind) == (8, other.pre, "ixn", "JSON")
+        assert last.body["d"] == other.saids[2] and last.end == dump.stat().st_size
+        summary = table.summary(top=1)
+    assert (summary["events"], summary["aids"], summary["bytes"]) == (8, 2, dump.stat().st_size)
+    assert summary["events_per_aid"] == {kel.pre: 5} and summary["receipts_per_aid"] == {kel.pre: 3}
+
+    assert main([str(dump), "--json", "--top", "1"]) == 0
+    assert json.loads(capsys.readouterr().out) == summary
+
+
+def test_columns_match_parsed_events(kel_builder):
+    kel = kel_builder(kind="CBOR")
+    stream = kel.incept() + kel.interact() + kel.rotate()
+    events = list(iter_cesr_events(stream))
+    table = EventTable(stream)
+    for event in events:
+        table.append(event)
+    for record, event in zip(table, events):
+        assert (record.start, record.body_end, record.end, record.kind) == \
+            (event.start, event.body_end, event.end, "CBOR")
+        assert (record.prefix, record.sn, record.ilk) == (kel.pre, int(event.body["s"], 16), event.body["t"])
+        assert record.body == event.body and bytes(record.body_view) == event.raw
+
+
+def test_truncated_tail_stops_loading(kel, tmp_path, capsys):
+    dump = tmp_path / "kel.cesr"
+    dump.write_bytes(kel.incept() + kel.interact()[:50])
+    with load_event_table(str(dump)) as table:
+        assert len(table) == 1
+    assert "Stopped loading" in capsys.readouterr().err
+
+
+def test_empty_dump(tmp_path):
+    dump = tmp_path / "empty.cesr"
+    dump.write_bytes(b"")
+    with load_event_table(str(dump)) as table:
+        assert len(table) == 0 and table.summary()["events"] == 0
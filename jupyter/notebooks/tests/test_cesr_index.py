@@ -0,0 +1,84 @@
+from scripts import cesr_index
+from scripts.cesr_index import CesrIndex, build_cesr_index, index_is_current, main
+from scripts.format_cesr import iter_cesr_events
+
+
+def _record_offsets(monkeypatch):
+    """ Records the offset each build starts scanning the dump from. """
+    offsets = []
+
+    def iter_from(source, offset=0, **kwargs):
+        offsets.append(offset)
+        return iter_cesr_events(source, offset=offset, **kwargs)
+
+    monkeypatch.setattr(cesr_index, "iter_cesr_events", iter_from)
+    return offsets
+
+
+def test_lookups(kel, kel_builder, tmp_path, capsys):
+    other = kel_builder(seed=b"fedcba9876543210")
+    dump = tmp_path / "kel.cesr"
+    dump.write_bytes(kel.incept() + other.incept() + kel.interact() + kel.rotate() + other.interact())
+    build_cesr_index(str(dump))
+
+    with CesrIndex(str(dump)) as index:
+        assert len(index) == 5
+        assert [(entry.index, entry.sn) for entry in index.find(prefix=kel.pre)] == [(1, 0), (3, 1), (4, 2)]
+        [entry] = index.find(prefix=other.pre, sn=1)
+        assert (entry.said, entry.ilk) == (other.saids[1], "ixn")
+        [event] = index.events(said=kel.saids[2])
+        assert event.body["t"] == "rot" and event.start == index.find(ilk="rot")[0].start
+        assert len(index.find(ilk="icp", limit=1)) == 1
+
+    assert main(["show", str(dump), "--aid", kel.pre, "--sn", "0x2"]) == 0
+    assert kel.saids[2] in capsys.readouterr().out
+    assert main(["show", str(dump), "--said", "missing"]) == 1
+
+
+def test_resumes_on_append(kel, tmp_path, monkeypatch):
+    offsets = _record_offsets(monkeypatch)
+    dump = tmp_path / "kel.cesr"
+    dump.write_bytes(kel.incept() + kel.interact())
+    build_cesr_index(str(dump))
+    size = dump.stat().st_size
+    assert index_is_current(str(dump))
+
+    with open(dump, "ab") as f:
+        f.write(kel.rotate())
+    assert not index_is_current(str(dump))
+    build_cesr_index(str(dump))
+
+    assert offsets == [0, size] # Only the appended tail was scanned
+    assert index_is_current(str(dump))
+    with CesrIndex(str(dump)) as index:
+        assert len(index) == 3
+        assert [entry.said for entry in index.find()] == [kel.saids[sn] for sn in range(3)]
+
+
+def test_truncated_tail_is_indexed_next_time(kel, tmp_path):
+    dump = tmp_path / "kel.cesr"
+    incept, interact = kel.incept(), kel.interact()
+    dump.write_bytes(incept + interact[:40])
+    build_cesr_index(str(dump))
+    with open(dump, "ab") as f:
+        f.write(interact[40:])
+    build_cesr_index(str(dump))
+    with CesrIndex(str(dump)) as index:
+        assert [entry.end for entry in index.find()] == [len(incept), len(incept + interact)]
+
+
+def test_rebuilds_when_head_digest_changes(kel, kel_builder, tmp_path, monkeypatch, capsys):
+    offsets = _record_offsets(monkeypatch)
+    dump = tmp_path / "kel.cesr"
+    dump.write_bytes(kel.incept())
+    build_cesr_index(str(dump))
+
+    other = kel_builder(seed=b"fedcba9876543210")
+    dump.write_bytes(other.incept() + other.interact()) # Replaced by a larger dump, not appended to
+    build_cesr_index(str(dump))
+
+    assert offsets == [0, 0]
+    assert "changed since it was indexed" in capsys.readouterr().out
+    with CesrIndex(str(dump)) as index:
+        assert {entry.prefix for entry in index.find()} == {other.pre}
+        assert len(index) == 2
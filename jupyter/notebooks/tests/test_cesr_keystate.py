@@ -0,0 +1,65 @@
+import json
+
+from scripts import cesr_keystate
+from scripts.cesr_keystate import KeyStateReducer, load_checkpoint, reduce_key_states
+from scripts.format_cesr import iter_cesr_events
+
+
+def _reduce(messages):
+    reducer = KeyStateReducer()
+    for event in iter_cesr_events(b"".join(messages)):
+        reducer.apply_event(event)
+    return reducer
+
+
+def test_reduces_establishment_and_interaction_events(kel):
+    reducer = _reduce([kel.incept(), kel.interact(), kel.rotate(), kel.interact()])
+    state = reducer.states[kel.pre]
+    assert (state["sn"], state["ilk"], state["said"]) == (3, "ixn", kel.saids[3])
+    assert state["keys"] == [kel.signers[1].verfer.qb64]
+    assert state["last_establishment"] == {"sn": 2, "said": kel.saids[2]}
+
+
+def test_recovery_rotation_supersedes_interaction_events(kel):
+    messages = [kel.incept(), kel.interact(), kel.interact(), kel.interact()]
+    messages.append(kel.rotate(sn=2))
+    reducer = _reduce(messages + [messages[-1], messages[2]])
+    state = reducer.states[kel.pre]
+    assert (state["sn"], state["ilk"], state["said"]) == (2, "rot", kel.saids[2])
+    assert state["keys"] == [kel.signers[1].verfer.qb64]
+    assert reducer.recoveries == 1
+    assert reducer.duplicates == 2 # The repeated rotation and the superseded interaction event
+
+
+def test_resumes_from_checkpoint_after_append(kel, tmp_path, monkeypatch):
+    dump = tmp_path / "kel.cesr"
+    dump.write_bytes(kel.incept() + kel.interact())
+    reduce_key_states(str(dump))
+    checkpoint = load_checkpoint(str(dump) + ".keystate.json")
+    assert (checkpoint["count"], checkpoint["offset"]) == (2, dump.stat().st_size)
+
+    offsets = []
+
+    def iter_from(source, offset=0, **kwargs):
+        offsets.append(offset)
+        return iter_cesr_events(source, offset=offset, **kwargs)
+
+    monkeypatch.setattr(cesr_keystate, "iter_cesr_events", iter_from)
+    with open(dump, "ab") as f:
+        f.write(kel.rotate())
+    states = reduce_key_states(str(dump))
+    assert offsets == [checkpoint["offset"]]
+    assert states[kel.pre]["sn"] == 2 and states[kel.pre]["ilk"] == "rot"
+
+
+def test_replaced_dump_is_reduced_from_the_start(kel, kel_builder, tmp_path):
+    dump = tmp_path / "kel.cesr"
+    dump.write_bytes(kel.incept() + kel.interact())
+    reduce_key_states(str(dump))
+
+    other = kel_builder(seed=b"fedcba9876543210")
+    dump.write_bytes(other.incept() + other.interact() + other.interact())
+    states = reduce_key_states(str(dump))
+    assert list(states) == [other.pre]
+    with open(str(dump) + ".keystate.json") as f:
+        assert json.load(f)["count"] == 3
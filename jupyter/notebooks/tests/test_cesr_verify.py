@@ -0,0 +1,71 @@
+import json
+
+from keri.core import eventing
+from keri.core.coring import Counter, CtrDex, Salter
+
+from scripts.cesr_verify import main, verify_cesr
+from scripts.format_cesr import iter_cesr_events
+
+
+def _resign(message: bytes, signer) -> bytes:
+    """ The message with its controller signature replaced by one from `signer`. """
+    event = next(iter_cesr_events(message))
+    return event.raw + Counter(code=CtrDex.ControllerIdxSigs, count=1).qb64b + signer.sign(event.raw, index=0).qb64b
+
+
+def _write(tmp_path, *messages) -> str:
+    path = tmp_path / "kel.cesr"
+    path.write_bytes(b"".join(messages))
+    return str(path)
+
+
+def test_valid_kel_verifies(kel, tmp_path):
+    report = verify_cesr(_write(tmp_path, kel.incept(), kel.interact(), kel.rotate(), kel.interact()), workers=1)
+    assert (report["events"], report["signatures"]) == (4, 4)
+    assert report["failures"] == [] and report["unverifiable"] == []
+
+
+def test_detects_corrupted_signature(kel, tmp_path):
+    incept, interact = kel.incept(), kel.interact()
+    rotate = kel.rotate()
+    forged = _resign(interact, kel.signers[5])
+    path = _write(tmp_path, incept, forged, rotate)
+
+    report = verify_cesr(path, workers=2, batch_size=1)
+    assert report["signatures"] == 3
+    [failure] = report["failures"]
+    assert (failure["event"], failure["ilk"], failure["sn"]) == (2, "ixn", 1)
+    assert (failure["label"], failure["signer"], failure["index"]) == ("controller", kel.pre, 0)
+    assert failure["reason"] == "signature does not verify"
+    assert main([path, "--jobs", "1"]) == 1
+
+
+def test_rotated_keys_are_used_after_rotation(kel, tmp_path):
+    incept, rotate = kel.incept(), kel.rotate()
+    stale = _resign(kel.interact(), kel.signers[0]) # Signed with the key the rotation retired
+    report = verify_cesr(_write(tmp_path, incept, rotate, stale), workers=1)
+    assert [failure["event"] for failure in report["failures"]] == [3]
+
+
+def test_signatures_in_quadlet_groups_and_receipts(kel, tmp_path):
+    incept = kel.incept()
+    event = next(iter_cesr_events(incept))
+    wrapped = event.raw + Counter(code=CtrDex.AttachedMaterialQuadlets,
+                                  count=len(event.attachments) // 4).qb64b + event.attachments
+
+    witness = Salter(raw=b"witness-salt-000").signers(count=1, transferable=False, temp=True)[0]
+    receipt = eventing.receipt(pre=kel.pre, sn=0, said=kel.saids[0])
+    couple = Counter(code=CtrDex.NonTransReceiptCouples, count=1).qb64b + witness.verfer.qb64b
+    receipt_message = receipt.raw + couple + witness.sign(event.raw).qb64b
+
+    report = verify_cesr(_write(tmp_path, wrapped, receipt_message), workers=1)
+    assert (report["signatures"], report["failures"], report["unverifiable"]) == (2, [], [])
+
+
+def test_unknown_signer_is_unverifiable(kel, tmp_path, capsys):
+    kel.incept()
+    path = _write(tmp_path, kel.interact()) # No inception event for the AID in the stream
+    assert main([path, "--jobs", "1", "--json"]) == 0
+    report = json.loads(capsys.readouterr().out)
+    [problem] = report["unverifiable"]
+    assert problem["reason"] == "no key state for AID in stream" and report["signatures"] == 0
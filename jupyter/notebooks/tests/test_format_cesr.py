@@ -0,0 +1,254 @@
+import base64
+import io
+import json
+
+import msgpack
+import pytest
+from keri.core.coring import Counter, CtrDex, Dater, Seqner
+
+from scripts.cesr_index import build_cesr_index
+from scripts.format_cesr import (CesrOrphanedDataError, CesrParseError, format_cesr, format_cesr_parallel,
+                                 iter_cesr_events, iter_output, main)
+
+
+def _strip_offsets(groups):
+    return [{key: value for key, value in group.items() if key not in ("start", "end")} for group in groups]
+
+
+def _mgpk_message(body: dict) -> bytes:
+    """ An MGPK body with its version string sized. """
+    for _ in range(3):
+        raw = msgpack.packb(body)
+        body["v"] = f"KERI10MGPK{len(raw):06x}_"
+    return msgpack.packb(body)
+
+
+def _frames(events):
+    return [(event.index, event.start, event.body_end, event.end, event.raw, event.attachments) for event in events]
+
+
+# --- Framing ---
+
+@pytest.fixture
+def stream(kel):
+    return kel.incept() + b"\n" + kel.interact() + b" \r\n" + kel.rotate() + kel.interact() + b"\n"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 4096])
+def test_framing_across_chunk_boundaries(stream, chunk_size):
+    expected = _frames(iter_cesr_events(stream))
+    assert len(expected) == 4 and expected[-1][3] == len(stream) - 1
+    assert _frames(iter_cesr_events(io.BytesIO(stream), chunk_size=chunk_size)) == expected
+    chunks = (stream[i:i + chunk_size] for i in range(0, len(stream), chunk_size))
+    assert _frames(iter_cesr_events(chunks)) == expected
+
+
+def test_text_sources_frame_like_bytes(stream):
+    expected = _frames(iter_cesr_events(stream))
+    assert _frames(iter_cesr_events(stream.decode())) == expected
+    assert _frames(iter_cesr_events(io.StringIO(stream.decode()), chunk_size=5)) == expected
+    assert _frames(iter_cesr_events(memoryview(stream))) == expected
+
+
+def test_offset_and_start_index_for_a_slice(stream):
+    events = list(iter_cesr_events(stream))
+    tail = list(iter_cesr_events(stream[events[2].start:], offset=events[2].start, start_index=3))
+    assert _frames(tail) == _frames(events[2:])
+
+
+def test_truncated_body_is_a_parse_error(stream):
+    events = list(iter_cesr_events(stream))
+    with pytest.raises(CesrParseError) as raised:
+        list(iter_cesr_events(io.BytesIO(stream[:events[1].start + 50]), chunk_size=16))
+    assert raised.value.offset == events[1].start and not isinstance(raised.value, CesrOrphanedDataError)
+
+
+def test_orphaned_data_between_events(stream):
+    first = next(iter_cesr_events(stream))
+    data = stream[:first.end] + b"garbage" + stream[first.end:]
+    with pytest.raises(CesrOrphanedDataError) as raised:
+        list(iter_cesr_events(data))
+    assert raised.value.offset == first.end and raised.value.snippet.startswith(b"garbage")
+    assert "Orphaned or unexpected non-message data:" in format_cesr(data)
+
+
+# --- Attachments ---
+
+def _wrapped(message: bytes) -> bytes:
+    """ The message with its attachments wrapped in an AttachedMaterialQuadlets (-V) group. """
+    event = next(iter_cesr_events(message))
+    count = Counter(code=CtrDex.AttachedMaterialQuadlets, count=len(event.attachments) // 4)
+    return event.raw + count.qb64b + event.attachments
+
+
+def test_controller_signatures_are_decoded(kel):
+    event = next(iter_cesr_events(kel.incept()))
+    [group] = event.attachment_groups
+    signature = kel.signers[0].sign(event.raw, index=0).qb64
+    assert (group["code"], group["name"], group["count"]) == ("-A", "ControllerIdxSigs", 1)
+    assert group["items"] == [{"signature": signature, "index": 0}]
+
+
+def test_quadlet_wrapped_groups(kel):
+    plain = kel.incept()
+    message = _wrapped(plain) + _wrapped(kel.interact())
+    events = list(iter_cesr_events(message))
+    assert len(events) == 2 and events[-1].end == len(message)
+    [wrapper] = events[0].attachment_groups
+    assert (wrapper["code"], wrapper["count"]) == ("-V", 23)
+    assert _strip_offsets(wrapper["groups"]) == _strip_offsets(next(iter_cesr_events(plain)).attachment_groups)
+    assert "-V AttachedMaterialQuadlets (23 quadlets)" in format_cesr(message)
+
+
+def test_quadlet_wrapped_groups_in_qb2(kel):
+    text = _wrapped(kel.incept())
+    event = next(iter_cesr_events(text))
+    binary = event.raw + base64.urlsafe_b64decode(event.attachments)
+    binary_event = next(iter_cesr_events(io.BytesIO(binary), chunk_size=3))
+    assert _strip_offsets(binary_event.attachment_groups[0]["groups"]) == \
+        _strip_offsets(event.attachment_groups[0]["groups"])
+
+
+def test_quadlet_count_must_match_contents(kel):
+    event = next(iter_cesr_events(kel.incept()))
+    count = Counter(code=CtrDex.AttachedMaterialQuadlets, count=len(event.attachments) // 4 - 1)
+    with pytest.raises(CesrParseError, match="declares 22 quadlets"):
+        list(iter_cesr_events(event.raw + count.qb64b + event.attachments))
+
+
+def test_first_seen_replay_couples(kel):
+    dater = Dater(dts="2024-01-02T03:04:05.123456+00:00")
+    counter = Counter(code=CtrDex.FirstSeenReplayCouples, count=1)
+    message = kel.incept() + counter.qb64b + Seqner(sn=5).qb64b + dater.qb64b
+    groups = next(iter_cesr_events(message)).attachment_groups
+    assert [group["code"] for group in groups] == ["-A", "-E"]
+    assert groups[1]["items"] == [{"fn": 5, "datetime": "2024-01-02T03:04:05.123456+00:00"}]
+
+
+def test_unsupported_count_code(kel):
+    with pytest.raises(CesrParseError, match="Unsupported count code -Z"):
+        list(iter_cesr_events(kel.incept() + b"-ZAB"))
+
+
+# --- Bodies and Domains ---
+
+@pytest.mark.parametrize("kind", ["JSON", "CBOR", "MGPK"])
+def test_bodies_of_every_kind(kel_builder, kind):
+    kel = kel_builder(kind=kind)
+    stream = kel.incept() + kel.interact() + kel.rotate()
+    events = list(iter_cesr_events(stream))
+    assert [event.kind for event in events] == [kind] * 3
+    assert [event.body["t"] for event in events] == ["icp", "ixn", "rot"]
+    assert [event.body["d"] for event in events] == [kel.saids[sn] for sn in range(3)]
+    assert events[-1].end == len(stream)
+
+
+def test_qb2_attachments_decode_like_qb64(kel):
+    text = kel.incept()
+    event = next(iter_cesr_events(text))
+    binary = event.raw + base64.urlsafe_b64decode(event.attachments)
+    binary_event = next(iter_cesr_events(binary + binary))
+    assert binary_event.end == len(binary)
+    assert _strip_offsets(binary_event.attachment_groups) == _strip_offsets(event.attachment_groups)
+
+
+def test_undecodable_body_is_a_parse_error():
+    event = next(iter_cesr_events(_mgpk_message({"v": "", "t": "rpy", 1: "int key"})))
+    with pytest.raises(CesrParseError):
+        event.body
+    record = json.loads(next(iter_output(_mgpk_message({"v": "", "t": "rpy", 1: "x"}), "ndjson")))
+    assert record["error"] and record["body"] is None
+
+
+@pytest.mark.parametrize("output_format", ["text", "ndjson", "columnar"])
+def test_byte_string_values_are_base64url(output_format, tmp_path, capsys):
+    path = tmp_path / "mgpk.cesr"
+    path.write_bytes(_mgpk_message({"v": "", "t": "rpy", "d": b"\x01\x02", "a": {b"k": [b"\xff\xfe"]}}))
+    assert main([str(path), "--format", output_format]) == 0
+    output = capsys.readouterr().out
+    if output_format == "text":
+        assert '"d": "AQI"' in output and '"aw": [' in output and '"__4"' in output
+    else:
+        record = json.loads(output.splitlines()[0])
+        body = record["body"][0] if output_format == "columnar" else record["body"]
+        assert body["d"] == "AQI" and body["a"] == {"aw": ["__4"]}
+        assert record["said"] in ("AQI", ["AQI"])
+
+
+# --- Parallel Formatting ---
+
+@pytest.mark.parametrize("output_format", ["text", "ndjson"])
+@pytest.mark.parametrize("use_index", [False, True])
+def test_parallel_output_matches_serial(kel, tmp_path, output_format, use_index):
+    path = tmp_path / "kel.cesr"
+    path.write_bytes(kel.incept() + b"\n" + kel.interact() + kel.rotate() + kel.interact() + kel.interact()
+                     + b"orphaned tail")
+    if use_index:
+        build_cesr_index(str(path))
+    serial = "".join(part + "\n" for part in iter_output(path.read_bytes(), output_format))
+
+    output = io.StringIO()
+    chunks = format_cesr_parallel(str(path), output, workers=2, chunk_bytes=600, output_format=output_format)
+    assert chunks > 2
+    assert output.getvalue() == serial
+
+
+def test_parallel_formatting_from_the_cli(kel, tmp_path):
+    path = tmp_path / "kel.cesr"
+    path.write_bytes(kel.incept() + kel.interact() + kel.rotate())
+    serial, parallel = tmp_path / "serial.txt", tmp_path / "parallel.txt"
+    assert main([str(path), "-o", str(serial)]) == 0
+    assert main([str(path), "-o", str(parallel), "--jobs", "2", "--chunk-bytes", "1"]) == 0
+    assert parallel.read_bytes() == serial.read_bytes()
+
+
+# --- Structured Output ---
+
+def test_ndjson_records(kel, tmp_path, capsys):
+    path = tmp_path / "kel.cesr"
+    stream = kel.incept() + kel.interact() + kel.rotate()
+    path.write_bytes(stream)
+    events = list(iter_cesr_events(stream))
+    assert main([str(path), "--format", "ndjson"]) == 0
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    assert [record["index"] for record in records] == [1, 2, 3]
+    for record, event in zip(records, events):
+        assert (record["offset"], record["size"], record["body_size"]) == (event.start, event.size, len(event.raw))
+        assert (record["ilk"], record["prefix"], record["sn"]) == (event.body["t"], kel.pre, int(event.body["s"], 16))
+        assert record["said"] == event.body["d"] and record["attachments"] == event.attachments.decode()
+        assert record["body"] == event.body
+
+    assert main([str(path), "--format", "ndjson", "--no-body"]) == 0
+    assert all("body" not in json.loads(line) for line in capsys.readouterr().out.splitlines())
+
+
+def test_columnar_batches(kel):
+    stream = kel.incept() + kel.interact() + kel.interact() + b"orphaned"
+    lines = [json.loads(line) for line in iter_output(stream, "columnar", batch_size=2)]
+    assert [batch["index"] for batch in lines[:2]] == [[1, 2], [3]]
+    assert lines[1]["sn"] == [2] and lines[1]["body"][0]["d"] == kel.saids[2]
+    assert set(lines[0]) == {"index", "offset", "size", "body_size", "kind", "ilk", "prefix", "sn", "said",
+                             "attachments", "error", "body"}
+    assert lines[2]["orphaned"] and lines[2]["offset"] == len(stream) - len(b"orphaned")
+
+
+def test_ndjson_error_line_ends_the_stream(kel):
+    incept = kel.incept()
+    lines = list(iter_output(incept + kel.interact()[:30], "ndjson"))
+    assert json.loads(lines[0])["said"] == kel.saids[0]
+    error = json.loads(lines[1])
+    assert error["offset"] == len(incept) and not error["orphaned"] and "Truncated" in error["error"]
+
+
+def test_unknown_output_format():
+    with pytest.raises(ValueError, match="Unknown output format"):
+        iter_output(b"", "parquet")
+
+
+def test_reads_stdin_without_closing_it(kel, monkeypatch, capsys):
+    stdin = io.TextIOWrapper(io.BytesIO(kel.incept()))
+    monkeypatch.setattr("sys.stdin", stdin)
+    assert main(["-", "--format", "ndjson", "--no-body"]) == 0
+    assert json.loads(capsys.readouterr().out)["said"] == kel.saids[0]
+    assert not stdin.buffer.closed
@@ -0,0 +1,81 @@
+import errno
+import os
+
+import pytest
+
+from scripts.keystore_snapshot import SnapshotStore
+
+
+def _tree(root):
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, root)] = (f.read(), os.stat(path).st_mode & 0o777)
+    return files
+
+
+@pytest.fixture
+def keystore(tmp_path):
+    root = tmp_path / "keri"
+    (root / "db" / "t1").mkdir(parents=True)
+    (root / "db" / "t1" / "data.mdb").write_bytes(b"\x00keystore" * 100)
+    (root / "db" / "t1" / "lock.mdb").write_bytes(b"lock")
+    (root / "cf").mkdir()
+    (root / "cf" / "t1.json").write_text('{"dt": "2024-01-01"}')
+    os.chmod(root / "cf" / "t1.json", 0o600)
+    return root
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(str(tmp_path / "store"))
+
+
+def test_restore_round_trip(keystore, store):
+    saved = _tree(keystore)
+    del saved[os.path.join("db", "t1", "lock.mdb")] # LMDB recreates its lock file
+    store.save("base", str(keystore))
+
+    (keystore / "db" / "t1" / "data.mdb").write_bytes(b"changed")
+    (keystore / "extra").write_text("x")
+    result = store.restore("base", str(keystore), reflink=False)
+    assert _tree(keystore) == saved
+    assert result["files"] == 2 and result["copied"] == 2 and not result["in_place"]
+    assert not [name for name in os.listdir(keystore.parent) if name.startswith(".")]
+
+
+def test_unchanged_files_are_stored_once(keystore, store):
+    assert store.save("one", str(keystore))["added"] == 2
+    assert store.save("two", str(keystore))["added"] == 0
+    (keystore / "cf" / "t1.json").write_text("{}")
+    assert store.save("three", str(keystore))["added"] == 1
+    assert store.delete("three") == 1
+    assert [snapshot["name"] for snapshot in store.list()] == ["one", "two"]
+
+
+def test_unknown_snapshot_is_a_key_error(store, tmp_path):
+    with pytest.raises(KeyError):
+        store.restore("missing", str(tmp_path / "keri"))
+
+
+def test_keystore_that_cannot_be_renamed_is_restored_in_place(keystore, store, monkeypatch):
+    saved = _tree(keystore)
+    del saved[os.path.join("db", "t1", "lock.mdb")]
+    store.save("base", str(keystore))
+    (keystore / "db" / "t1" / "data.mdb").write_bytes(b"changed")
+    (keystore / "extra").write_text("x")
+
+    rename = os.rename
+
+    def busy_mount_point(src, dst):
+        if os.path.abspath(src) == str(keystore): # As for a (bind) mount point
+            raise OSError(errno.EBUSY, "Device or resource busy", src)
+        rename(src, dst)
+
+    monkeypatch.setattr(os, "rename", busy_mount_point)
+    result = store.restore("base", str(keystore), reflink=False)
+    assert result["in_place"]
+    assert _tree(keystore) == saved
+    assert not [name for name in os.listdir(keystore.parent) if name.startswith(".")]
@@ -0,0 +1,74 @@
+import shutil
+import subprocess
+
+import pytest
+
+from scripts.kli_worker import KLI_ERROR_CODE, KliWorker, kli_argv
+
+pytestmark = pytest.mark.skipif(shutil.which("kli") is None, reason="kli is not installed")
+
+COMMANDS = [
+    "kli version",
+    "kli",
+    "kli bogus",
+    "kli status --name no-such-keystore",
+    "kli saidify --file missing.json",
+]
+
+
+@pytest.fixture(scope="module")
+def worker():
+    worker = KliWorker()
+    yield worker
+    worker.close()
+
+
+def _kli(command: str, cwd) -> subprocess.CompletedProcess:
+    return subprocess.run(command.split(), capture_output=True, text=True, cwd=cwd)
+
+
+@pytest.mark.parametrize("command", COMMANDS)
+def test_matches_kli_subprocess(worker, command, tmp_path, monkeypatch):
+    expected = _kli(command, tmp_path)
+    monkeypatch.chdir(tmp_path)
+    result = worker.run(command)
+    assert (result.code, result.stdout, result.stderr) == (expected.returncode, expected.stdout, expected.stderr)
+    assert result.output == expected.stdout + expected.stderr # Each command writes to one stream only
+
+
+def test_exit_codes(worker):
+    assert [worker.run(command).code for command in COMMANDS] == [0, 0, 2, KLI_ERROR_CODE, KLI_ERROR_CODE]
+
+
+def test_runs_in_the_callers_directory(worker, tmp_path, monkeypatch):
+    for name in ("worker", "subprocess"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "block.json").write_text('{"d": "", "a": 1}')
+    assert _kli("kli saidify --file block.json", tmp_path / "subprocess").returncode == 0
+    monkeypatch.chdir(tmp_path / "worker")
+    assert worker.run(["kli", "saidify", "--file", "block.json"]).code == 0
+    assert (tmp_path / "worker" / "block.json").read_text() == (tmp_path / "subprocess" / "block.json").read_text()
+
+
+def test_environment_changes_apply_per_command(worker, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DEBUG_KLI", "1")
+    assert "Traceback" in worker.run("kli saidify --file missing.json").stderr
+    monkeypatch.delenv("DEBUG_KLI")
+    result = worker.run("kli saidify --file missing.json")
+    assert result.stdout.startswith("ERR: ") and "Traceback" not in result.output
+
+
+def test_worker_is_restarted_after_exiting(worker):
+    worker.run("kli version")
+    worker.process.kill()
+    worker.process.wait()
+    assert worker.run("kli version").stdout.strip() == _kli("kli version", None).stdout.strip()
+
+
+def test_shell_commands_are_not_run():
+    assert kli_argv("kli version | head -1") is None
+    assert kli_argv("echo kli") is None
+    assert kli_argv("/usr/bin/kli list --name 'my keystore'") == ["list", "--name", "my keystore"]
+    with pytest.raises(ValueError):
+        KliWorker().run("kli list > out.txt")
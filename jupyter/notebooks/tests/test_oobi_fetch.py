@@ -0,0 +1,142 @@
+import asyncio
+import base64
+
+import pytest
+
+from scripts.format_cesr import CesrParseError, iter_cesr_events
+from scripts.oobi_fetch import ConnectionPool, OobiFetchError, fetch_oobis_async, iter_oobi_events
+
+
+class StandInServer:
+    """ A local HTTP/1.1 server answering fixed routes, counting the connections it accepts. """
+
+    def __init__(self, routes: dict):
+        self.routes = routes # path -> (status, headers, body) or a list of body chunks sent chunked
+        self.connections = 0
+        self.requests = 0
+        self.server = None
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}{path}"
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request = await reader.readline()
+                if not request:
+                    return
+                while await reader.readline() not in (b"\r\n", b""):
+                    pass
+                self.requests += 1
+                path = request.split()[1].decode()
+                route = self.routes.get(path, (404, {}, b"not found"))
+                if isinstance(route, list): # Chunked transfer encoding, one HTTP chunk per item
+                    writer.write(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n")
+                    for chunk in route:
+                        writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                        await writer.drain()
+                    writer.write(b"0\r\n\r\n")
+                else:
+                    status, headers, body = route
+                    head = f"HTTP/1.1 {status} X\r\nContent-Length: {len(body)}\r\n"
+                    head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+                    writer.write(head.encode() + b"\r\n" + body)
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+@pytest.fixture
+def stream(kel):
+    return kel.incept() + kel.interact() + kel.rotate() + kel.interact()
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def _saids(events):
+    return [event.body["d"] for event in events]
+
+
+def test_keep_alive_connection_is_reused(stream):
+    async def fetch():
+        async with StandInServer({"/kel": (200, {}, stream)}) as server:
+            async with ConnectionPool(per_host=1) as pool:
+                results = await fetch_oobis_async([server.url("/kel")] * 4, pool=pool)
+            return results, pool.connections_opened, server.connections, server.requests
+
+    results, opened, accepted, requests = _run(fetch())
+    expected = _saids(iter_cesr_events(stream))
+    assert all(result.error is None and _saids(result.events) == expected for result in results)
+    assert (opened, accepted, requests) == (1, 1, 4)
+
+
+def test_chunked_body_split_inside_events(stream):
+    chunks = [stream[i:i + 37] for i in range(0, len(stream), 37)]
+
+    async def fetch():
+        async with StandInServer({"/kel": chunks, "/after": (200, {}, stream)}) as server:
+            async with ConnectionPool(per_host=1) as pool:
+                events = [event async for event in iter_oobi_events(server.url("/kel"), pool)]
+                after = [event async for event in iter_oobi_events(server.url("/after"), pool)]
+            return events, after, server.connections
+
+    events, after, connections = _run(fetch())
+    assert _saids(events) == _saids(after) == _saids(iter_cesr_events(stream))
+    assert connections == 1 # The chunked response left the connection reusable
+
+
+def test_not_found_is_a_fetch_error(stream):
+    async def fetch():
+        async with StandInServer({}) as server:
+            return await fetch_oobis_async([server.url("/oobi/missing")])
+
+    [result] = _run(fetch())
+    assert isinstance(result.error, OobiFetchError)
+    assert result.error.status == 404 and "not found" in str(result.error)
+
+
+def test_redirect_is_followed(stream):
+    async def fetch():
+        async with StandInServer({"/oobi": (302, {"Location": "/kel"}, b""), "/kel": (200, {}, stream)}) as server:
+            async with ConnectionPool() as pool:
+                events = [event async for event in iter_oobi_events(server.url("/oobi"), pool)]
+            return events, server.requests, pool.connections_opened
+
+    events, requests, opened = _run(fetch())
+    assert _saids(events) == _saids(iter_cesr_events(stream))
+    assert (requests, opened) == (2, 1)
+
+
+def test_qb2_attachments(kel):
+    binary = b""
+    for message in (kel.incept(), kel.interact()):
+        event = next(iter_cesr_events(message))
+        binary += event.raw + base64.urlsafe_b64decode(event.attachments)
+
+    async def fetch():
+        async with StandInServer({"/kel": [binary[:100], binary[100:]]}) as server:
+            return [event async for event in iter_oobi_events(server.url("/kel"))]
+
+    events = _run(fetch())
+    assert [event.body["t"] for event in events] == ["icp", "ixn"]
+    assert [event.attachment_groups[0]["count"] for event in events] == [1, 1]
+
+
+def test_truncated_response_is_a_parse_error(stream):
+    async def fetch():
+        async with StandInServer({"/kel": (200, {}, stream[:-10])}) as server:
+            return [event async for event in iter_oobi_events(server.url("/kel"))]
+
+    with pytest.raises(CesrParseError):
+        _run(fetch())
@@ -0,0 +1,57 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from scripts.said_verify import main, verify_document, verify_saids
+from scripts.schema_registry import INDEX_NAME, SchemaRegistry
+
+CONFIG_DIR = os.path.join(os.path.dirname(__file__), "..", "config")
+
+
+@pytest.fixture
+def schema_dir(tmp_path):
+    directory = tmp_path / "schemas"
+    shutil.copytree(os.path.join(CONFIG_DIR, "schemas"), directory)
+    return str(directory)
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_config_schemas_verify(schema_dir):
+    report = verify_saids([schema_dir], workers=1)
+    assert report["mismatches"] == [] and report["errors"] == []
+    assert report["saids_checked"] > 0
+    assert all(path.endswith(".bak.json") for path in report["unsaidified"])
+
+
+def test_parallel_report_matches_serial(schema_dir):
+    serial = verify_saids([schema_dir], workers=1)
+    parallel = verify_saids([schema_dir], workers=2, files_per_task=3)
+    for key in ("files", "saids_checked", "bytes", "mismatches", "unsaidified", "errors"):
+        assert parallel[key] == serial[key]
+
+
+def test_edited_block_is_reported(schema_dir):
+    schema = _load(os.path.join(schema_dir, "legal-entity-vLEI-credential.json"))
+    schema["properties"]["a"]["oneOf"][1]["description"] = "edited"
+    report = verify_document(schema)
+    assert report["saidified"]
+    assert {mismatch["path"] for mismatch in report["mismatches"]} == {"", "/properties/a/oneOf/1"}
+
+
+def test_document_without_said_is_not_a_mismatch():
+    report = verify_document({"LEI": "5493001KJTIIGC8Y1R17"})
+    assert report == {"saids_checked": 0, "mismatches": [], "saidified": False}
+
+
+def test_index_files_are_not_verified(schema_dir, capsys):
+    SchemaRegistry(schema_dir).close()
+    report = verify_saids([schema_dir], workers=1)
+    assert not any(os.path.basename(path).startswith(".") for path in report["unsaidified"])
+    assert main([schema_dir, os.path.join(CONFIG_DIR, "credential_data"), "--jobs", "1"]) == 0
+    assert INDEX_NAME not in capsys.readouterr().out
@@ -0,0 +1,312 @@
+import copy
+import glob
+import io
+import json
+import os
+import shutil
+
+import pytest
+from keri.core import coring
+
+from scripts.saidify import (SaidCache, SchemaSaidifier, add_saids_to_data, get_schema_said, get_schema_saids, main,
+                             process_schema_directory, read_root_key, saidify_credential_data,
+                             saidify_credential_stream, saidify_schema)
+
+SCHEMAS_DIR = os.path.join(os.path.dirname(__file__), "..", "config", "schemas")
+SCHEMA_PATH = os.path.join(SCHEMAS_DIR, "legal-entity-vLEI-credential.json")
+
+
+@pytest.fixture
+def schema():
+    with open(SCHEMA_PATH, "r") as f:
+        return json.load(f)
+
+
+def _full(data):
+    return add_saids_to_data(data, recursive=True)
+
+
+def _attributes(schema):
+    return schema["properties"]["a"]["oneOf"][-1]["properties"]
+
+
+def _load(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _saider_reference(value):
+    """ SAIDifies every '$id' block innermost first with coring.Saider, deep copying at each level. """
+    if isinstance(value, dict):
+        value = {key: _saider_reference(item) for key, item in value.items()}
+        if "$id" in value and len(value) > 1:
+            _, value = coring.Saider.saidify(sad=value, label="$id")
+        return value
+    if isinstance(value, list):
+        return [_saider_reference(item) for item in value]
+    return value
+
+
+# --- Bottom-up SAIDification ---
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(SCHEMAS_DIR, "*.json"))), ids=os.path.basename)
+def test_config_schemas_keep_their_saids(path):
+    schema = _load(path)
+    if path.endswith(".bak.json"): # Unsaidified source of the schema next to it
+        assert saidify_schema(schema) == _load(path.replace(".bak.json", ".json"))
+    else:
+        assert saidify_schema(schema) == schema
+
+
+def test_matches_saider_per_block(schema):
+    original = copy.deepcopy(schema)
+    assert add_saids_to_data(schema, recursive=True) == _saider_reference(schema)
+    assert schema == original # The input is not modified
+
+
+
+# --- Incremental SAIDification ---
+
+@pytest.mark.parametrize("index", [1, -1])
+def test_update_matches_full_recompute(schema, index):
+    saidifier = SchemaSaidifier(schema)
+    lei = dict(_attributes(schema)["LEI"], description="Legal Entity Identifier (edited)")
+    saidifier.update(("properties", "a", "oneOf", index, "properties", "LEI"), lei)
+
+    expected = copy.deepcopy(saidifier.data)
+    assert saidifier.saidify() == _full(expected)
+    assert saidifier.data["$id"] != SchemaSaidifier(schema).data["$id"]
+
+
+@pytest.mark.parametrize("index", [1, -1])
+def test_delete_matches_full_recompute(schema, index):
+    saidifier = SchemaSaidifier(schema)
+    saidifier.delete(("properties", "a", "oneOf", index, "properties", "LEI"))
+
+    expected = copy.deepcopy(saidifier.data)
+    assert saidifier.saidify() == _full(expected)
+
+
+def test_delete_list_item_with_negative_index(schema):
+    saidifier = SchemaSaidifier(schema)
+    saidifier.delete("/properties/a/oneOf/-2")
+
+    expected = copy.deepcopy(saidifier.data)
+    assert saidifier.saidify() == _full(expected)
+    assert len(saidifier.data["properties"]["a"]["oneOf"]) == 1
+
+
+def test_out_of_range_index_is_rejected(schema):
+    saidifier = SchemaSaidifier(schema)
+    with pytest.raises(IndexError):
+        saidifier.update(("properties", "a", "oneOf", -3, "description"), "x")
+    with pytest.raises(IndexError):
+        saidifier.update(("properties", "a", "oneOf", 5), {})
+
+
+# --- Schema Directories ---
+
+@pytest.fixture
+def schema_dir(tmp_path):
+    """ The unsaidified config schemas, one of them in a subdirectory. """
+    directory = tmp_path / "schemas"
+    (directory / "nested").mkdir(parents=True)
+    for path in sorted(glob.glob(os.path.join(SCHEMAS_DIR, "*.bak.json"))):
+        name = os.path.basename(path).replace(".bak", "")
+        target = directory / "nested" / name if name.startswith("role") else directory / name
+        shutil.copyfile(path, target)
+    return directory
+
+
+def _summary(capsys):
+    return [line for line in capsys.readouterr().out.splitlines() if line.startswith("SAIDified")][-1]
+
+
+def test_directory_matches_config_schemas(schema_dir, tmp_path, capsys):
+    output_dir = tmp_path / "out"
+    saids = process_schema_directory(str(schema_dir), str(output_dir), workers=2)
+    assert saids["nested/role_schema.json"] == _load(os.path.join(SCHEMAS_DIR, "role_schema.json"))["$id"]
+    for relative, said in saids.items():
+        expected = _load(os.path.join(SCHEMAS_DIR, os.path.basename(relative)))
+        assert said == expected["$id"] and _load(output_dir / relative) == expected
+    assert _summary(capsys).startswith(f"SAIDified {len(saids)} schemas, skipped 0 unchanged, 0 failed")
+
+
+def test_manifest_skips_unchanged_schemas(schema_dir, capsys):
+    first = process_schema_directory(str(schema_dir), workers=1) # In place
+    assert _summary(capsys).startswith(f"SAIDified {len(first)} schemas")
+
+    assert process_schema_directory(str(schema_dir), workers=1) == first
+    assert _summary(capsys).startswith(f"SAIDified 0 schemas, skipped {len(first)} unchanged")
+
+    edited = _load(schema_dir / "sample_schema.json")
+    edited["description"] = "Edited sample schema"
+    (schema_dir / "sample_schema.json").write_text(json.dumps(edited))
+    second = process_schema_directory(str(schema_dir), workers=1)
+    assert _summary(capsys).startswith(f"SAIDified 1 schemas, skipped {len(first) - 1} unchanged")
+    assert second["sample_schema.json"] != first["sample_schema.json"]
+    assert {key: said for key, said in second.items() if key != "sample_schema.json"} == \
+        {key: said for key, said in first.items() if key != "sample_schema.json"}
+
+    process_schema_directory(str(schema_dir), workers=1, recursive=True) # Other options reprocess everything
+    assert _summary(capsys).startswith(f"SAIDified {len(first)} schemas")
+    process_schema_directory(str(schema_dir), workers=1, recursive=True, force=True)
+    assert _summary(capsys).startswith(f"SAIDified {len(first)} schemas")
+
+
+def test_changed_output_is_rewritten(schema_dir, tmp_path, capsys):
+    output_dir = tmp_path / "out"
+    saids = process_schema_directory(str(schema_dir), str(output_dir), workers=1)
+    (output_dir / "access_schema.json").write_text("{}")
+    os.remove(output_dir / "nested" / "role_schema.json")
+    assert process_schema_directory(str(schema_dir), str(output_dir), workers=1) == saids
+    assert _summary(capsys).startswith(f"SAIDified 2 schemas, skipped {len(saids) - 2} unchanged")
+    assert _load(output_dir / "access_schema.json")["$id"] == saids["access_schema.json"]
+
+
+def test_rewritten_schema_keeps_its_permissions(schema_dir):
+    os.chmod(schema_dir / "sample_schema.json", 0o640)
+    process_schema_directory(str(schema_dir), workers=1)
+    assert os.stat(schema_dir / "sample_schema.json").st_mode & 0o777 == 0o640
+
+
+# --- SAID Cache ---
+
+def test_cache_hits_give_the_same_saids(schema):
+    expected = _full(schema)
+    cache = SaidCache()
+    assert add_saids_to_data(schema, recursive=True, cache=cache) == expected
+    misses = cache.stats()["misses"]
+    assert misses > 0 and cache.stats()["hits"] == 0
+    assert add_saids_to_data(schema, recursive=True, cache=cache) == expected
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"], stats["hit_rate"]) == (misses, misses, misses, 0.5)
+
+
+def test_cache_is_bounded(schema):
+    cache = SaidCache(maxsize=2)
+    add_saids_to_data(schema, recursive=True, cache=cache)
+    assert cache.stats()["size"] == 2
+    with SaidCache(maxsize=0) as disabled:
+        assert add_saids_to_data(schema, recursive=True, cache=disabled) == _full(schema)
+        assert disabled.stats()["size"] == 0
+
+
+def test_cache_persists_across_runs(schema, tmp_path):
+    path = str(tmp_path / "saids.sqlite")
+    with SaidCache(path=path) as cache:
+        expected = add_saids_to_data(schema, recursive=True, cache=cache)
+        computed = cache.stats()["misses"]
+
+    with SaidCache(path=path) as cache: # A later run starts with an empty memory cache
+        assert add_saids_to_data(schema, recursive=True, cache=cache) == expected
+        assert (cache.stats()["disk_hits"], cache.stats()["misses"]) == (computed, 0)
+
+
+def test_directory_workers_share_the_cache(schema_dir, tmp_path):
+    path = str(tmp_path / "saids.sqlite")
+    saids = process_schema_directory(str(schema_dir), str(tmp_path / "out"), workers=2, cache_path=path)
+    with SaidCache(path=path) as cache:
+        for relative, said in saids.items():
+            assert saidify_schema(_load(schema_dir / relative), cache=cache)["$id"] == said
+        assert cache.stats()["misses"] == 0 and cache.stats()["disk_hits"] > 0
+
+
+# --- SAID Lookup ---
+
+SAID = "EBfdlu8R27Fbx-ehrqwImnK-8Cm79sqbAQ4MmvEAYqao"
+LOOKUP_CASES = {
+    "first": '{"$id": "%s", "title": "x"}' % SAID,
+    "after_nested_id": '{"properties": {"$id": "nested", "a": [1, {"$id": "deeper"}]}, "$id": "%s"}' % SAID,
+    "after_tricky_strings": json.dumps({"s": 'a \\"}{["', "u": "\u00e9\n", "n": -1.5e-3, "t": True, "$id": SAID}),
+    "across_chunks": json.dumps({"description": "x" * 10_000, "values": list(range(2_000)), "$id": SAID}, indent=2),
+    "number_at_chunk_end": '{"pad": "%s", "n": 1234567890, "$id": "%s"}' % ("x" * 4_070, SAID),
+    "missing": '{"title": "no SAID"}',
+    "empty_object": "{}",
+    "not_a_string": '{"$id": 5}',
+    "empty_string": '{"$id": ""}',
+    "array_root": '[{"$id": "%s"}]' % SAID,
+    "truncated": '{"title": "x", "$i',
+    "invalid": '{"title" "x"}',
+}
+
+
+@pytest.mark.parametrize("case", LOOKUP_CASES)
+def test_fast_lookup_agrees_with_full_parse(case, tmp_path):
+    path = tmp_path / "schema.json"
+    path.write_text(LOOKUP_CASES[case])
+    expected = SAID if case in ("first", "after_nested_id", "after_tricky_strings", "across_chunks",
+                                "number_at_chunk_end") else None
+    assert get_schema_said(str(path), fast=False) == expected
+    assert get_schema_said(str(path)) == expected
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(SCHEMAS_DIR, "*.json"))), ids=os.path.basename)
+def test_fast_lookup_of_config_schemas(path):
+    assert get_schema_said(path) == get_schema_said(path, fast=False) == (_load(path)["$id"] or None)
+
+
+def test_fast_lookup_stops_at_the_key(tmp_path):
+    path = tmp_path / "schema.json"
+    path.write_text('{"$id": "%s", "rest": ' % SAID + "x" * 100_000) # Never parsed
+    assert read_root_key(str(path), "$id") == (True, SAID)
+    assert get_schema_said(str(path)) == SAID
+    assert get_schema_said(str(path), fast=False) is None
+
+
+def test_missing_file(tmp_path, capsys):
+    assert get_schema_said(str(tmp_path / "missing.json")) is None
+    assert "not found" in capsys.readouterr().out
+
+
+def test_directory_lookup(schema_dir):
+    assert set(get_schema_saids(str(schema_dir)).values()) == {None} # Unsaidified sources
+    process_schema_directory(str(schema_dir), workers=1)
+    saids = get_schema_saids(str(schema_dir))
+    assert saids == get_schema_saids(str(schema_dir), fast=False)
+    assert ".saidify-manifest.json" not in saids and saids["nested/role_schema.json"] is not None
+
+
+# --- Credential Data Pipeline ---
+
+CREDENTIAL_DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "config", "credential_data")
+
+
+def test_blocks_match_kli_saidify():
+    edge = _load(os.path.join(CREDENTIAL_DATA_DIR, "access_cred_edge.json"))
+    rule = _load(os.path.join(CREDENTIAL_DATA_DIR, "access_cred_rule.json"))
+    assert saidify_credential_data({"e": edge, "r": rule}) == {"e": edge, "r": rule}
+
+    attributes = _load(os.path.join(CREDENTIAL_DATA_DIR, "access_cred_data.json"))
+    block = saidify_credential_data(attributes)["a"]
+    assert list(block) == ["d", *attributes]
+    assert block == coring.Saider.saidify(sad={"d": "", **attributes}, label="d")[1]
+
+
+def _records():
+    attributes = _load(os.path.join(CREDENTIAL_DATA_DIR, "access_cred_data.json"))
+    edge = _load(os.path.join(CREDENTIAL_DATA_DIR, "access_cred_edge.json"))
+    records = [dict(attributes, buildingId=f"HQ-{i}") for i in range(7)]
+    records[3] = {"a": records[3], "e": edge}
+    return [json.dumps(record) for record in records]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_credential_stream(workers, capsys):
+    lines = _records()
+    lines[5:5] = ["", "[1, 2]"] # A blank line is skipped and a non-object is reported
+    output = io.StringIO()
+    stats = saidify_credential_stream(io.StringIO("\n".join(lines) + "\n"), output, workers=workers, batch_size=2)
+
+    assert (stats["records"], stats["errors"]) == (7, 1)
+    assert "line 7" in capsys.readouterr().err
+    expected = [saidify_credential_data(json.loads(line)) for line in _records()]
+    assert [json.loads(line) for line in output.getvalue().splitlines()] == expected
+
+
+def test_credential_stream_cli(tmp_path, capsys):
+    infile, outfile = tmp_path / "records.ndjson", tmp_path / "saidified.ndjson"
+    infile.write_text("\n".join(_records()) + "\n")
+    assert main([str(infile), "--credentials", "-o", str(outfile), "--jobs", "1"]) == 0
+    assert len(outfile.read_text().splitlines()) == 7
+    assert "SAIDified 7 credential data records" in capsys.readouterr().err
@@ -0,0 +1,77 @@
+import json
+import os
+import shutil
+import threading
+
+import pytest
+
+from scripts import saidify_watch
+from scripts.saidify import get_schema_said
+from scripts.saidify_watch import SaidifyWatcher
+
+SCHEMA_DIR = os.path.join(os.path.dirname(__file__), "..", "config", "schemas")
+
+
+@pytest.fixture
+def schema_dir(tmp_path):
+    directory = tmp_path / "schemas"
+    directory.mkdir()
+    for name in ("sample_schema.bak.json", "sample_schema.json", "role_schema.json"):
+        shutil.copy(os.path.join(SCHEMA_DIR, name), directory / name)
+    return directory
+
+
+@pytest.fixture
+def watcher(schema_dir):
+    watcher = SaidifyWatcher([str(schema_dir)], polling=True)
+    yield watcher
+    watcher.changes.close()
+
+
+def _edit(path, description):
+    with open(path) as f:
+        data = json.load(f)
+    data["description"] = description
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def test_source_schema_writes_its_output(watcher, schema_dir):
+    source, target = schema_dir / "sample_schema.bak.json", schema_dir / "sample_schema.json"
+    _edit(source, "Edited sample")
+    said = watcher.process(str(source))
+    assert said == get_schema_said(str(target)) != get_schema_said(os.path.join(SCHEMA_DIR, "sample_schema.json"))
+    assert watcher.process(str(source)) is None # Unchanged since it was read
+
+
+def test_saidified_schema_is_left_alone(watcher, schema_dir):
+    path = schema_dir / "role_schema.json"
+    before = path.read_bytes()
+    assert watcher.process(str(path)) is None
+    assert path.read_bytes() == before
+
+
+def test_edited_schema_is_saidified_once(watcher, schema_dir, monkeypatch):
+    calls = []
+    saidify_schema = saidify_watch.saidify_schema
+    monkeypatch.setattr(saidify_watch, "saidify_schema", lambda *args, **kwargs: calls.append(1) or
+                        saidify_schema(*args, **kwargs))
+    path = schema_dir / "role_schema.json"
+    _edit(path, "Edited role")
+    said = watcher.process(str(path))
+    assert said == get_schema_said(str(path))
+    assert len(calls) == 1
+    assert watcher.process(str(path)) is None # Its own write is not processed again
+
+
+def test_run_processes_a_saved_file(watcher, schema_dir):
+    path = schema_dir / "role_schema.json"
+    thread = threading.Thread(target=watcher.run, kwargs={"initial": False, "max_batches": 1})
+    thread.start()
+    try:
+        _edit(path, "Edited while watching")
+    finally:
+        thread.join(10)
+    assert not thread.is_alive()
+    with open(path) as f:
+        assert json.load(f)["$id"] == get_schema_said(str(path))
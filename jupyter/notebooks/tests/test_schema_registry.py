@@ -0,0 +1,66 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from scripts.saidify import get_schema_saids
+from scripts.saidify import main as saidify_main
+from scripts.schema_registry import INDEX_NAME, SchemaRegistry
+
+SCHEMA_DIR = os.path.join(os.path.dirname(__file__), "..", "config", "schemas")
+
+
+@pytest.fixture
+def schema_dir(tmp_path):
+    directory = tmp_path / "schemas"
+    shutil.copytree(SCHEMA_DIR, directory)
+    return str(directory)
+
+
+def test_saidify_directory_skips_registry_index(schema_dir, capsys):
+    SchemaRegistry(schema_dir).close()
+    assert os.path.exists(os.path.join(schema_dir, INDEX_NAME))
+
+    for _ in range(2):
+        assert saidify_main([schema_dir, "--jobs", "1"]) == 0
+        output = capsys.readouterr().out
+        assert INDEX_NAME not in output
+        assert "FAILED" not in output
+
+
+def test_registry_resolves_every_schema_by_said(schema_dir):
+    expected = {said: relative for relative, said in get_schema_saids(schema_dir).items() if said}
+    with SchemaRegistry(schema_dir) as registry:
+        assert set(registry.saids()) == set(expected)
+        for said in expected:
+            assert registry[said]["$id"] == said
+        assert registry.get("Enot-a-said") is None
+
+
+def test_registry_reuses_persisted_index(schema_dir):
+    SchemaRegistry(schema_dir).close()
+    registry = SchemaRegistry(schema_dir)
+    assert registry.refresh() == 0
+
+    path = os.path.join(schema_dir, "access_schema.json")
+    with open(path, "a") as f:
+        f.write("\n")
+    assert registry.refresh() == 1
+    registry.close()
+
+
+def test_registry_reads_ndjson_bundles(schema_dir, tmp_path):
+    bundle_dir = tmp_path / "bundle"
+    bundle_dir.mkdir()
+    lines = []
+    for name in ("access_schema.json", "role_schema.json"):
+        with open(os.path.join(schema_dir, name)) as f:
+            lines.append(json.dumps(json.load(f)))
+    (bundle_dir / "schemas.ndjson").write_text("\n".join(lines) + "\n")
+
+    with SchemaRegistry(str(bundle_dir)) as registry:
+        assert len(registry) == 2
+        for line in lines:
+            said = json.loads(line)["$id"]
+            assert registry[said] == json.loads(line)
@@ -0,0 +1,96 @@
+import os
+import socket
+import sys
+import time
+
+import pytest
+
+from scripts.supervisor import ProcessNotReady, Supervisor, http_ok, log_line, port_open
+
+PYTHON = sys.executable
+
+
+@pytest.fixture
+def supervisor():
+    with Supervisor() as supervisor:
+        yield supervisor
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _group_alive(pid: int) -> bool:
+    try:
+        os.killpg(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+
+
+def test_log_line_readiness(supervisor):
+    process = supervisor.start("echo starting; sleep 0.3; echo 'Waiting for others'; sleep 30", name="join",
+                               ready=log_line("Waiting"))
+    assert process.running() and process.ready_after >= 0.3
+    assert process.tail() == ["starting", "Waiting for others"]
+    assert supervisor.get("join") is process
+
+
+def test_log_line_seen_before_it_rotates_out(supervisor):
+    process = supervisor.start("echo ready; seq 100", ready=log_line("^ready$"), log_lines=5)
+    process.wait(10)
+    assert process.tail() == ["96", "97", "98", "99", "100"]
+    assert process.matched(log_line("^ready$").pattern)
+
+
+def test_port_and_http_readiness(supervisor):
+    port = _free_port()
+    command = f"sleep 0.3; exec {PYTHON} -m http.server {port} --bind 127.0.0.1"
+    process = supervisor.start(command, ready=port_open(port), timeout=30)
+    assert process.ready_after >= 0.3
+    with socket.create_connection(("127.0.0.1", port), timeout=1):
+        pass
+    assert http_ok(f"http://127.0.0.1:{port}/")(process)
+    assert not http_ok(f"http://127.0.0.1:{port}/missing")(process)
+    assert http_ok(f"http://127.0.0.1:{port}/missing", status=404)(process)
+
+
+def test_early_exit_raises_process_not_ready(supervisor):
+    started = time.monotonic()
+    with pytest.raises(ProcessNotReady) as raised:
+        supervisor.start("echo boom; exit 3", name="broken", ready=log_line("never printed"), timeout=30)
+    assert time.monotonic() - started < 5 # Not the full timeout
+    message = str(raised.value)
+    assert message.startswith("broken exited waiting for output matching 'never printed'") and message.endswith("boom")
+
+
+def test_timeout_raises_and_stops_the_process(supervisor):
+    with pytest.raises(ProcessNotReady, match="not ready after 0.3s"):
+        supervisor.start("sleep 30", name="slow", ready=port_open(_free_port()), timeout=0.3)
+    process = supervisor.get("slow")
+    assert not process.running() and process.stopped
+
+
+def test_stop_ends_the_process_group(supervisor):
+    process = supervisor.start("sleep 30 & sleep 30; wait", name="group")
+    assert _group_alive(process.pid)
+    code = supervisor.stop("group")
+    assert code < 0 and process.stopped and not _group_alive(process.pid)
+    assert "group" not in supervisor.processes
+
+
+def test_reusing_a_name_stops_the_previous_process(supervisor):
+    first = supervisor.start("sleep 30", name="witness")
+    second = supervisor.start("sleep 30", name="witness")
+    assert first.stopped and not first.running() and second.running()
+
+
+def test_wait_all_and_status(supervisor):
+    supervisor.start("exit 2", name="done")
+    supervisor.start("sleep 30", name="running")
+    assert supervisor.wait_all(timeout=0.5) == {"done": 2, "running": None}
+    status = {entry["name"]: entry for entry in supervisor.status()}
+    assert (status["done"]["running"], status["done"]["code"]) == (False, 2)
+    assert status["running"]["running"] and not supervisor.get("done").stopped
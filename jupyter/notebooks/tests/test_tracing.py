@@ -0,0 +1,83 @@
+import json
+import sys
+
+import pytest
+
+from scripts import tracing
+from scripts.supervisor import get_supervisor
+from scripts.tracing import command_group, disable_tracing, enable_tracing, run_command, trace
+from scripts.utils import exec_bg, exec_many
+
+
+@pytest.fixture
+def tracer():
+    yield enable_tracing()
+    disable_tracing()
+
+
+def _group(tracer, name):
+    return next(group for group in tracer.by_group() if group["group"] == name)
+
+
+def test_command_group():
+    assert command_group("kli vc create --name issuer --alias x") == "kli vc create"
+    assert command_group("/usr/bin/kli incept --file cfg.json") == "kli incept"
+    assert command_group("echo 'unterminated") == "echo"
+
+
+def test_run_command_reports_code_output_and_cpu():
+    code, stdout, stderr, cpu_seconds = run_command([sys.executable, "-c", "import sys; print('out');"
+                                                     "print('err', file=sys.stderr); sys.exit(3)"])
+    assert (code, stdout, stderr) == (3, "out\n", "err\n")
+    assert cpu_seconds is None or cpu_seconds > 0
+    assert run_command("echo a; echo b >&2", merge_stderr=True)[:2] == (0, "a\nb\n")
+
+
+def test_trace_is_a_no_op_when_disabled():
+    assert tracing.get_tracer() is None
+    with trace("exec", "kli version") as event:
+        assert event is None
+
+
+def test_traced_calls_are_grouped(tracer):
+    results = exec_many(["true", "false"], verbose=False)
+    assert [result.code for result in results] == [0, 1]
+    assert _group(tracer, "true")["failures"] == 0
+    assert _group(tracer, "false")["failures"] == 1
+    with trace("restore_keri", "restore snapshot base", in_process=True) as event:
+        sum(range(10_000))
+    assert event.cpu_seconds is not None
+    assert _group(tracer, "restore_keri")["calls"] == 1
+
+
+def test_stopped_background_process_is_not_a_failure(tracer):
+    exec_bg("sleep 30", name="trace-stopped")
+    exec_bg(f"{sys.executable} -c 'import sys; sys.exit(4)'", name="trace-failed").wait(10)
+    get_supervisor().stop("trace-stopped")
+    events = {event.command: event for event in tracer.all_events()}
+    stopped = events["sleep 30"]
+    assert stopped.stopped and stopped.code < 0 and not stopped.failed
+    assert _group(tracer, "sleep")["failures"] == 0
+    assert events[f"{sys.executable} -c 'import sys; sys.exit(4)'"].failed
+    get_supervisor().stop("trace-failed")
+
+
+def test_chrome_trace_export(tracer, tmp_path):
+    with trace("exec", "echo one") as event:
+        event.code = 0
+    with trace("exec", "echo two"):
+        pass
+    path = tmp_path / "trace.chrome.json"
+    tracer.export_chrome_trace(str(path))
+    with open(path) as f:
+        data = json.load(f)
+    spans = [entry for entry in data["traceEvents"] if entry["ph"] == "X"]
+    assert [span["name"] for span in spans] == ["echo one", "echo two"]
+    assert all(span["dur"] >= 0 and span["cat"] == "exec" for span in spans)
+    assert spans[0]["args"]["code"] == 0
+    assert len({span["tid"] for span in spans}) == 1
+    assert [entry["name"] for entry in data["traceEvents"] if entry["ph"] == "M"] == ["thread_name"]
+
+    tracer.export_json(str(tmp_path / "trace.json"))
+    with open(tmp_path / "trace.json") as f:
+        assert [event["command"] for event in json.load(f)["events"]] == ["echo one", "echo two"]
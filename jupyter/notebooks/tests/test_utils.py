@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from scripts.utils import exec_many
+
+
+def _append(log, name: str, delay: float = 0.0) -> str:
+    return f"sleep {delay} && echo {name} >> {log}"
+
+
+def test_runs_commands_in_dependency_order(tmp_path):
+    log = tmp_path / "order.log"
+    results = exec_many([
+        {"name": "init", "command": _append(log, "init", 0.2)},
+        {"name": "incept", "command": _append(log, "incept"), "after": ["init"]},
+        {"name": "oobi", "command": _append(log, "oobi", 0.1), "after": ["init"]},
+        {"name": "resolve", "command": _append(log, "resolve"), "after": ["incept", "oobi"]},
+    ], verbose=False)
+
+    assert [result.name for result in results] == ["init", "incept", "oobi", "resolve"]
+    assert all(result.ok for result in results)
+    lines = log.read_text().split()
+    assert lines[0] == "init" and lines[-1] == "resolve" and set(lines[1:3]) == {"incept", "oobi"}
+    by_name = {result.name: result for result in results}
+    for result in results:
+        for name in result.after:
+            assert result.started >= by_name[name].started + by_name[name].seconds
+
+
+def test_independent_commands_run_concurrently():
+    started = time.perf_counter()
+    results = exec_many(["sleep 0.5", "sleep 0.5", "sleep 0.5"], max_workers=3, verbose=False)
+    assert [result.name for result in results] == ["0", "1", "2"]
+    assert time.perf_counter() - started < 1.2
+
+
+def test_dependents_of_a_failure_are_skipped(tmp_path, capsys):
+    results = exec_many([
+        {"name": "fails", "command": "echo broken >&2; exit 3"},
+        {"name": "next", "command": "echo next", "after": ["fails"]},
+        {"name": "last", "command": "echo last", "after": ["next"]},
+        {"name": "other", "command": "echo other"},
+    ])
+    assert [(result.name, result.code) for result in results] == [("fails", 3), ("next", None), ("last", None),
+                                                                   ("other", 0)]
+    assert results[0].stderr == "broken\n" and results[3].lines() == ["other"]
+    output = capsys.readouterr().out
+    assert "Skipped next" in output and "Skipped last" in output and "❌ exit 3 fails" in output
+
+
+def test_invalid_dependencies_are_rejected():
+    with pytest.raises(ValueError, match="circular dependencies between \\['a', 'b'\\]"):
+        exec_many([{"name": "a", "command": "true", "after": ["b"]},
+                   {"name": "b", "command": "true", "after": ["a"]},
+                   {"name": "c", "command": "true"}], verbose=False)
+    with pytest.raises(ValueError, match="unknown commands \\['missing'\\]"):
+        exec_many([{"name": "a", "command": "true", "after": ["missing"]}], verbose=False)
+    with pytest.raises(ValueError, match="must be unique"):
+        exec_many([{"name": "a", "command": "true"}, {"name": "a", "command": "false"}], verbose=False)
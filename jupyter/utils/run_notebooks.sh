@@ -1,6 +1,13 @@
 #!/usr/bin/env bash
 cd /app/notebooks
 
+# Optional: name of a keystore snapshot (python -m scripts.keystore_snapshot save <name>)
+# restored before every notebook, so each one starts from the same keystore
+KERI_SNAPSHOT="${KERI_SNAPSHOT:-}"
+
+# Optional: directory for per-notebook command traces (see scripts/tracing.py)
+TRACE_DIR="${TRACE_DIR:-}"
+
 # Array of notebook filenames to exclude from conversion
 EXCLUDE_NOTEBOOKS=(
     "000_Table_of_Contents.ipynb"
@@ -28,6 +35,15 @@ for notebook in *.ipynb; do
         continue
     fi
 
+    if [[ -n "$KERI_SNAPSHOT" ]]; then
+        python -m scripts.keystore_snapshot restore "$KERI_SNAPSHOT" || exit 1
+    fi
+
+    if [[ -n "$TRACE_DIR" ]]; then
+        mkdir -p "$TRACE_DIR"
+        export SCRIPTS_TRACE="$TRACE_DIR/${notebook%.ipynb}.json"
+    fi
+
     echo "Executing $notebook"
     jupyter nbconvert --to notebook --execute --inplace --ExecutePreprocessor.timeout=-1 "$notebook"
 done